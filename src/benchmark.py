@@ -0,0 +1,242 @@
+"""
+Benchmark source file: times each pipeline stage and writes JSON.
+
+Stages timed per dataset: parsing (bodies, mesh, samples), mesh build,
+index build (BVH, grid, distance field), compute_d, each compute_Freg iteration, closest-point search
+for every mode, and output writing. Synthetic bumpy-grid meshes of a few
+sizes time mesh/index build and closest-point search on their own.
+
+By default only the -A debug set of each assignment is run (one mesh
+each); pass --datasets for others, e.g. the PA4-B..F sets whose ICP runs
+to --max_iter.
+
+Every stage is repeated --repeat times; min and median are kept. With
+--compare, results are checked against a saved baseline and any stage
+whose min time grew by more than --tolerance (and by more than --noise
+seconds) is reported as a regression, with a nonzero exit code.
+
+Examples Usage:
+python src/benchmark.py --out bench/baseline.json
+python src/benchmark.py --datasets PA4-A-Debug --scales 2000 --repeat 5 --compare bench/baseline.json
+python src/benchmark.py --skip_datasets --scales 1000 10000 50000 --modes box bvh grid
+
+Author: Emily Guan
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from utils.IO import read_body, read_mesh, read_sample, write_output
+from utils.mesh import Mesh, SEARCH_MODES
+from utils.transform_register import compute_d, compute_Freg, apply
+from src.run_all import group_samples
+
+DEFAULT_DATASETS = ("PA3-A-Debug", "PA4-A-Debug", "PA5-A-Debug")
+DEFAULT_SCALES = (1000, 10000)
+
+"""
+Runs fn() repeat times.
+
+Returns (last result, {"min", "median", "runs"}) with times in seconds.
+"""
+def time_stage(fn, repeat=3):
+    times = []
+    for _ in range(max(int(repeat), 1)):
+        start = time.perf_counter()
+        out = fn()
+        times.append(time.perf_counter() - start)
+    return out, {"min": min(times), "median": statistics.median(times), "runs": len(times)}
+
+"""
+Closest-point timings for every mode on one mesh.
+
+Hints come from an exact search on the unperturbed points, so "walk" sees
+the warm start it would get inside ICP; other modes ignore them.
+"""
+def bench_search(mesh, points, modes, repeat, prefix, results, seed=0):
+    hints = mesh.find_closest_point(points, mode="bvh", return_indices=True)[1]
+    queries = points + np.random.default_rng(seed).normal(0, 0.05, points.shape)
+
+    for mode in modes:
+        mesh.ensure_index(mode)
+        _, results[f"{prefix}/closest/{mode}"] = time_stage(
+            lambda: mesh.find_closest_point(queries, mode=mode, hints=hints), repeat)
+
+"""
+Full pipeline stages on one shipped dataset, e.g. "PA4-A-Debug".
+"""
+def bench_dataset(name, data_dir, mode, modes, repeat, threshold, max_iter, results):
+    sample_file = os.path.join(data_dir, f"{name}-SampleReadingsTest.txt")
+    (A_file, B_file, mesh_file), = group_samples([sample_file], data_dir)
+
+    _, results[f"{name}/parse/bodies"] = time_stage(
+        lambda: (read_body(A_file), read_body(B_file)), repeat)
+    (markersA, tipA, NA, _), (markersB, _, NB, _) = read_body(A_file), read_body(B_file)
+
+    (vertices, _, _, triangle_indices, neighbors), results[f"{name}/parse/mesh"] = time_stage(
+        lambda: read_mesh(mesh_file), repeat)
+    (A_samps, B_samps, _, _), results[f"{name}/parse/samples"] = time_stage(
+        lambda: read_sample(sample_file, NA, NB), repeat)
+
+    mesh, results[f"{name}/build/mesh"] = time_stage(
+        lambda: Mesh(vertices, triangle_indices, mode=mode, neighbors=neighbors), repeat)
+    _, results[f"{name}/build/bvh"] = time_stage(mesh.build_bvh, repeat)
+    _, results[f"{name}/build/grid"] = time_stage(mesh.build_grid, repeat)
+    if "field" in modes:
+        _, results[f"{name}/build/field"] = time_stage(mesh.build_field, repeat)
+
+    d, results[f"{name}/compute_d"] = time_stage(
+        lambda: compute_d(markersA, markersB, tipA, A_samps, B_samps), repeat)
+
+    # ICP: keep the per-iteration times of the fastest run
+    best, totals = None, []
+    for _ in range(max(int(repeat), 1)):
+        R, t, summary = compute_Freg(mesh, d, threshold, max_iter, return_summary=True)
+        totals.append(summary.seconds)
+        if best is None or summary.seconds < best.seconds:
+            best = summary
+    iteration_times = [r.seconds for r in best.records]
+    results[f"{name}/icp"] = {"min": min(totals), "median": statistics.median(totals), "runs": len(totals),
+                              "iterations": best.iterations, "converged": best.converged,
+                              "tested": best.tested, "rejected": best.rejected,
+                              "iteration_times": iteration_times}
+    results[f"{name}/icp/iteration"] = {"min": min(iteration_times),
+                                        "median": statistics.median(iteration_times),
+                                        "runs": len(iteration_times)}
+
+    s = apply(d, R, t)
+    bench_search(mesh, s, modes, repeat, name, results)
+
+    c = mesh.find_closest_point(s)
+    with tempfile.TemporaryDirectory() as tmp:
+        _, results[f"{name}/write_output"] = time_stage(
+            lambda: write_output(os.path.join(tmp, "output.txt"), s, c), repeat)
+
+"""
+Bumpy (n x n) grid surface with about n_triangles faces.
+"""
+def synthetic_mesh(n_triangles):
+    n = max(int(np.sqrt(n_triangles / 2)), 1)
+    i, j = np.meshgrid(np.arange(n + 1), np.arange(n + 1), indexing='ij')
+    z = 0.5 * np.sin(0.3 * i) * np.cos(0.2 * j)
+    vertices = np.stack((i, j, z), axis=-1).reshape(-1, 3).astype(float)
+
+    a = (i[:-1, :-1] * (n + 1) + j[:-1, :-1]).ravel()
+    b = a + n + 1
+    indices = np.concatenate((np.stack((a, b, a + 1), axis=1),
+                              np.stack((b, b + 1, a + 1), axis=1)))
+    return vertices, indices
+
+"""
+Mesh build and closest-point search on a synthetic mesh of the given size.
+"""
+def bench_synthetic(n_triangles, mode, modes, repeat, n_points, results, seed=0):
+    vertices, indices = synthetic_mesh(n_triangles)
+    prefix = f"synthetic-{indices.shape[0]}"
+
+    mesh, results[f"{prefix}/build/mesh"] = time_stage(lambda: Mesh(vertices, indices, mode=mode), repeat)
+    _, results[f"{prefix}/build/bvh"] = time_stage(mesh.build_bvh, repeat)
+    _, results[f"{prefix}/build/grid"] = time_stage(mesh.build_grid, repeat)
+    if "field" in modes:
+        _, results[f"{prefix}/build/field"] = time_stage(mesh.build_field, repeat)
+
+    rng = np.random.default_rng(seed)
+    lb, ub = vertices.min(axis=0), vertices.max(axis=0)
+    points = rng.uniform(lb - 1.0, ub + 1.0, (n_points, 3))
+    bench_search(mesh, points, modes, repeat, prefix, results, seed)
+
+"""
+Compares two result dicts on min time.
+
+Returns a list of (key, baseline, current, ratio, regressed) for keys in both.
+"""
+def compare_results(baseline, current, tolerance=0.2, noise=1e-3):
+    rows = []
+    for key in sorted(set(baseline) & set(current)):
+        base, cur = baseline[key]["min"], current[key]["min"]
+        ratio = cur / base if base > 0 else float("inf")
+        regressed = cur > base * (1 + tolerance) and cur - base > noise
+        rows.append((key, base, cur, ratio, regressed))
+    return rows
+
+"""
+Full benchmark run.
+
+Inputs:
+    datasets   - Dataset prefixes in data_dir (e.g. "PA4-A-Debug").
+    scales     - Synthetic mesh sizes, in triangles.
+    mode       - Search mode used for the ICP stage.
+    modes      - Modes timed for closest-point search.
+    repeat     - Repetitions per stage.
+    n_points   - Query points for synthetic searches.
+
+Outputs:
+    Dict with "meta" (environment, settings) and "results" (stage -> timings).
+"""
+def run_benchmark(datasets=DEFAULT_DATASETS, scales=DEFAULT_SCALES, data_dir="data", mode="bvh",
+                  modes=SEARCH_MODES, repeat=3, threshold=1e-3, max_iter=100, n_points=500):
+    results = {}
+    for name in datasets:
+        bench_dataset(name, data_dir, mode, modes, repeat, threshold, max_iter, results)
+    for n in scales:
+        bench_synthetic(n, mode, modes, repeat, n_points, results)
+
+    meta = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "mode": mode,
+        "repeat": repeat,
+    }
+    return {"meta": meta, "results": results}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time pipeline stages")
+    parser.add_argument("--datasets", required=False, nargs="*", default=list(DEFAULT_DATASETS),
+                        help="dataset prefixes in --data (default: the PA3/PA4/PA5 -A debug sets)")
+    parser.add_argument("--skip_datasets", required=False, action="store_true")
+    parser.add_argument("--scales", required=False, nargs="*", type=int, default=list(DEFAULT_SCALES))
+    parser.add_argument("--data", required=False, default="data")
+    parser.add_argument("--mode", required=False, default="bvh", choices=SEARCH_MODES)
+    parser.add_argument("--modes", required=False, nargs="+", default=list(SEARCH_MODES), choices=SEARCH_MODES)
+    parser.add_argument("--repeat", required=False, type=int, default=3)
+    parser.add_argument("--n_points", required=False, type=int, default=500)
+    parser.add_argument("--threshold", required=False, default=1e-3)
+    parser.add_argument("--max_iter", required=False, default=100)
+    parser.add_argument("--out", required=False, default=None)
+    parser.add_argument("--compare", required=False, default=None)
+    parser.add_argument("--tolerance", required=False, type=float, default=0.2)
+    parser.add_argument("--noise", required=False, type=float, default=1e-3)
+    args = parser.parse_args()
+
+    report = run_benchmark([] if args.skip_datasets else args.datasets, args.scales, args.data,
+                           args.mode, args.modes, args.repeat, float(args.threshold),
+                           int(args.max_iter), args.n_points)
+
+    if args.out:
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        rows = compare_results(baseline, report["results"], args.tolerance, args.noise)
+        for key, base, cur, ratio, regressed in rows:
+            flag = "REGRESSION" if regressed else ""
+            print(f"{key:45s} {base:10.4f}s {cur:10.4f}s {ratio:6.2f}x {flag}", file=sys.stderr)
+        if any(row[4] for row in rows):
+            sys.exit(1)
@@ -12,15 +12,21 @@ python src/main.py --A data/Problem4-BodyA.txt --B data/Problem4-BodyB.txt --mes
 python src/main.py --A data/Problem4-BodyA.txt --B data/Problem4-BodyB.txt --mesh data/Problem4MeshFile.sur --sample data/PA4-H-Unknown-SampleReadingsTest.txt --out output/PA4-H-output.txt
 python src/main.py --A data/Problem4-BodyA.txt --B data/Problem4-BodyB.txt --mesh data/Problem4MeshFile.sur --sample data/PA4-J-Unknown-SampleReadingsTest.txt --out output/PA4-J-output.txt
 python src/main.py --A data/Problem4-BodyA.txt --B data/Problem4-BodyB.txt --mesh data/Problem4MeshFile.sur --sample data/PA4-K-Unknown-SampleReadingsTest.txt --out output/PA4-K-output.txt
+python src/main.py --A data/Problem5-BodyA.txt --B data/Problem5-BodyB.txt --mesh data/Problem5MeshFile.sur --sample data/PA5-A-Debug-SampleReadingsTest.txt --modes data/Problem5Modes.txt --mode walk --out output/PA5-A-output.txt
 
 Author: Emily Guan
 """
 
 import argparse
+import json
 
-from utils.IO import read_body, read_mesh, read_sample, write_output
-from utils.mesh import Mesh
-from utils.transform_register import compute_d, compute_ck
+import numpy as np
+
+from utils.IO import read_body, read_mesh, read_modes, iter_sample, write_output
+from utils.mesh import Mesh, SEARCH_MODES, PRECISIONS
+from utils.mesh_cache import load_mesh, load_index, save_index
+from utils.transform_register import compute_d_stream, compute_ck
+from utils.deformable import compute_ck_deformable
 
 """
 Full workflow run.
@@ -32,30 +38,96 @@ Inputs:
     sample_file - Sampled marker readings for body A & B over multiple frames.
     outfile     - Output filepath for writing d_k and c_k.
     linear      - Whether to use linear search for surface mapping.
+    mode        - Closest-point search mode ("linear", "box", "bvh", "grid", "walk" or "field").
+    cache_mesh  - Load the mesh through a binary sidecar cache (<mesh_file>.cache).
+    index_file  - Directory holding a saved spatial index (grid for mode "grid", distance
+                  field for mode "field", otherwise BVH). Reused if it matches the mesh,
+                  else built and saved.
+    rebuild_index - Build and save the index even if index_file is valid.
+    threads     - Threads for closest-point queries (pool reused across ICP iterations).
+    verbose     - Print per-iteration registration progress.
+    metrics_file - Write the registration summary (per-iteration metrics) as JSON.
+    modes_file  - Shape-mode file (e.g. Problem5Modes.txt). If given, the mesh is
+                  deformed as well and the output includes the mode weights (PA5).
+                  max_iter then caps the rigid + shape rounds; levels > 1,
+                  level_thresholds, accelerate, reuse and time_budget only
+                  apply to rigid registration and raise ValueError with it.
+    levels      - Coarse-to-fine registration levels (1 = full resolution only).
+    level_thresholds - Optional eps tolerance for each coarse level, coarsest first.
+    accelerate  - Anderson-accelerate the registration iterations.
+    reuse       - Answer closest-point queries for points that barely moved from
+                  cached candidate lists (exact).
+    time_budget - Optional registration budget in seconds; when it runs out the
+                  best pose found so far is used (see compute_Freg).
+    precision   - "float64" or "float32": dtype the mesh is stored and searched in.
+                  The registration solves stay float64 either way (see
+                  src/validate.py for checking float32 against the debug outputs).
 
 Outputs:
     Writes an output file containing:
         - d_k : The transformed tip position in Body B’s frame for each sample.
         - c_k : The computed point on the mesh surface corresponding to each d_k.
 """
-def main(A_file, B_file, mesh_file, sample_file, outfile, threshold=1e-3, max_iter=100, linear = False): 
+def main(A_file, B_file, mesh_file, sample_file, outfile, threshold=1e-3, max_iter=100, linear = False, mode="box", cache_mesh=False,
+         index_file=None, rebuild_index=False, threads=1, verbose=False, metrics_file=None,
+         modes_file=None, levels=1, level_thresholds=None, accelerate=False,
+         reuse=False, time_budget=None, precision="float64"): 
+
+    if modes_file:
+        rigid_only = {"levels": levels > 1, "level_thresholds": bool(level_thresholds),
+                      "accelerate": accelerate, "reuse": reuse, "time_budget": time_budget is not None}
+        unsupported = [name for name, used in rigid_only.items() if used]
+        if unsupported:
+            raise ValueError(f"{', '.join(unsupported)} cannot be combined with modes_file "
+                             "(deformable registration)")
 
     # read in files
     markersA, tipA, NA, nameA = read_body(A_file)
     markersB, tipB, NB, nameB = read_body(B_file)
-    vertices, N_vertices, N_triangles, triangle_indices, neighbors = read_mesh(mesh_file)
-    A_samps, B_samps, N_s, N_samps = read_sample(sample_file, NA, NB)
 
     # build mesh
-    mesh = Mesh(vertices, triangle_indices)
+    if cache_mesh:
+        mesh, _ = load_mesh(mesh_file, mode=mode)
+    else:
+        vertices, N_vertices, N_triangles, triangle_indices, neighbors = read_mesh(mesh_file)
+        mesh = Mesh(vertices, triangle_indices, mode=mode, neighbors=neighbors)
+    mesh = mesh.astype(PRECISIONS[precision])
 
-    # d = F_Bk^-1 * F_Ak * A_tip
-    d = compute_d(markersA, markersB, tipA, A_samps, B_samps)
+    # spatial index: reuse a saved one when it matches this mesh
+    if index_file:
+        kind = mode if mode in ("grid", "field") else "bvh"
+        if rebuild_index or load_index(index_file, mesh, kind) is None:
+            save_index(index_file, mesh, kind)
+
+    # d = F_Bk^-1 * F_Ak * A_tip, streamed from the sample file chunk by chunk
+    frames = iter_sample(sample_file, NA, NB)
+    d = np.concatenate(list(compute_d_stream(markersA, markersB, tipA, frames)))
 
     # c = F_transform * d
-    c, s= compute_ck(mesh, d, float(threshold), int(max_iter), linear)
+    # with modes, the mesh also deforms: vertices = mean + sum(lambda_i * mode_i)
+    lambdas = None
+    mesh.set_workers(threads)
+    try:
+        if modes_file:
+            modes, _, _ = read_modes(modes_file)
+            c, s, lambdas, summary = compute_ck_deformable(mesh, d, modes, float(threshold),
+                                                           max_outer=int(max_iter), use_linear=linear,
+                                                           verbose=verbose, return_summary=True)
+        else:
+            c, s, summary = compute_ck(mesh, d, float(threshold), int(max_iter), linear,
+                                       verbose=verbose, return_summary=True,
+                                       levels=levels, thresholds=level_thresholds,
+                                       accelerate=accelerate, reuse=reuse, time_budget=time_budget)
+    finally:
+        mesh.close()
+
+    if verbose:
+        print(summary)
+    if metrics_file:
+        with open(metrics_file, "w") as f:
+            json.dump(summary.as_dict(), f, indent=2)
 
-    write_output(outfile, s, c)
+    write_output(outfile, s, c, lambdas)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="PA3")
@@ -64,9 +136,28 @@ if __name__ == "__main__":
     parser.add_argument("--mesh", required=True)
     parser.add_argument("--sample", required=True)
     parser.add_argument("--out", required=True)
-    parser.add_argument("--linear", required=False, action="store_false")
+    parser.add_argument("--linear", required=False, action="store_true")
     parser.add_argument("--threshold", required=False, default=1e-3)
     parser.add_argument("--max_iter", required=False, default=100)
+    parser.add_argument("--mode", required=False, default="box", choices=SEARCH_MODES)
+    parser.add_argument("--cache_mesh", required=False, action="store_true")
+    parser.add_argument("--index_file", required=False, default=None)
+    parser.add_argument("--rebuild_index", required=False, action="store_true")
+    parser.add_argument("--threads", required=False, type=int, default=1)
+    parser.add_argument("--verbose", required=False, action="store_true")
+    parser.add_argument("--metrics_file", required=False, default=None)
+    parser.add_argument("--modes", required=False, default=None)
+    parser.add_argument("--levels", required=False, type=int, default=1)
+    parser.add_argument("--level_thresholds", required=False, nargs="+", type=float, default=None)
+    parser.add_argument("--accelerate", required=False, action="store_true")
+    parser.add_argument("--reuse", required=False, action="store_true")
+    parser.add_argument("--time_budget", required=False, type=float, default=None,
+                        help="registration time budget in milliseconds")
+    parser.add_argument("--precision", required=False, default="float64", choices=PRECISIONS)
     args = parser.parse_args()
 
-    main(args.A, args.B, args.mesh, args.sample, args.out, args.threshold, args.max_iter, args.linear)
\ No newline at end of file
+    main(args.A, args.B, args.mesh, args.sample, args.out, args.threshold, args.max_iter, args.linear, args.mode,
+         args.cache_mesh, args.index_file, args.rebuild_index, args.threads,
+         args.verbose, args.metrics_file, args.modes, args.levels, args.level_thresholds,
+         args.accelerate, args.reuse, None if args.time_budget is None else args.time_budget / 1000.0,
+         args.precision)
\ No newline at end of file
@@ -0,0 +1,209 @@
+"""
+Batch execution source file: runs many sample files across a process pool.
+
+Each problem's bodies and mesh are loaded once in the parent. The mesh
+arrays (and its spatial index) are placed in shared memory, and every
+worker attaches to them instead of reparsing. Samples are grouped by the
+PA number in their name (PA3 / PA4 / PA5 use data/Problem<N>-Body{A,B}.txt
+and data/Problem<N>MeshFile.sur) unless --A/--B/--mesh are given. Groups
+with a data/Problem<N>Modes.txt (PA5) are registered deformably.
+
+Examples Usage:
+python src/run_all.py
+python src/run_all.py --samples "data/PA4-*-SampleReadingsTest.txt" --outdir output --mode bvh
+python src/run_all.py --A data/Problem4-BodyA.txt --B data/Problem4-BodyB.txt --mesh data/Problem4MeshFile.sur --samples data/PA4-A-Debug-SampleReadingsTest.txt
+
+Author: Emily Guan
+"""
+
+import argparse
+import glob
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from utils.IO import read_body, read_mesh, read_modes, iter_sample, write_output
+from utils.mesh import Mesh, SEARCH_MODES, PRECISIONS
+from utils.mesh_cache import load_mesh
+from utils.shared_mesh import share_mesh, attach_mesh, release
+from utils.transform_register import compute_d_stream, compute_ck
+from utils.deformable import compute_ck_deformable
+
+# per-worker state: group key -> (shared-memory handles, mesh, bodies)
+_WORKER_GROUPS = {}
+
+"""
+Worker initializer: attaches to every shared mesh once per process.
+"""
+def _init_worker(groups):
+    for key, (mesh_spec, bodies) in groups.items():
+        handles, mesh = attach_mesh(mesh_spec)
+        _WORKER_GROUPS[key] = (handles, mesh, bodies)
+
+"""
+Runs one dataset in a worker against its group's shared mesh.
+
+Returns (sample_file, out_file, seconds, registration summary).
+"""
+def run_dataset(key, sample_file, out_file, threshold, max_iter):
+    start = time.perf_counter()
+    _, mesh, (markersA, tipA, markersB, NA, NB, modes) = _WORKER_GROUPS[key]
+
+    frames = iter_sample(sample_file, NA, NB)
+    d = np.concatenate(list(compute_d_stream(markersA, markersB, tipA, frames)))
+    lambdas = None
+    if modes is None:
+        c, s, summary = compute_ck(mesh, d, threshold, max_iter, return_summary=True)
+    else:
+        c, s, lambdas, summary = compute_ck_deformable(mesh, d, modes, threshold, max_outer=max_iter,
+                                                       return_summary=True)
+
+    write_output(out_file, s, c, lambdas)
+    return sample_file, out_file, time.perf_counter() - start, summary
+
+"""
+Expands glob patterns (and plain paths) into a sorted, de-duplicated list.
+"""
+def expand_samples(patterns):
+    files = set()
+    for pattern in patterns:
+        matches = glob.glob(pattern)
+        if not matches and os.path.isfile(pattern):
+            matches = [pattern]
+        files.update(matches)
+    return sorted(files)
+
+"""
+Output path for a sample file, unique per input:
+    data/PA4-A-Debug-SampleReadingsTest.txt → <outdir>/PA4-A-Debug-output.txt
+    data/PA4-A-Demo-Fast-SampleReadingsTest.txt → <outdir>/PA4-A-Demo-Fast-output.txt
+"""
+def output_path(sample_file, outdir):
+    name = os.path.basename(sample_file)
+    prefix = re.sub(r"-?SampleReadingsTest\.txt$", "", name)
+    if prefix == name:
+        prefix = os.path.splitext(name)[0]
+    return os.path.join(outdir, f"{prefix}-output.txt")
+
+"""
+Groups sample files by the (A, B, mesh) files they run against.
+"""
+def group_samples(samples, data_dir, A_file=None, B_file=None, mesh_file=None):
+    if A_file or B_file or mesh_file:
+        if not (A_file and B_file and mesh_file):
+            raise ValueError("--A, --B and --mesh must be given together")
+        return {(A_file, B_file, mesh_file): samples}
+
+    groups = {}
+    for sample in samples:
+        match = re.match(r"PA(\d+)-", os.path.basename(sample))
+        if match is None:
+            raise ValueError(f"cannot infer problem number from {sample!r}; pass --A, --B and --mesh")
+        n = match.group(1)
+        key = (os.path.join(data_dir, f"Problem{n}-BodyA.txt"),
+               os.path.join(data_dir, f"Problem{n}-BodyB.txt"),
+               os.path.join(data_dir, f"Problem{n}MeshFile.sur"))
+        groups.setdefault(key, []).append(sample)
+    return groups
+
+"""
+Full batch run.
+
+Inputs:
+    samples    - Sample files or glob patterns.
+    outdir     - Directory for output files.
+    A_file, B_file, mesh_file - Optional explicit inputs for all samples.
+    data_dir   - Where ProblemN body/mesh files live when inferring them.
+    workers    - Process pool size (default: CPU count).
+    mode       - Closest-point search mode.
+    cache_mesh - Load meshes through the binary sidecar cache.
+    modes_file - Shape-mode file for deformable registration of mesh_file,
+                 which must then be given too. Without it, a
+                 ProblemNModes.txt next to ProblemNMeshFile.sur is used if present.
+    precision  - "float64" or "float32" mesh storage and search (see Mesh).
+
+Outputs:
+    Writes one output file per sample with write_output and returns a list
+    of (sample_file, out_file, seconds, RegistrationSummary).
+"""
+def run_all(samples, outdir="output", A_file=None, B_file=None, mesh_file=None, data_dir="data",
+            workers=None, mode="box", threshold=1e-3, max_iter=100, cache_mesh=False, modes_file=None,
+            precision="float64"):
+
+    samples = expand_samples(samples)
+    if not samples:
+        raise ValueError("no sample files matched")
+    if modes_file is not None and mesh_file is None:
+        raise ValueError(f"{modes_file}: a modes file needs the mesh it belongs to (mesh_file)")
+    os.makedirs(outdir, exist_ok=True)
+
+    # load bodies and mesh once per group, and share the mesh
+    handles, groups, jobs = [], {}, []
+    try:
+        for key, group in group_samples(samples, data_dir, A_file, B_file, mesh_file).items():
+            A_path, B_path, mesh_path = key
+            markersA, tipA, NA, _ = read_body(A_path)
+            markersB, _, NB, _ = read_body(B_path)
+
+            if cache_mesh:
+                mesh, _ = load_mesh(mesh_path, mode=mode)
+            else:
+                vertices, _, _, triangle_indices, neighbors = read_mesh(mesh_path)
+                mesh = Mesh(vertices, triangle_indices, mode=mode, neighbors=neighbors)
+            mesh = mesh.astype(PRECISIONS[precision])
+
+            # build the index once here so workers share it too
+            mesh.ensure_index(mode)
+
+            # deformable (PA5) groups: a ProblemNModes.txt beside the mesh file
+            modes = None
+            modes_path = modes_file or re.sub(r"MeshFile\.sur$", "Modes.txt", mesh_path)
+            if modes_path != mesh_path and os.path.isfile(modes_path):
+                modes, N_vertices, _ = read_modes(modes_path)
+                if N_vertices != mesh.vertices.shape[0]:
+                    raise ValueError(f"{modes_path}: {N_vertices} vertices per mode, "
+                                     f"but {mesh_path} has {mesh.vertices.shape[0]}")
+
+            h, mesh_spec = share_mesh(mesh)
+            handles += h
+            groups[key] = (mesh_spec, (markersA, tipA, markersB, NA, NB, modes))
+            jobs += [(key, sample) for sample in group]
+
+        # spread datasets across the pool
+        results = []
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(groups,)) as pool:
+            futures = [pool.submit(run_dataset, key, sample, output_path(sample, outdir), threshold, max_iter)
+                       for key, sample in jobs]
+            for future in as_completed(futures):
+                sample, out_file, seconds, summary = future.result()
+                print(f"{sample} -> {out_file} ({seconds:.2f}s; {summary})")
+                results.append((sample, out_file, seconds, summary))
+        return results
+    finally:
+        release(handles, unlink=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run many datasets in parallel")
+    parser.add_argument("--samples", required=False, nargs="+",
+                        default=["data/PA*-SampleReadingsTest.txt"])
+    parser.add_argument("--outdir", required=False, default="output")
+    parser.add_argument("--A", required=False, default=None)
+    parser.add_argument("--B", required=False, default=None)
+    parser.add_argument("--mesh", required=False, default=None)
+    parser.add_argument("--data", required=False, default="data")
+    parser.add_argument("--workers", required=False, type=int, default=None)
+    parser.add_argument("--mode", required=False, default="box", choices=SEARCH_MODES)
+    parser.add_argument("--threshold", required=False, default=1e-3)
+    parser.add_argument("--max_iter", required=False, default=100)
+    parser.add_argument("--cache_mesh", required=False, action="store_true")
+    parser.add_argument("--modes", required=False, default=None)
+    parser.add_argument("--precision", required=False, default="float64", choices=PRECISIONS)
+    args = parser.parse_args()
+    if args.modes and not args.mesh:
+        parser.error("--modes requires --mesh")
+
+    run_all(args.samples, args.outdir, args.A, args.B, args.mesh, args.data, args.workers,
+            args.mode, float(args.threshold), int(args.max_iter), args.cache_mesh, args.modes, args.precision)
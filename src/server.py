@@ -0,0 +1,346 @@
+"""
+Registration server source file: keeps meshes loaded and answers
+closest-point and registration requests over a socket.
+
+A CLI run pays interpreter start-up, NumPy import, mesh parsing and index
+build before any real work. The server does that once: meshes are loaded
+(and their index built) at start-up, placed in shared memory and attached
+by every worker of a process pool, as in src/run_all.py. An asyncio event
+loop accepts connections on a Unix socket or a localhost port and speaks
+the framed binary protocol of utils/protocol.py.
+
+Closest-point requests that arrive within --batch_window of each other
+for the same mesh are concatenated into one batched BVH search
+(BVH.closest_many) and the answers split back per request. A request's
+mode is checked but does not split batches: every mode is exact and
+breaks ties the same way. Requests
+on one connection may be pipelined; replies carry the request "id". All
+NumPy work runs in the pool, so the loop keeps accepting and batching
+while workers compute.
+
+Ops: ping, meshes, stats, closest (points -> c, normals, idx) and
+register (d -> R, t, s, c and the registration summary).
+
+Examples Usage:
+python src/server.py --mesh data/Problem4MeshFile.sur --socket /tmp/cis.sock
+python src/server.py --mesh pa3=data/Problem3MeshFile.sur pa4=data/Problem4MeshFile.sur --port 8765 --workers 4
+
+    from utils.protocol import RegistrationClient
+    with RegistrationClient("/tmp/cis.sock") as client:
+        R, t, s, c, summary = client.register("Problem4MeshFile", d)
+
+Author: Emily Guan
+"""
+
+import argparse
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from utils.IO import read_mesh
+from utils.mesh import Mesh, SEARCH_MODES, PRECISIONS
+from utils.mesh_cache import load_mesh
+from utils.protocol import read_message, write_message
+from utils.shared_mesh import share_mesh, attach_mesh, release
+from utils.transform_register import compute_Freg_multires, apply
+
+# registration options a request may set, with their defaults
+REGISTER_OPTIONS = {"threshold": 1e-3, "max_iter": 100, "levels": 1, "accelerate": False, "reuse": False,
+                    "time_budget": None}
+
+# per-worker state: mesh name -> (shared-memory handles, mesh)
+_WORKER_MESHES = {}
+
+"""
+Worker initializer: attaches to every shared mesh once per process.
+"""
+def _init_worker(specs):
+    for name, spec in specs.items():
+        _WORKER_MESHES[name] = attach_mesh(spec)
+
+"""
+Returns the worker's pid (used to start the pool before serving).
+"""
+def _worker_ready():
+    return os.getpid()
+
+"""
+One vectorized closest-point query in a worker: a single BVH.closest_many
+call over every point of the batch, normals interpolated from its
+triangles. All search modes are exact with the same tie rule (lowest
+triangle index), so the answer is the one any mode would give.
+
+Returns (closest points, normals, triangle indices), as float64.
+"""
+def closest_batch(name, points):
+    mesh = _WORKER_MESHES[name][1]
+    mesh.ensure_index("bvh")
+    idx, c, bary, _ = mesh.bvh.closest_many(points, mesh.batch)
+    return np.asarray(c, float), np.asarray(mesh.interpolated_normals(idx, bary), float), idx
+
+"""
+Full registration in a worker.
+
+Returns (R, t, s, c, summary dict).
+"""
+def register_samples(name, d, options):
+    mesh = _WORKER_MESHES[name][1]
+    R, t, summary = compute_Freg_multires(mesh, d, options["threshold"], options["max_iter"],
+                                          levels=options["levels"], accelerate=options["accelerate"],
+                                          reuse=options["reuse"], time_budget=options["time_budget"],
+                                          return_summary=True)
+    s = apply(d, R, t)
+    return R, t, s, mesh.find_closest_point(s), summary.as_dict()
+
+"""
+Checks a request's point array: (N, 3) and finite.
+"""
+def _points(arrays, key):
+    if key not in arrays:
+        raise ValueError(f"request has no {key!r} array")
+    points = np.asarray(arrays[key], float)
+    if points.ndim != 2 or points.shape[1] != 3:
+        raise ValueError(f"{key!r} must have shape (N, 3), got {points.shape}")
+    if not np.all(np.isfinite(points)):
+        raise ValueError(f"{key!r} has non-finite values")
+    return points
+
+
+class RegistrationServer:
+
+    """
+    Input:
+        meshes: dict name -> Mesh (indexes already built are shared too).
+        workers: process pool size (default: CPU count).
+        batch_window: seconds to collect closest-point requests into one batch.
+        max_batch: points at which a batch is sent without waiting.
+    """
+    def __init__(self, meshes, workers=None, batch_window=0.001, max_batch=65536):
+        self.meshes = dict(meshes)
+        self.batch_window = float(batch_window)
+        self.max_batch = int(max_batch)
+        self.stats = {"requests": 0, "closest_requests": 0, "batches": 0, "errors": 0}
+
+        self.handles, specs = [], {}
+        try:
+            for name, mesh in self.meshes.items():
+                h, specs[name] = share_mesh(mesh)
+                self.handles += h
+            self.pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(specs,))
+        except BaseException:
+            release(self.handles, unlink=True)
+            raise
+
+        self.server = None
+        self._pending = {}
+
+    """
+    Starts the pool and listens on a Unix socket (path) or on host:port
+    (port 0 picks a free one). Returns the bound address.
+    """
+    async def start(self, path=None, host="127.0.0.1", port=0):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.pool, _worker_ready)
+        if path is not None:
+            self.server = await asyncio.start_unix_server(self.handle, path=path)
+        else:
+            self.server = await asyncio.start_server(self.handle, host, port)
+        return self.address
+
+    @property
+    def address(self):
+        sockname = self.server.sockets[0].getsockname()
+        return sockname if isinstance(sockname, str) else sockname[:2]
+
+    """
+    Stops listening, shuts the pool down and frees the shared meshes.
+    """
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        self.pool.shutdown()
+        release(self.handles, unlink=True)
+        self.handles = []
+
+    """
+    Serves one connection: requests are answered concurrently and replies
+    are written whole, one at a time.
+    """
+    async def handle(self, reader, writer):
+        lock = asyncio.Lock()
+        tasks = set()
+        try:
+            while True:
+                try:
+                    message = await read_message(reader)
+                except (ValueError, asyncio.IncompleteReadError, ConnectionError) as e:
+                    # framing is lost: report and drop the connection
+                    self.stats["errors"] += 1
+                    async with lock:
+                        await write_message(writer, {"ok": False, "error": f"bad frame: {e}"})
+                    break
+                if message is None:
+                    break
+                task = asyncio.create_task(self._respond(writer, lock, *message))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, writer, lock, header, arrays):
+        self.stats["requests"] += 1
+        reply, out = {"id": header.get("id")}, None
+        try:
+            result, out = await self.dispatch(header, arrays)
+            reply.update(result, ok=True)
+        except Exception as e:
+            self.stats["errors"] += 1
+            reply.update(ok=False, error=f"{type(e).__name__}: {e}")
+        try:
+            async with lock:
+                await write_message(writer, reply, out)
+        except ConnectionError:
+            pass
+
+    """
+    Runs one request. Returns (reply header fields, reply arrays).
+    """
+    async def dispatch(self, header, arrays):
+        op = header.get("op")
+        if op == "ping":
+            return {}, None
+        if op == "stats":
+            return {"stats": dict(self.stats)}, None
+        if op == "meshes":
+            return {"meshes": {name: {"vertices": mesh.vertices.shape[0], "triangles": len(mesh),
+                                      "mode": mesh.mode, "precision": mesh.dtype.name}
+                               for name, mesh in self.meshes.items()}}, None
+
+        if op not in ("closest", "register"):
+            raise ValueError(f"unknown op {op!r}")
+        name = header.get("mesh")
+        if name not in self.meshes:
+            raise ValueError(f"unknown mesh {name!r}; loaded: {sorted(self.meshes)}")
+
+        if op == "closest":
+            mode = header.get("mode") or self.meshes[name].mode
+            if mode not in SEARCH_MODES:
+                raise ValueError(f"unknown mode {mode!r}")
+            c, normals, idx = await self.closest(name, _points(arrays, "points"))
+            return {}, {"c": c, "normals": normals, "idx": idx}
+
+        unknown = set(header) - set(REGISTER_OPTIONS) - {"op", "id", "mesh"}
+        if unknown:
+            raise ValueError(f"unknown registration options {sorted(unknown)}")
+        options = {k: header.get(k, v) if v is None else type(v)(header.get(k, v))
+                   for k, v in REGISTER_OPTIONS.items()}
+        d = _points(arrays, "d")
+        loop = asyncio.get_running_loop()
+        R, t, s, c, summary = await loop.run_in_executor(self.pool, register_samples, name, d, options)
+        return {"summary": summary}, {"R": R, "t": t, "s": s, "c": c}
+
+    """
+    Queues points for the next batch of the mesh and waits for their share
+    of the answer.
+    """
+    async def closest(self, name, points):
+        loop = asyncio.get_running_loop()
+        self.stats["closest_requests"] += 1
+        key = name
+        batch = self._pending.get(key)
+        if batch is None:
+            batch = self._pending[key] = []
+            loop.call_later(self.batch_window, self._flush, key, batch)
+
+        future = loop.create_future()
+        batch.append((points, future))
+        if sum(p.shape[0] for p, _ in batch) >= self.max_batch:
+            self._flush(key, batch)
+        return await future
+
+    """
+    Sends a pending batch to the pool (once: by size or by its timer).
+    """
+    def _flush(self, key, batch):
+        if self._pending.get(key) is not batch:
+            return
+        del self._pending[key]
+        self.stats["batches"] += 1
+        asyncio.ensure_future(self._run_batch(key, batch))
+
+    async def _run_batch(self, key, batch):
+        points = np.concatenate([p for p, _ in batch])
+        try:
+            c, normals, idx = await asyncio.get_running_loop().run_in_executor(
+                self.pool, closest_batch, key, points)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        splits = np.cumsum([p.shape[0] for p, _ in batch])[:-1]
+        for (_, future), parts in zip(batch, zip(*(np.split(a, splits) for a in (c, normals, idx)))):
+            if not future.done():
+                future.set_result(parts)
+
+"""
+Loads meshes given as "name=path" or "path" (named after the file), stored
+in precision ("float64" or "float32").
+"""
+def load_meshes(specs, mode="bvh", cache_mesh=False, precision="float64"):
+    meshes = {}
+    for spec in specs:
+        name, _, path = spec.rpartition("=")
+        name = name or os.path.splitext(os.path.basename(path))[0]
+        if cache_mesh:
+            mesh, _ = load_mesh(path, mode=mode)
+        else:
+            vertices, _, _, triangle_indices, neighbors = read_mesh(path)
+            mesh = Mesh(vertices, triangle_indices, mode=mode, neighbors=neighbors)
+        mesh = mesh.astype(PRECISIONS[precision])
+        mesh.ensure_index(mode)
+        meshes[name] = mesh
+    return meshes
+
+"""
+Runs a RegistrationServer until cancelled (Ctrl-C).
+"""
+async def serve(meshes, path=None, host="127.0.0.1", port=0, workers=None, batch_window=0.001,
+                max_batch=65536):
+    server = RegistrationServer(meshes, workers, batch_window, max_batch)
+    try:
+        address = await server.start(path, host, port)
+        print(f"serving {', '.join(meshes)} on {address}", flush=True)
+        await server.server.serve_forever()
+    finally:
+        await server.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Registration server")
+    parser.add_argument("--mesh", required=True, nargs="+", help="mesh files, optionally name=path")
+    parser.add_argument("--socket", required=False, default=None, help="Unix socket path")
+    parser.add_argument("--host", required=False, default="127.0.0.1")
+    parser.add_argument("--port", required=False, type=int, default=8765)
+    parser.add_argument("--workers", required=False, type=int, default=None)
+    parser.add_argument("--mode", required=False, default="bvh", choices=SEARCH_MODES)
+    parser.add_argument("--batch_window", required=False, type=float, default=1.0,
+                        help="milliseconds to collect closest-point requests into one batch")
+    parser.add_argument("--max_batch", required=False, type=int, default=65536)
+    parser.add_argument("--cache_mesh", required=False, action="store_true")
+    parser.add_argument("--precision", required=False, default="float64", choices=PRECISIONS)
+    args = parser.parse_args()
+
+    meshes = load_meshes(args.mesh, args.mode, args.cache_mesh, args.precision)
+    try:
+        asyncio.run(serve(meshes, args.socket, args.host, args.port, args.workers,
+                          args.batch_window / 1000.0, args.max_batch))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,109 @@
+"""
+Online tracking source file: reads tracker frames from stdin (or a file /
+pipe) as they arrive and writes s_k / c_k for each frame immediately.
+
+The input is a sample-readings file (header line, then N_s marker lines
+per frame); a sample count of 0 in the header means an open-ended feed
+read until end of stream. Each frame's d_k comes from the Arun step, the
+registration is refined over a sliding window of recent d_k, warm-started
+from the previous frame (utils.tracking.StreamingRegistration), and one
+output line (same columns as the batch output file, no header) is
+written and flushed per frame. Per-frame latency, from a parsed frame to
+its flushed output line, is reported as percentiles on stderr, and
+optionally as JSON with the count of frames over --frame_period.
+
+Examples Usage:
+cat data/PA4-A-Debug-SampleReadingsTest.txt | python src/stream.py --A data/Problem4-BodyA.txt --B data/Problem4-BodyB.txt --mesh data/Problem4MeshFile.sur
+python src/stream.py --A data/Problem4-BodyA.txt --B data/Problem4-BodyB.txt --mesh data/Problem4MeshFile.sur --input data/PA4-B-Debug-SampleReadingsTest.txt --out output/PA4-B-stream.txt --frame_period 20 --latency_file output/PA4-B-latency.json
+
+Author: Emily Guan
+"""
+
+import argparse
+import json
+import sys
+import time
+
+from utils.IO import read_body, read_mesh, iter_sample, format_output_row
+from utils.mesh import Mesh, SEARCH_MODES, PRECISIONS
+from utils.metrics import latency_percentiles
+from utils.tracking import StreamingRegistration
+from utils.transform_register import compute_d
+
+"""
+Runs the online loop.
+
+Inputs:
+    A_file, B_file, mesh_file - Body and mesh files.
+    source      - Open text stream (e.g. sys.stdin) or path of sample readings.
+    out         - Open text stream for the per-frame output lines.
+    mode        - Closest-point search mode for full queries.
+    window, max_iter, threshold, min_points - StreamingRegistration settings.
+    frame_period - Optional per-frame deadline in seconds.
+    time_budget - Optional per-frame registration budget in seconds.
+    precision   - "float64" or "float32" mesh storage and search (see Mesh).
+
+Outputs:
+    (latency report dict from utils.metrics.latency_percentiles,
+     per-frame latencies in seconds)
+"""
+def run_stream(A_file, B_file, mesh_file, source, out, mode="bvh", window=64, max_iter=5,
+               threshold=1e-3, min_points=6, frame_period=None, time_budget=None, precision="float64"):
+
+    markersA, tipA, NA, _ = read_body(A_file)
+    markersB, _, NB, _ = read_body(B_file)
+    vertices, _, _, triangle_indices, neighbors = read_mesh(mesh_file)
+    mesh = Mesh(vertices, triangle_indices, mode=mode, neighbors=neighbors, dtype=PRECISIONS[precision])
+    mesh.ensure_index(mode)
+
+    tracker = StreamingRegistration(mesh, window, max_iter, threshold, min_points, time_budget=time_budget)
+    latencies = []
+    for A_frame, B_frame in iter_sample(source, NA, NB, chunk_frames=1):
+        start = time.perf_counter()
+        d_k = compute_d(markersA, markersB, tipA, A_frame, B_frame)[0]
+        s_k, c_k = tracker.update(d_k)
+        out.write(format_output_row(s_k, c_k))
+        out.flush()
+        latencies.append(time.perf_counter() - start)
+
+    return latency_percentiles(latencies, frame_period), latencies
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Online tracking")
+    parser.add_argument("--A", required=True)
+    parser.add_argument("--B", required=True)
+    parser.add_argument("--mesh", required=True)
+    parser.add_argument("--input", required=False, default="-")
+    parser.add_argument("--out", required=False, default="-")
+    parser.add_argument("--mode", required=False, default="bvh", choices=SEARCH_MODES)
+    parser.add_argument("--window", required=False, type=int, default=64)
+    parser.add_argument("--max_iter", required=False, type=int, default=5)
+    parser.add_argument("--threshold", required=False, type=float, default=1e-3)
+    parser.add_argument("--min_points", required=False, type=int, default=6)
+    parser.add_argument("--frame_period", required=False, type=float, default=None,
+                        help="per-frame deadline in milliseconds")
+    parser.add_argument("--time_budget", required=False, type=float, default=None,
+                        help="per-frame registration budget in milliseconds")
+    parser.add_argument("--precision", required=False, default="float64", choices=PRECISIONS)
+    parser.add_argument("--latency_file", required=False, default=None)
+    args = parser.parse_args()
+
+    period = None if args.frame_period is None else args.frame_period / 1000.0
+    budget = None if args.time_budget is None else args.time_budget / 1000.0
+    source = sys.stdin if args.input == "-" else args.input
+    out = sys.stdout if args.out == "-" else open(args.out, "w")
+    try:
+        report, latencies = run_stream(args.A, args.B, args.mesh, source, out, args.mode, args.window,
+                                       args.max_iter, args.threshold, args.min_points, period, budget,
+                                       args.precision)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    summary = ", ".join(f"{k} {v:.2f} ms" for k, v in report.items() if k not in ("frames", "over_period"))
+    print(f"{report['frames']} frames, latency {summary}", file=sys.stderr)
+    if period is not None:
+        print(f"{report['over_period']} frames over the {args.frame_period:g} ms frame period", file=sys.stderr)
+    if args.latency_file:
+        with open(args.latency_file, "w") as f:
+            json.dump(dict(report, latencies_ms=[1000.0 * s for s in latencies]), f, indent=2)
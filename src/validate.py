@@ -0,0 +1,193 @@
+"""
+Validation source file: checks registration results against the shipped
+debug answers, in each mesh precision.
+
+Every data/<name>-Debug-Output.txt is a reference: for its sample file the
+full pipeline runs once per --precisions entry, and the largest deviation
+of s_k, c_k, |s_k - c_k| (and the PA5 mode weights) from the reference is
+reported. With both float64 and float32, the float32 run is also compared
+with the float64 one: the largest coordinate difference and how many
+output lines (as write_output formats them, 2 decimals) change.
+
+The exit code is nonzero if float32 moves any result by more than
+--tolerance from float64, or, with --max_deviation, if any precision is
+farther than that from a reference.
+
+Examples Usage:
+python src/validate.py
+python src/validate.py --datasets PA4-A-Debug PA5-A-Debug --mode bvh --out output/validate.json
+python src/validate.py --precisions float32 --max_deviation 0.05
+
+Author: Emily Guan
+"""
+
+import argparse
+import glob
+import json
+import os
+import re
+import sys
+import time
+
+import numpy as np
+
+from utils.IO import read_body, read_mesh, read_modes, iter_sample, read_output, format_output_row
+from utils.mesh import Mesh, SEARCH_MODES, PRECISIONS
+from utils.transform_register import compute_d_stream, compute_ck
+from utils.deformable import compute_ck_deformable
+from src.run_all import group_samples
+
+"""
+Names of the datasets with a debug answer in data_dir, e.g. "PA4-A-Debug".
+"""
+def debug_datasets(data_dir):
+    files = glob.glob(os.path.join(data_dir, "*-Debug-Output.txt"))
+    return sorted(os.path.basename(f)[:-len("-Output.txt")] for f in files)
+
+"""
+Bytes held by a mesh's vertex, per-face and built index arrays.
+"""
+def mesh_nbytes(mesh):
+    parts = [mesh.vertices, mesh.vertex_normals] + list(vars(mesh.batch).values())
+    if mesh.bvh is not None:
+        parts += [mesh.bvh.node_lb, mesh.bvh.node_ub]
+    return sum(a.nbytes for a in parts if isinstance(a, np.ndarray))
+
+"""
+Runs one dataset, e.g. "PA4-A-Debug", with the mesh stored in precision.
+PA5 datasets (a ProblemNModes.txt beside the mesh) are registered deformably.
+
+Output:
+    dict with s, c, lambdas (None without modes), summary, seconds, mesh_bytes
+"""
+def register_dataset(name, data_dir="data", mode="bvh", precision="float64", threshold=1e-3,
+                     max_iter=100, accelerate=False, reuse=False):
+    sample_file = os.path.join(data_dir, f"{name}-SampleReadingsTest.txt")
+    (A_file, B_file, mesh_file), = group_samples([sample_file], data_dir)
+    markersA, tipA, NA, _ = read_body(A_file)
+    markersB, _, NB, _ = read_body(B_file)
+    vertices, _, _, triangle_indices, neighbors = read_mesh(mesh_file)
+    modes_file = re.sub(r"MeshFile\.sur$", "Modes.txt", mesh_file)
+    modes = read_modes(modes_file)[0] if modes_file != mesh_file and os.path.isfile(modes_file) else None
+
+    mesh = Mesh(vertices, triangle_indices, mode=mode, neighbors=neighbors, dtype=PRECISIONS[precision])
+    d = np.concatenate(list(compute_d_stream(markersA, markersB, tipA, iter_sample(sample_file, NA, NB))))
+
+    start = time.perf_counter()
+    lambdas = None
+    if modes is None:
+        c, s, summary = compute_ck(mesh, d, threshold, max_iter, return_summary=True,
+                                   accelerate=accelerate, reuse=reuse)
+    else:
+        c, s, lambdas, summary = compute_ck_deformable(mesh, d, modes, threshold, return_summary=True)
+    seconds = time.perf_counter() - start
+
+    return {"s": s, "c": c, "lambdas": lambdas, "summary": summary, "seconds": seconds,
+            "mesh_bytes": mesh_nbytes(mesh)}
+
+"""
+Largest absolute differences between two results, each given as
+(s, c, lambdas); the distance column is recomputed from s and c.
+"""
+def max_deviation(ours, ref):
+    (s, c, lam), (s_ref, c_ref, lam_ref) = ours, ref
+    out = {"s": float(np.max(np.abs(s - s_ref))),
+           "c": float(np.max(np.abs(c - c_ref))),
+           "dist": float(np.max(np.abs(np.linalg.norm(s - c, axis=1) - np.linalg.norm(s_ref - c_ref, axis=1))))}
+    if lam is not None and lam_ref is not None:
+        out["lambdas"] = float(np.max(np.abs(np.asarray(lam) - np.asarray(lam_ref)), initial=0.0))
+    return out
+
+"""
+Number of output lines (write_output format) that differ between two results.
+"""
+def changed_rows(ours, other):
+    (s, c, lam), (s_other, c_other, lam_other) = ours, other
+    rows = sum(format_output_row(*a) != format_output_row(*b) for a, b in zip(zip(s, c), zip(s_other, c_other)))
+    if lam is not None and lam_other is not None:
+        rows += "".join(f"{x:10.4f}" for x in lam) != "".join(f"{x:10.4f}" for x in lam_other)
+    return int(rows)
+
+"""
+Validates datasets in each precision.
+
+Output:
+    dict dataset -> {precision: {"seconds", "iterations", "converged",
+    "mesh_bytes", "vs_reference": max_deviation dict}, and with both
+    precisions "float32_vs_float64": {"max", "changed_rows"}}
+"""
+def validate(datasets, data_dir="data", mode="bvh", precisions=("float64", "float32"), threshold=1e-3,
+             max_iter=100, accelerate=False, reuse=False):
+    report = {}
+    for name in datasets:
+        S, C, _, lambdas = read_output(os.path.join(data_dir, f"{name}-Output.txt"))
+        entry, results = {}, {}
+        for precision in precisions:
+            r = register_dataset(name, data_dir, mode, precision, threshold, max_iter, accelerate, reuse)
+            results[precision] = (r["s"], r["c"], r["lambdas"])
+            entry[precision] = {"seconds": r["seconds"], "iterations": len(r["summary"].records),
+                                "converged": r["summary"].converged, "mesh_bytes": r["mesh_bytes"],
+                                "vs_reference": max_deviation(results[precision], (S, C, lambdas))}
+        if "float32" in results and "float64" in results:
+            dev = max_deviation(results["float32"], results["float64"])
+            entry["float32_vs_float64"] = {"max": max(dev.values()),
+                                           "changed_rows": changed_rows(results["float32"], results["float64"])}
+        report[name] = entry
+    return report
+
+"""
+Datasets that fail: float32 farther than tolerance from float64, or (with
+max_deviation) any precision farther than that from the reference.
+"""
+def failures(report, tolerance=0.005, max_deviation=None):
+    failed = []
+    for name, entry in report.items():
+        if entry.get("float32_vs_float64", {}).get("max", 0.0) > tolerance:
+            failed.append(name)
+        elif max_deviation is not None and any(max(v["vs_reference"].values()) > max_deviation
+                                               for k, v in entry.items() if k in PRECISIONS):
+            failed.append(name)
+    return failed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Validate against the debug outputs")
+    parser.add_argument("--datasets", required=False, nargs="*", default=None,
+                        help="e.g. PA4-A-Debug (default: every *-Debug-Output.txt in --data)")
+    parser.add_argument("--data", required=False, default="data")
+    parser.add_argument("--mode", required=False, default="bvh", choices=SEARCH_MODES)
+    parser.add_argument("--precisions", required=False, nargs="+", default=["float64", "float32"],
+                        choices=PRECISIONS)
+    parser.add_argument("--threshold", required=False, default=1e-3)
+    parser.add_argument("--max_iter", required=False, default=100)
+    parser.add_argument("--accelerate", required=False, action="store_true")
+    parser.add_argument("--reuse", required=False, action="store_true")
+    parser.add_argument("--tolerance", required=False, type=float, default=0.005,
+                        help="largest allowed float32 vs float64 difference (mm)")
+    parser.add_argument("--max_deviation", required=False, type=float, default=None,
+                        help="largest allowed deviation from the debug answers (mm)")
+    parser.add_argument("--out", required=False, default=None)
+    args = parser.parse_args()
+
+    datasets = args.datasets if args.datasets else debug_datasets(args.data)
+    report = validate(datasets, args.data, args.mode, args.precisions, float(args.threshold),
+                      int(args.max_iter), args.accelerate, args.reuse)
+
+    for name, entry in report.items():
+        for precision in args.precisions:
+            r = entry[precision]
+            dev = " ".join(f"{k} {v:.4f}" for k, v in r["vs_reference"].items())
+            print(f"{name:20s} {precision:8s} max deviation: {dev}  "
+                  f"({r['iterations']} iterations, {r['seconds']:.2f}s, mesh {r['mesh_bytes'] / 1e6:.2f} MB)")
+        if "float32_vs_float64" in entry:
+            r = entry["float32_vs_float64"]
+            print(f"{name:20s} float32 vs float64: max {r['max']:.2e}, {r['changed_rows']} output lines changed")
+
+    if args.out:
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+    failed = failures(report, args.tolerance, args.max_deviation)
+    if failed:
+        print(f"FAILED: {', '.join(failed)}", file=sys.stderr)
+        sys.exit(1)
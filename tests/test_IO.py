@@ -0,0 +1,229 @@
+"""
+Tests for file readers in IO.py.
+Author: Emily Guan
+"""
+
+import io
+import os
+import tempfile
+import warnings
+import numpy as np
+from utils.IO import read_body, read_mesh, read_sample, iter_sample, read_modes, write_output, read_output
+
+def almost_equal(a, b, tol=1e-6):
+    return np.allclose(a, b, atol=tol)
+
+def write_tmp(text):
+    fd, path = tempfile.mkstemp(suffix=".txt")
+    with os.fdopen(fd, "w") as f:
+        f.write(text)
+    return path
+
+
+# Body file
+def test_read_body():
+    path = write_tmp("2 Body-test.txt\n 1.0 2.0 3.0\n\n -4.5 5 6\n 0.1 0.2 0.3\n")
+    try:
+        markers, tip, N, name = read_body(path)
+    finally:
+        os.remove(path)
+    assert N == 2 and name == "Body-test.txt", "header parsed incorrectly"
+    assert almost_equal(markers, [[1,2,3],[-4.5,5,6]]), "markers parsed incorrectly"
+    assert almost_equal(tip, [0.1,0.2,0.3]), "tip parsed incorrectly"
+
+
+# Mesh file
+def test_read_mesh():
+    path = write_tmp("3\n0 0 0\n1 0 0\n0 1 0\n1\n0 1 2 -1 -1 -1\n")
+    try:
+        vertices, NV, NT, indices, neighbors = read_mesh(path)
+    finally:
+        os.remove(path)
+    assert NV == 3 and NT == 1, "counts parsed incorrectly"
+    assert almost_equal(vertices[1], [1,0,0]), "vertices parsed incorrectly"
+    assert indices.dtype.kind == "i" and np.array_equal(indices, [[0,1,2]]), "indices parsed incorrectly"
+    assert np.array_equal(neighbors, [[-1,-1,-1]]), "neighbors parsed incorrectly"
+
+
+# Malformed input gives a clear error
+def test_malformed_files():
+    cases = [
+        (read_mesh, "abc\n0 0 0\n"),
+        (read_mesh, "3\n0 0 0\n1 0 0\n"),
+        (read_mesh, "1\n0 0 0\n2\n0 0 0 -1 -1 -1\n"),
+        (read_body, "Body 2\n1 2 3\n"),
+        (read_body, "1 Body\n1 2 x\n4 5 6\n"),
+        (read_body, "1 Body\n1 2 3\n4 5 6\nend\n"),
+        (read_mesh, "3\n0 0 0\n1 0 0\n0 1 0\n1\n0 1 2 -1 -1 -1 x\n"),
+        (read_mesh, "3\n0 0 0\n1 0 0\n0 1 0\n1\n0 1 1.7 -1 -1 -1\n"),
+    ]
+    for reader, text in cases:
+        path = write_tmp(text)
+        try:
+            reader(path)
+        except ValueError as e:
+            assert path in str(e), "error should name the file"
+        else:
+            assert False, f"{reader.__name__} accepted malformed input {text!r}"
+        finally:
+            os.remove(path)
+
+
+
+# Older NumPy only warns when parsing stops early; that is an error too
+def test_partial_parse_warning_is_an_error():
+    fromstring = np.fromstring
+
+    def old_fromstring(text, dtype=float, sep=' '):
+        warnings.warn("string or file could not be read to its end", DeprecationWarning)
+        return np.array([1.0, 2.0, 3.0, 4.0, 5.0, 6.0])
+
+    path = write_tmp("1 Body\n1 2 3\n4 5 6\nend\n")
+    np.fromstring = old_fromstring
+    try:
+        read_body(path)
+    except ValueError as e:
+        assert path in str(e), "error should name the file"
+    else:
+        assert False, "a partial parse was accepted"
+    finally:
+        np.fromstring = fromstring
+        os.remove(path)
+
+# Sample file: streamed chunks match the full read, D markers dropped
+def test_iter_sample_chunks():
+    lines = ["3, 4, test.txt 0"]
+    for k in range(4):
+        lines += [f"{k}, 0, 0", f"0, {k}, 0", f"9, 9, {k}"]
+    path = write_tmp("\n".join(lines) + "\n")
+    try:
+        A, B, N_s, N_samps = read_sample(path, 1, 1)
+        blocks = list(iter_sample(path, 1, 1, chunk_frames=3))
+    finally:
+        os.remove(path)
+
+    assert N_s == 3 and N_samps == 4, "header parsed incorrectly"
+    assert [len(a) for a, _ in blocks] == [3, 1], "chunks should hold chunk_frames frames"
+    assert almost_equal(np.concatenate([a for a, _ in blocks]), A), "streamed A differs from read_sample"
+    assert almost_equal(np.concatenate([b for _, b in blocks]), B), "streamed B differs from read_sample"
+    assert almost_equal(A[:, 0, 0], [0, 1, 2, 3]) and almost_equal(B[:, 0, 1], [0, 1, 2, 3]), "frames misread"
+
+
+# Sample count 0: frames are read from a stream until it ends
+def test_iter_sample_open_ended():
+    frames = "".join(f"{k}, 0, 0\n0, {k}, 0\n" for k in range(5))
+    blocks = list(iter_sample(io.StringIO("2, 0, feed\n" + frames), 1, 1, chunk_frames=1))
+    assert len(blocks) == 5, "every frame should be yielded"
+    assert almost_equal([a[0, 0, 0] for a, _ in blocks], range(5)), "frames misread"
+
+    path = write_tmp("2, 0, feed\n" + frames)
+    try:
+        A, B, _, N_samps = read_sample(path, 1, 1)
+    finally:
+        os.remove(path)
+    assert N_samps == 5 and almost_equal(B[:, 0, 1], range(5)), "open-ended file misread"
+
+    try:
+        list(iter_sample(io.StringIO("2, 0, feed\n" + frames + "9, 9, 9\n"), 1, 1))
+    except ValueError as e:
+        assert "middle of frame 5" in str(e), "error should name the partial frame"
+    else:
+        assert False, "a partial last frame should be rejected"
+
+
+# Modes file (mean shape + displacement modes)
+def test_read_modes():
+    path = write_tmp("Modes.txt Nvertices=2 Nmodes=1\n"
+                     "Mode 0 :Average Vertex Values\n 1.0, 2.0, 3.0\n 4.0, 5.0, 6.0\n"
+                     "Mode 1 :Vertex Displacements\n 0.1, 0.2, 0.3\n -0.4, -0.5, -0.6\n")
+    try:
+        modes, NV, NM = read_modes(path)
+    finally:
+        os.remove(path)
+    assert NV == 2 and NM == 1, "header parsed incorrectly"
+    assert modes.shape == (2, 2, 3), "modes shape incorrect"
+    assert almost_equal(modes[0], [[1,2,3],[4,5,6]]), "mean shape parsed incorrectly"
+    assert almost_equal(modes[1], [[0.1,0.2,0.3],[-0.4,-0.5,-0.6]]), "mode parsed incorrectly"
+
+    path = write_tmp("Modes.txt Nvertices=2\nMode 0 :\n1, 2, 3\n")
+    try:
+        read_modes(path)
+        assert False, "missing Nmodes should raise"
+    except ValueError as e:
+        assert path in str(e), "error should name the file"
+    finally:
+        os.remove(path)
+
+
+# PA5 output: mode weights on the second line
+def test_write_output_with_lambdas():
+    fd, path = tempfile.mkstemp(suffix=".txt")
+    os.close(fd)
+    try:
+        write_output(path, np.zeros((2, 3)), np.ones((2, 3)), lambdas=[112.66644, -3.5])
+        with open(path) as f:
+            lines = f.read().splitlines()
+    finally:
+        os.remove(path)
+    assert lines[0] == f"2 {path} 2", "PA5 header should end with the mode count"
+    assert lines[1] == "  112.6664   -3.5000", "mode weights formatted incorrectly"
+    assert len(lines) == 4, "one line per sample expected"
+
+
+# read_output parses what write_output writes (with and without mode weights)
+def test_read_output_round_trip():
+    fd, path = tempfile.mkstemp(suffix=".txt")
+    os.close(fd)
+    S = np.array([[1.234, -5.0, 2.0], [0.0, 0.5, 9.999]])
+    C = S + [0.0, 0.0, 1.0]
+    try:
+        for lambdas in (None, [112.66644, -3.5]):
+            write_output(path, S, C, lambdas)
+            s, c, dist, lam = read_output(path)
+            assert almost_equal(s, np.round(S, 2)) and almost_equal(c, np.round(C, 2)), "s / c read incorrectly"
+            assert almost_equal(dist, [1.0, 1.0]), "distance column read incorrectly"
+            if lambdas is None:
+                assert lam is None, "no mode weights expected"
+            else:
+                assert almost_equal(lam, [112.6664, -3.5]), "mode weights read incorrectly"
+    finally:
+        os.remove(path)
+
+
+# Test runner
+def main():
+    tests = [
+        test_read_body,
+        test_read_mesh,
+        test_malformed_files,
+        test_partial_parse_warning_is_an_error,
+        test_iter_sample_chunks,
+        test_iter_sample_open_ended,
+        test_read_modes,
+        test_write_output_with_lambdas,
+        test_read_output_round_trip,
+    ]
+
+    print("\nRunning IO tests...\n")
+    passed = failed = 0
+
+    for t in tests:
+        try:
+            t()
+            print(f"Passed {t.__name__}")
+            passed += 1
+        except AssertionError as e:
+            print(f"Failed {t.__name__}: {e}")
+            failed += 1
+        except Exception as e:
+            print(f"Failed {t.__name__}: unexpected error → {e}")
+            failed += 1
+
+    print(f"\nPassed: {passed}")
+    print(f"Failed: {failed}")
+
+    if failed == 0:
+        print("\nAll IO tests passed!")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Tests for Anderson acceleration.
+Author: Emily Guan
+"""
+
+import numpy as np
+from utils.anderson import AndersonAccelerator
+
+def almost_equal(a, b, tol=1e-6):
+    return np.allclose(a, b, atol=tol)
+
+# slowly contracting linear map x <- M x + v with fixed point x*
+def slow_map(seed=0, n=6, rate=0.97):
+    rng = np.random.default_rng(seed)
+    Q, _ = np.linalg.qr(rng.normal(size=(n, n)))
+    M = Q @ np.diag(np.linspace(0.5, rate, n)) @ Q.T
+    v = rng.normal(size=n)
+    return M, v, np.linalg.solve(np.eye(n) - M, v)
+
+def iterations_to(fn, x_star, tol=1e-8, max_iter=2000):
+    x = np.zeros_like(x_star)
+    for it in range(1, max_iter + 1):
+        x = fn(x)
+        if np.linalg.norm(x - x_star) < tol:
+            return it
+    return max_iter
+
+
+# Acceleration reaches the fixed point in far fewer map evaluations
+def test_accelerates_linear_tail():
+    M, v, x_star = slow_map()
+    plain = iterations_to(lambda x: M @ x + v, x_star)
+
+    acc = AndersonAccelerator(history=6)
+    fast = iterations_to(lambda x: acc.step(x, M @ x + v)[0], x_star)
+    assert fast * 5 < plain, f"expected a large speedup, got {plain} -> {fast}"
+
+
+# First step and refill periods return the plain image
+def test_plain_until_history():
+    acc = AndersonAccelerator(history=3)
+    x, g = np.zeros(2), np.ones(2)
+    x_next, accelerated = acc.step(x, g)
+    assert not accelerated and almost_equal(x_next, g), "first step should be the plain image"
+    assert acc.step(g, np.array([1.5, 1.2]))[1], "second step should extrapolate"
+
+    acc.reset(refill=True)
+    flags = [acc.step(np.full(2, k), np.full(2, k + 1.0 / (k + 1)))[1] for k in range(5)]
+    assert flags == [False, False, False, True, True], f"refill should wait for full history, got {flags}"
+
+
+# Test runner
+def main():
+    tests = [
+        test_accelerates_linear_tail,
+        test_plain_until_history,
+    ]
+
+    print("\nRunning Anderson tests...\n")
+    passed = failed = 0
+
+    for t in tests:
+        try:
+            t()
+            print(f"Passed {t.__name__}")
+            passed += 1
+        except AssertionError as e:
+            print(f"Failed {t.__name__}: {e}")
+            failed += 1
+        except Exception as e:
+            print(f"Failed {t.__name__}: unexpected error → {e}")
+            failed += 1
+
+    print(f"\nPassed: {passed}")
+    print(f"Failed: {failed}")
+
+    if failed == 0:
+        print("\nAll Anderson tests passed!")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Tests for the benchmark's baseline comparison.
+Author: Emily Guan
+"""
+
+import numpy as np
+from src.benchmark import compare_results, run_benchmark
+
+def almost_equal(a, b, tol=1e-6):
+    return np.allclose(a, b, atol=tol)
+
+def timings(**mins):
+    return {key.replace("__", "/"): {"min": v, "median": v, "runs": 1} for key, v in mins.items()}
+
+
+# A stage regresses only when it grew past the tolerance and the noise floor
+def test_compare_results_flags_regressions():
+    baseline = timings(parse__mesh=1.0, icp=2.0, build__bvh=0.001, only_old=1.0)
+    current = timings(parse__mesh=1.5, icp=1.0, build__bvh=0.0019, only_new=1.0)
+    rows = {key: (ratio, regressed) for key, _, _, ratio, regressed in compare_results(baseline, current, 0.2, 1e-3)}
+
+    assert sorted(rows) == ["build/bvh", "icp", "parse/mesh"], "only stages in both runs should be compared"
+    assert rows["parse/mesh"][1] and almost_equal(rows["parse/mesh"][0], 1.5), "50% slower should regress"
+    assert not rows["icp"][1] and almost_equal(rows["icp"][0], 0.5), "a faster stage is not a regression"
+    assert not rows["build/bvh"][1], "growth under the noise floor should be ignored"
+
+
+# The tolerance itself is allowed; anything past it is not
+def test_compare_results_tolerance_boundary():
+    baseline = timings(stage=1.0)
+    at = compare_results(baseline, timings(stage=1.25), tolerance=0.25, noise=0.0)
+    past = compare_results(baseline, timings(stage=1.2500001), tolerance=0.25, noise=0.0)
+    assert not at[0][4], "growth equal to the tolerance should pass"
+    assert past[0][4], "growth past the tolerance should regress"
+
+    zero = compare_results(timings(stage=0.0), timings(stage=0.5), noise=0.0)
+    assert zero[0][3] == float("inf") and zero[0][4], "a stage that was free and now is not should regress"
+
+
+# A small run produces every stage key for the synthetic mesh
+def test_run_benchmark_synthetic():
+    report = run_benchmark(datasets=(), scales=(200,), modes=("linear", "bvh"), repeat=1, n_points=20)
+    results = report["results"]
+    prefix = next(iter(results)).split("/")[0]
+    for stage in ("build/mesh", "build/bvh", "build/grid", "closest/linear", "closest/bvh"):
+        assert f"{prefix}/{stage}" in results, f"{stage} missing"
+    assert all(r["runs"] == 1 and r["min"] >= 0 for r in results.values()), "timings malformed"
+    assert compare_results(results, results) and not any(r[4] for r in compare_results(results, results)), \
+        "a run should not regress against itself"
+
+
+# Test runner
+def main():
+    tests = [
+        test_compare_results_flags_regressions,
+        test_compare_results_tolerance_boundary,
+        test_run_benchmark_synthetic,
+    ]
+
+    print("\nRunning benchmark tests...\n")
+    passed = failed = 0
+
+    for t in tests:
+        try:
+            t()
+            print(f"Passed {t.__name__}")
+            passed += 1
+        except AssertionError as e:
+            print(f"Failed {t.__name__}: {e}")
+            failed += 1
+        except Exception as e:
+            print(f"Failed {t.__name__}: unexpected error → {e}")
+            failed += 1
+
+    print(f"\nPassed: {passed}")
+    print(f"Failed: {failed}")
+
+    if failed == 0:
+        print("\nAll benchmark tests passed!")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Tests for BVH class.
+Author: Emily Guan
+"""
+
+import numpy as np
+from utils.bvh import BVH, box_dist2
+from utils.mesh import Mesh
+
+def almost_equal(a, b, tol=1e-6):
+    return np.allclose(a, b, atol=tol)
+
+def grid_mesh(n=6):
+    xs, ys = np.meshgrid(np.arange(n + 1), np.arange(n + 1), indexing='ij')
+    zs = np.sin(xs) * 0.3 + np.cos(ys) * 0.2
+    vertices = np.stack((xs.ravel(), ys.ravel(), zs.ravel()), axis=1)
+    indices = []
+    for i in range(n):
+        for j in range(n):
+            a, b = i * (n + 1) + j, (i + 1) * (n + 1) + j
+            indices += [(a, b, a + 1), (b, b + 1, a + 1)]
+    return Mesh(vertices, indices)
+
+
+# Box distance
+def test_box_dist2():
+    lb = np.array([[0,0,0], [0,0,0]])
+    ub = np.array([[1,1,1], [1,1,1]])
+    d2 = box_dist2(np.array([2.0, 0.5, 0.5]), lb, ub)
+    assert almost_equal(d2, [1.0, 1.0]), "box distance incorrect"
+    assert almost_equal(box_dist2(np.array([0.5,0.5,0.5]), lb, ub), 0), "inside box should be zero"
+
+
+# Tree structure: every triangle lands in exactly one leaf, children after parent
+def test_build_structure():
+    mesh = grid_mesh()
+    bvh = BVH(mesh.batch.lb, mesh.batch.ub, leaf_size=4)
+    leaves = np.flatnonzero(bvh.left < 0)
+    tris = np.sort(bvh.leaf_triangles(leaves))
+    assert np.array_equal(tris, np.arange(len(mesh))), "leaves do not partition triangles"
+    inner = np.flatnonzero(bvh.left >= 0)
+    assert np.all(bvh.left[inner] > inner) and np.all(bvh.right[inner] > inner), "children must follow parent"
+    assert np.all(bvh.count[leaves] <= 4), "leaf exceeds leaf_size"
+
+
+# Search matches linear
+def test_bvh_matches_linear():
+    mesh = grid_mesh()
+    rng = np.random.default_rng(1)
+    points = rng.uniform([-2, -2, -2], [8, 8, 2], (50, 3))
+
+    cp_lin = mesh.find_closest_point(points, use_linear=True)
+    cp_bvh = mesh.find_closest_point(points, mode="bvh")
+    assert almost_equal(cp_lin, cp_bvh), "bvh search disagrees with linear search"
+
+
+# Refit: unchanged bounds reproduce the tree, moved bounds stay exact
+def test_refit():
+    mesh = grid_mesh()
+    bvh = BVH(mesh.batch.lb, mesh.batch.ub, leaf_size=4)
+    built_lb, built_ub = bvh.node_lb.copy(), bvh.node_ub.copy()
+    assert almost_equal(bvh.refit(mesh.batch.lb, mesh.batch.ub), 1.0), "no-op refit should not grow"
+    assert np.array_equal(bvh.node_lb, built_lb) and np.array_equal(bvh.node_ub, built_ub), \
+        "no-op refit changed boxes"
+
+    rng = np.random.default_rng(2)
+    moved = mesh.vertices + rng.normal(0, 0.4, mesh.vertices.shape)
+    mesh.update_vertices(moved)
+    bvh.refit(mesh.batch.lb, mesh.batch.ub)
+    leaves = np.flatnonzero(bvh.left < 0)
+    for node in leaves:
+        tris = bvh.order[bvh.start[node]:bvh.start[node] + bvh.count[node]]
+        assert np.all(bvh.node_lb[node] <= mesh.batch.lb[tris]) and \
+            np.all(bvh.node_ub[node] >= mesh.batch.ub[tris]), "refit leaf does not cover its triangles"
+    inner = np.flatnonzero(bvh.left >= 0)
+    for child in (bvh.left[inner], bvh.right[inner]):
+        assert np.all(bvh.node_lb[inner] <= bvh.node_lb[child]) and \
+            np.all(bvh.node_ub[inner] >= bvh.node_ub[child]), "refit parent does not cover its children"
+
+    mesh.bvh = bvh
+    points = rng.uniform([-2, -2, -2], [8, 8, 2], (50, 3))
+    assert almost_equal(mesh.find_closest_point(points, mode="bvh"),
+                        mesh.find_closest_point(points, use_linear=True)), "refit bvh disagrees with linear"
+
+
+# Batched search over many points: exact, lowest index on ties (as linear)
+def test_closest_many_matches_linear():
+    mesh = grid_mesh(8)
+    mesh.build_bvh(leaf_size=4)
+    points = np.random.default_rng(4).uniform([-2, -2, -2], [10, 10, 2], (80, 3))
+    points[:8] = mesh.vertices[:8]  # on shared vertices: many exact ties
+
+    idx, cps, barys, dists = mesh.bvh.closest_many(points, mesh.batch)
+    cp_lin, _, idx_lin = mesh.find_closest_point(points, mode="linear", return_normals=True, return_indices=True)
+    assert np.array_equal(cps, cp_lin) and np.array_equal(idx, idx_lin), "closest_many disagrees with linear"
+    assert almost_equal(dists, np.linalg.norm(points - cps, axis=1)), "closest_many distances incorrect"
+    assert almost_equal(np.einsum('ij,ijk->ik', barys, mesh.vertices[mesh.indices[idx]]), cps), \
+        "barycentric coordinates do not give the closest points"
+
+    idx, cps, _, _ = mesh.bvh.closest_many(np.zeros((0, 3)), mesh.batch)
+    assert idx.shape == (0,) and cps.shape == (0, 3), "empty query should give empty results"
+
+
+# Test runner
+def main():
+    tests = [
+        test_box_dist2,
+        test_build_structure,
+        test_bvh_matches_linear,
+        test_refit,
+        test_closest_many_matches_linear,
+    ]
+
+    print("\nRunning BVH tests...\n")
+    passed = failed = 0
+
+    for t in tests:
+        try:
+            t()
+            print(f"Passed {t.__name__}")
+            passed += 1
+        except AssertionError as e:
+            print(f"Failed {t.__name__}: {e}")
+            failed += 1
+        except Exception as e:
+            print(f"Failed {t.__name__}: unexpected error → {e}")
+            failed += 1
+
+    print(f"\nPassed: {passed}")
+    print(f"Failed: {failed}")
+
+    if failed == 0:
+        print("\nAll BVH tests passed!")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Tests for deformable (shape-mode) registration.
+Author: Emily Guan
+"""
+
+import numpy as np
+from utils.mesh import Mesh
+from utils.deformable import deformed_vertices, mode_basis, compute_deformable, compute_ck_deformable
+from src.main import main as run_main
+from utils.transform_register import apply
+
+def almost_equal(a, b, tol=1e-6):
+    return np.allclose(a, b, atol=tol)
+
+def bowl_modes(n=10):
+    xs, ys = np.meshgrid(np.linspace(-1, 1, n + 1), np.linspace(-1, 1, n + 1), indexing='ij')
+    x, y = xs.ravel(), ys.ravel()
+    mean = np.stack((x, y, 0.5 * (x ** 2 + y ** 2)), axis=1)
+    mode1 = np.stack((0 * x, 0 * y, 0.1 * x * y), axis=1)
+    mode2 = np.stack((0 * x, 0 * y, 0.1 * np.sin(2 * x)), axis=1)
+    indices = []
+    for i in range(n):
+        for j in range(n):
+            a, b = i * (n + 1) + j, (i + 1) * (n + 1) + j
+            indices += [(a, b, a + 1), (b, b + 1, a + 1)]
+    return np.array([mean, mode1, mode2]), np.array(indices)
+
+
+# Barycentric blend of mode values reproduces points on the deformed surface
+def test_mode_basis():
+    modes, indices = bowl_modes(4)
+    lam = np.array([1.5, -2.0])
+    mesh = Mesh(deformed_vertices(modes, lam), indices)
+    tri = np.array([0, 5, 9])
+    bary = np.array([[0.2, 0.3, 0.5], [1, 0, 0], [0.1, 0.1, 0.8]])
+
+    q = mode_basis(modes, indices, tri, bary)
+    corners = np.stack((mesh.batch.a[tri], mesh.batch.b[tri], mesh.batch.c[tri]), axis=1)
+    expected = np.einsum('nj,njk->nk', bary, corners)
+    assert almost_equal(q[0] + np.einsum('m,mnk->nk', lam, q[1:]), expected), "mode basis incorrect"
+
+
+# Recovers mode weights and pose from points sampled on a deformed, moved surface
+def test_compute_deformable_recovers_weights():
+    modes, indices = bowl_modes()
+    lam_true = np.array([2.0, -1.5])
+    target = Mesh(deformed_vertices(modes, lam_true), indices)
+
+    rng = np.random.default_rng(4)
+    tri = rng.integers(0, len(target), 80)
+    w = rng.dirichlet([1, 1, 1], 80)
+    pts = w[:, :1] * target.batch.a[tri] + w[:, 1:2] * target.batch.b[tri] + w[:, 2:] * target.batch.c[tri]
+
+    angle = 0.03
+    R = np.array([[1, 0, 0], [0, np.cos(angle), -np.sin(angle)], [0, np.sin(angle), np.cos(angle)]])
+    t = np.array([0.02, -0.01, 0.03])
+    d = apply(pts - t, R.T, np.zeros(3))          # so that R d + t = pts
+
+    mesh = Mesh(modes[0], indices)
+    R_est, t_est, lam, summary = compute_deformable(mesh, d, modes, threshold=1e-9, tol=1e-8)
+
+    assert summary.converged, "mode weights should converge"
+    assert almost_equal(lam, lam_true, 1e-3), f"mode weights {lam} differ from {lam_true}"
+    assert almost_equal(apply(d, R_est, t_est), pts, 1e-3), "registered points should lie on the target"
+    assert almost_equal(mesh.vertices, target.vertices, 1e-3), "mesh should be deformed in place"
+
+
+# max_outer caps the rounds and use_linear reaches every closest-point query
+def test_compute_ck_deformable_options():
+    modes, indices = bowl_modes(6)
+    target = deformed_vertices(modes, [1.0, -0.5])[indices[::2]]
+    d = target.mean(axis=1) + [0.0, 0.0, 0.01]   # triangle centroids, off any shared edge
+    mesh = Mesh(modes[0], indices, mode="bvh")
+    c, s, lam, summary = compute_ck_deformable(mesh, d, modes, 1e-9, return_summary=True, max_outer=2)
+
+    mesh = Mesh(modes[0], indices, mode="bvh")
+    c2, s2, lam2, summary2 = compute_ck_deformable(mesh, d, modes, 1e-9, return_summary=True, max_outer=2,
+                                                   use_linear=True)
+    assert summary.iterations == 2 and summary2.iterations == 2, "max_outer should cap the rounds"
+    assert almost_equal(c, c2) and almost_equal(lam, lam2), "linear search should give the same answer"
+    assert all(r.tested == len(mesh) * d.shape[0] for r in summary2.records), \
+        "use_linear should test every triangle for every point"
+
+
+# Rigid-only CLI options are rejected with --modes instead of silently ignored
+def test_main_rejects_rigid_only_options_with_modes():
+    for option in ({"accelerate": True}, {"reuse": True}, {"levels": 3}, {"time_budget": 0.1}):
+        try:
+            run_main("A.txt", "B.txt", "mesh.sur", "sample.txt", "out.txt", modes_file="modes.txt", **option)
+            assert False, f"{option} with modes_file should raise"
+        except ValueError as e:
+            assert next(iter(option)) in str(e), f"error should name {option}: {e}"
+
+
+# Test runner
+def main():
+    tests = [
+        test_mode_basis,
+        test_compute_deformable_recovers_weights,
+        test_compute_ck_deformable_options,
+        test_main_rejects_rigid_only_options_with_modes,
+    ]
+
+    print("\nRunning deformable tests...\n")
+    passed = failed = 0
+
+    for t in tests:
+        try:
+            t()
+            print(f"Passed {t.__name__}")
+            passed += 1
+        except AssertionError as e:
+            print(f"Failed {t.__name__}: {e}")
+            failed += 1
+        except Exception as e:
+            print(f"Failed {t.__name__}: unexpected error → {e}")
+            failed += 1
+
+    print(f"\nPassed: {passed}")
+    print(f"Failed: {failed}")
+
+    if failed == 0:
+        print("\nAll deformable tests passed!")
+
+if __name__ == "__main__":
+    main()
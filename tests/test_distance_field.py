@@ -0,0 +1,86 @@
+"""
+Tests for DistanceField class.
+Author: Emily Guan
+"""
+
+import numpy as np
+from utils.distance_field import DistanceField
+from tests.test_bvh import grid_mesh
+
+def almost_equal(a, b, tol=1e-6):
+    return np.allclose(a, b, atol=tol)
+
+
+# Sampled distances and nearest triangles are exact at voxel centers
+def test_field_samples():
+    mesh = grid_mesh()
+    field = DistanceField(mesh.batch, cell_size=0.7)
+    centers = field.centers()
+    assert centers.shape[0] == len(field), "one center per voxel"
+
+    for v in range(0, len(field), 7):
+        _, _, dists = mesh.batch.closest_points(centers[v])
+        assert almost_equal(field.dist[v], dists.min()), "sampled distance incorrect"
+        assert almost_equal(dists[field.nearest[v]], dists.min()), "nearest triangle incorrect"
+        cands = field.cand_tris[field.cand_start[v]:field.cand_start[v + 1]]
+        assert field.nearest[v] in cands, "nearest triangle missing from candidates"
+        assert np.all(np.diff(cands) > 0), "candidates should be sorted and unique"
+
+
+
+# The BVH-pruned build keeps exactly the triangles within dist + 2r of each center
+def test_field_candidates_match_brute_force():
+    mesh = grid_mesh()
+    field = DistanceField(mesh.batch, cell_size=0.6, margin=1.5)
+    centers = field.centers()
+
+    for v in range(0, len(field), 5):
+        _, _, dists = mesh.batch.closest_points(centers[v])
+        bound = (dists.min() + 2.0 * field.radius) * (1 + mesh.batch.slack) + 1e-12
+        cands = field.cand_tris[field.cand_start[v]:field.cand_start[v + 1]]
+        assert np.array_equal(cands, np.flatnonzero(dists <= bound)), "candidate list differs from brute force"
+
+# Field search is exact inside the field, and falls back outside it
+def test_field_matches_linear():
+    mesh = grid_mesh()
+    mesh.build_field(cell_size=0.9, margin=0.5)
+    points = np.random.default_rng(11).uniform([-3, -3, -3], [9, 9, 3], (200, 3))
+
+    expected, e_norm = mesh.find_closest_point(points, mode="linear", return_normals=True)
+    found, f_norm = mesh.find_closest_point(points, mode="field", return_normals=True)
+    assert almost_equal(found, expected, 1e-12), "field closest points differ from linear search"
+    assert almost_equal(f_norm, e_norm, 1e-9), "field normals differ from linear search"
+    assert mesh.field.closest(np.array([50.0, 50, 50]), mesh.batch)[0] == -1, "outside point should miss"
+
+
+# Test runner
+def main():
+    tests = [
+        test_field_samples,
+        test_field_candidates_match_brute_force,
+        test_field_matches_linear,
+    ]
+
+    print("\nRunning DistanceField tests...\n")
+    passed = failed = 0
+
+    for t in tests:
+        try:
+            t()
+            print(f"Passed {t.__name__}")
+            passed += 1
+        except AssertionError as e:
+            print(f"Failed {t.__name__}: {e}")
+            failed += 1
+        except Exception as e:
+            print(f"Failed {t.__name__}: unexpected error → {e}")
+            failed += 1
+
+    print(f"\nPassed: {passed}")
+    print(f"Failed: {failed}")
+
+    if failed == 0:
+        print("\nAll DistanceField tests passed!")
+
+if __name__ == "__main__":
+    main()
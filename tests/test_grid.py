@@ -0,0 +1,79 @@
+"""
+Tests for UniformGrid class.
+Author: Emily Guan
+"""
+
+import numpy as np
+from utils.grid import UniformGrid
+from tests.test_bvh import grid_mesh
+
+def almost_equal(a, b, tol=1e-6):
+    return np.allclose(a, b, atol=tol)
+
+
+# Binning: every triangle appears in each cell its box overlaps
+def test_binning_covers_boxes():
+    mesh = grid_mesh()
+    grid = UniformGrid(mesh.batch.lb, mesh.batch.ub, cell_size=1.5)
+    for t in range(len(mesh)):
+        lo = np.clip(grid.cell_of(mesh.batch.lb[t]), 0, grid.dims - 1)
+        hi = np.clip(grid.cell_of(mesh.batch.ub[t]), 0, grid.dims - 1)
+        for ijk in np.ndindex(*(hi - lo + 1)):
+            cell = grid.flat(lo + np.array(ijk))
+            assert t in grid.cell_triangles(np.array([cell])), f"triangle {t} missing from cell {cell}"
+
+
+# Resolution control
+def test_resolution():
+    mesh = grid_mesh()
+    grid = UniformGrid(mesh.batch.lb, mesh.batch.ub, resolution=4)
+    assert grid.dims.max() == 4, "resolution should set cells along longest axis"
+
+    auto = mesh.build_grid()
+    assert auto.cell_size >= mesh.average_edge_length() - 1e-12, "auto cells smaller than average edge"
+
+
+# Shell search matches linear, including points outside the grid
+def test_grid_matches_linear():
+    mesh = grid_mesh()
+    rng = np.random.default_rng(2)
+    points = rng.uniform([-5, -5, -3], [11, 11, 3], (60, 3))
+
+    for res in (None, 3, 12):
+        mesh.build_grid(resolution=res)
+        cp_lin = mesh.find_closest_point(points, use_linear=True)
+        cp_grid = mesh.find_closest_point(points, mode="grid")
+        assert almost_equal(cp_lin, cp_grid), f"grid search disagrees with linear (resolution={res})"
+
+
+# Test runner
+def main():
+    tests = [
+        test_binning_covers_boxes,
+        test_resolution,
+        test_grid_matches_linear,
+    ]
+
+    print("\nRunning UniformGrid tests...\n")
+    passed = failed = 0
+
+    for t in tests:
+        try:
+            t()
+            print(f"Passed {t.__name__}")
+            passed += 1
+        except AssertionError as e:
+            print(f"Failed {t.__name__}: {e}")
+            failed += 1
+        except Exception as e:
+            print(f"Failed {t.__name__}: unexpected error → {e}")
+            failed += 1
+
+    print(f"\nPassed: {passed}")
+    print(f"Failed: {failed}")
+
+    if failed == 0:
+        print("\nAll UniformGrid tests passed!")
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,8 @@ Author: Emily Guan
 
 import numpy as np
 from utils.mesh import Mesh
+from utils.triangles import Triangle
+from tests.test_bvh import grid_mesh
 
 def almost_equal(a, b, tol=1e-6):
     return np.allclose(a, b, atol=tol)
@@ -27,6 +29,30 @@ def test_getitem():
     tri = mesh[0]
     assert almost_equal(tri.a, [0,0,0]), "__getitem__ returned wrong triangle."
 
+def test_getitem_view_matches_triangle():
+    vertices = [[1,2,3],[4,-1,10],[0,5,7],[2,2,2]]
+    mesh = Mesh(vertices, [(0,1,2),(0,2,3)])
+    for k, (i, j, l) in enumerate(mesh.indices):
+        ref = Triangle(vertices[i], vertices[j], vertices[l])
+        tri = mesh[k]
+        assert almost_equal(tri.lb, ref.lb) and almost_equal(tri.ub, ref.ub), "view bounds incorrect"
+        assert almost_equal(tri.normal, ref.normal), "view normal incorrect"
+        p = [0.5, 3, 4]
+        assert almost_equal(tri.closest_point(p)[0], ref.closest_point(p)[0]), "view closest point incorrect"
+    assert len(mesh.triangles) == 2, "triangles list should have one view per face"
+
+def test_vertex_normals():
+    vertices = [[0,0,0],[1,0,0],[0,1,0],[0,0,1]]
+    indices = [(0,1,2),(0,3,1)]
+    mesh = Mesh(vertices, indices)
+
+    expected = np.zeros((4,3))
+    for (i, j, l) in indices:
+        n = Triangle(vertices[i], vertices[j], vertices[l]).normal
+        expected[[i, j, l]] += n
+    expected /= np.linalg.norm(expected, axis=1)[:, None]
+    assert almost_equal(mesh.vertex_normals, expected), "vertex normals incorrect"
+
 def test_find_closest_point_linear_inside_triangle():
     vertices = [[0,0,0],[1,0,0],[0,1,0]]
     mesh = Mesh(vertices, [(0,1,2)])
@@ -94,15 +120,164 @@ def test_find_closest_point_matches_linear():
 
         assert almost_equal(cp_lin, cp_box), f"mismatch for point {p}"
 
+def test_neighbors_from_shared_edges():
+    vertices = [[0,0,0],[1,0,0],[0,1,0],[1,1,0]]
+    mesh = Mesh(vertices, [(0,1,2),(1,3,2)])
+    # edge opposite vertex 0 of triangle 0 is (1,2), shared with triangle 1
+    assert mesh.neighbors[0, 0] == 1, "shared edge not detected"
+    assert mesh.neighbors[1, 1] == 0, "shared edge not detected on other side"
+    assert (mesh.neighbors == -1).sum() == 4, "boundary edges should have no neighbor"
+
+    given = Mesh(vertices, [(0,1,2),(1,3,2)], neighbors=[[-1,-1,-1],[-1,-1,-1]])
+    assert np.array_equal(given.neighbors, mesh.neighbors), "-1 entries should be filled from edges"
+
+def test_find_closest_point_walk_matches_linear():
+    mesh = grid_mesh(5)
+
+    rng = np.random.default_rng(3)
+    points = rng.uniform([-1, -1, -1], [6, 6, 1], (40, 3))
+    cp_lin, idx = mesh.find_closest_point(points, use_linear=True, return_indices=True)
+
+    # good hints, bad hints and no hints must all give the exact answer
+    for hints in (idx, np.zeros(len(points), int), None):
+        cp_walk = mesh.find_closest_point(points, mode="walk", hints=hints)
+        assert almost_equal(cp_lin, cp_walk), "walk search disagrees with linear search"
+
+def test_find_closest_point_threaded_matches_serial():
+    mesh = grid_mesh(6)
+    points = np.random.default_rng(7).uniform([-1, -1, -1], [7, 7, 1], (50, 3))
+
+    # threaded chunks run the same search as a serial call; all but walk
+    # break exact ties like linear search
+    linear, l_norm, l_idx = mesh.find_closest_point(points, mode="linear", return_normals=True,
+                                                    return_indices=True)
+    for mode in ("linear", "box", "bvh", "grid", "walk", "field"):
+        hints = l_idx[::-1] if mode == "walk" else None
+        serial, s_norm, s_idx = mesh.find_closest_point(points, mode=mode, hints=hints, return_normals=True,
+                                                        return_indices=True)
+        mesh.set_workers(3, chunk_size=7)
+        try:
+            threaded, t_norm, t_idx = mesh.find_closest_point(points, mode=mode, hints=hints,
+                                                              return_normals=True, return_indices=True)
+        finally:
+            mesh.close()
+        assert np.array_equal(serial, threaded), f"threaded {mode} points differ from serial {mode}"
+        assert np.array_equal(s_norm, t_norm), f"threaded {mode} normals differ from serial {mode}"
+        assert np.array_equal(s_idx, t_idx), f"threaded {mode} indices differ from serial {mode}"
+        assert almost_equal(linear, threaded), f"threaded {mode} points differ from linear"
+        if mode != "walk":
+            assert np.array_equal(linear, threaded), f"threaded {mode} points differ from linear"
+            assert almost_equal(l_norm, t_norm, 1e-12), f"threaded {mode} normals differ from linear"
+            assert np.array_equal(l_idx, t_idx), f"threaded {mode} indices differ from linear"
+
+    # threaded walk searches start from the given hints
+    started = []
+    search_walk = mesh._search_walk
+    mesh._search_walk = lambda p, hint=-1: started.append(hint) or search_walk(p, hint)
+    mesh.set_workers(3, chunk_size=7)
+    try:
+        mesh.find_closest_point(points, mode="walk", hints=l_idx)
+    finally:
+        mesh.close()
+        del mesh._search_walk
+    assert sorted(started) == sorted(l_idx), "threaded walk ignored its hints"
+
+def test_update_vertices():
+    vertices = np.array([[0,0,0],[1,0,0],[0,1,0],[1,1,0.5]], float)
+    indices = [(0,1,2),(1,3,2)]
+    mesh = Mesh(vertices, indices)
+    bvh = mesh.build_bvh()
+    batch = mesh.batch
+
+    moved = vertices + [0, 0, 2.0]
+    moved[3, 2] = -1.0
+    mesh.update_vertices(moved, max_growth=np.inf)
+    fresh = Mesh(moved, indices)
+
+    assert mesh.bvh is bvh and mesh.batch is batch, "bvh and batch should be updated in place"
+    assert almost_equal(mesh.batch.a, fresh.batch.a) and almost_equal(mesh.batch.lb, fresh.batch.lb), \
+        "face arrays not recomputed"
+    assert almost_equal(mesh.vertex_normals, fresh.vertex_normals), "vertex normals not recomputed"
+    p = [[0.3, 0.3, 5.0], [0.9, 0.9, -3.0]]
+    assert almost_equal(mesh.find_closest_point(p, mode="bvh"), fresh.find_closest_point(p, use_linear=True)), \
+        "queries should see the new geometry"
+
+# Refit vs rebuild decisions for each index
+def test_update_vertices_refit_or_rebuild():
+    mesh = grid_mesh()
+    bvh, grid = mesh.build_bvh(), mesh.build_grid()
+    mesh.build_field()
+
+    # small move inside the grid: both refit, field dropped
+    mesh.update_vertices(mesh.vertices * [1, 1, 0.5])
+    assert mesh.bvh is bvh and mesh.grid is grid and mesh.field is None, "small move should refit"
+
+    # large stretch: bvh area blows past max_growth, mesh leaves the grid
+    rng = np.random.default_rng(4)
+    mesh.update_vertices(mesh.vertices + rng.normal(0, 3.0, mesh.vertices.shape), max_growth=1.5)
+    assert mesh.bvh is not bvh and mesh.grid is not grid, "degraded indexes should be rebuilt"
+    assert almost_equal(mesh.bvh.growth(), 1.0), "rebuilt tree should start fresh"
+
+    mesh.update_vertices(mesh.vertices, rebuild=True)
+    points = rng.uniform(-3, 9, (40, 3))
+    expected = mesh.find_closest_point(points, use_linear=True)
+    for mode in ("bvh", "grid", "walk", "field"):
+        assert almost_equal(mesh.find_closest_point(points, mode=mode), expected), f"{mode} wrong after update"
+
+# Vertex-clustering decimation: fewer, valid triangles; cached until vertices move
+def test_decimate():
+    mesh = grid_mesh(12)
+    cell = 2 * mesh.average_edge_length()
+    coarse = mesh.decimated(cell)
+
+    assert 0 < len(coarse) < len(mesh), "decimation should drop triangles"
+    assert np.all(np.isfinite(coarse.batch.normal)), "decimated mesh has degenerate triangles"
+    assert np.all(coarse.vertices >= mesh.vertices.min(axis=0) - 1e-9) and \
+        np.all(coarse.vertices <= mesh.vertices.max(axis=0) + 1e-9), "cluster means outside the mesh"
+    assert mesh.decimated(cell) is coarse, "decimated copy should be cached"
+
+    mesh.update_vertices(mesh.vertices + [0, 0, 1.0])
+    assert mesh.decimated(cell) is not coarse, "cache should be cleared when vertices move"
+
+# float32 storage: half the bytes, same closest points to float32 accuracy,
+# results still returned as float64
+def test_float32_mesh():
+    mesh = grid_mesh(12)
+    single = mesh.astype(np.float32)
+    assert single.dtype == np.float32 and single.batch.dtype == np.float32, "float32 storage expected"
+    assert single.batch.a.nbytes * 2 == mesh.batch.a.nbytes, "per-face arrays should halve"
+    assert mesh.astype(float) is mesh, "same-dtype astype should not copy"
+
+    points = np.random.default_rng(1).uniform(mesh.vertices.min(axis=0) - 1, mesh.vertices.max(axis=0) + 1, (200, 3))
+    expected = mesh.find_closest_point(points, mode="linear")
+    for mode in ("linear", "box", "bvh", "grid", "walk", "field"):
+        c = single.find_closest_point(points, mode=mode)
+        assert c.dtype == np.float64, f"{mode} should return float64 points"
+        assert almost_equal(c, expected, 1e-4), f"{mode} float32 points differ"
+    assert single.bvh.node_lb.dtype == np.float32, "BVH boxes should keep float32"
+
+    single.update_vertices(mesh.vertices + [0, 0, 1.0])
+    assert single.dtype == np.float32, "update_vertices should keep the precision"
+    assert single.decimate(2 * mesh.average_edge_length()).dtype == np.float32, "decimate should keep the precision"
+
 def main():
     tests = [
         test_mesh_build,
         test_getitem,
+        test_getitem_view_matches_triangle,
+        test_vertex_normals,
         test_find_closest_point_linear_inside_triangle,
         test_find_closest_point_linear_outside_edge,
         test_find_closest_point_linear_outside_vertex,
         test_find_closest_point_multiple_triangles,
         test_find_closest_point_matches_linear,
+        test_neighbors_from_shared_edges,
+        test_find_closest_point_walk_matches_linear,
+        test_find_closest_point_threaded_matches_serial,
+        test_update_vertices,
+        test_update_vertices_refit_or_rebuild,
+        test_decimate,
+        test_float32_mesh,
     ]
 
     print("\nRunning Mesh tests...\n")
@@ -0,0 +1,188 @@
+"""
+Tests for the binary mesh cache.
+Author: Emily Guan
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+from utils.mesh import Mesh
+from utils.mesh_cache import load_mesh, cache_path, load_index, save_index
+
+def almost_equal(a, b, tol=1e-6):
+    return np.allclose(a, b, atol=tol)
+
+MESH_TEXT = "4\n0 0 0\n1 0 0\n0 1 0\n0 0 1\n2\n0 1 2 -1 -1 -1\n0 3 1 -1 -1 -1\n"
+
+def array_file(path, name):
+    cache_dir = cache_path(path)
+    with open(os.path.join(cache_dir, "meta.json")) as f:
+        return os.path.join(cache_dir, json.load(f)["dir"], name + ".npy")
+
+def with_mesh_file(test):
+    def run():
+        tmp = tempfile.mkdtemp()
+        path = os.path.join(tmp, "mesh.sur")
+        with open(path, "w") as f:
+            f.write(MESH_TEXT)
+        try:
+            test(path)
+        finally:
+            shutil.rmtree(tmp)
+    run.__name__ = test.__name__
+    return run
+
+
+# Second load comes from the cache and matches the first
+@with_mesh_file
+def test_cache_roundtrip(path):
+    mesh, hit = load_mesh(path)
+    assert not hit and os.path.isdir(cache_path(path)), "first load should build the cache"
+
+    cached, hit = load_mesh(path)
+    assert hit, "second load should use the cache"
+    assert isinstance(cached.vertices, np.memmap), "cached arrays should be memory-mapped"
+    for name in ("vertices", "indices", "neighbors", "vertex_normals"):
+        assert np.array_equal(getattr(mesh, name), getattr(cached, name)), f"{name} differs after cache load"
+    assert almost_equal(mesh.batch.normal, cached.batch.normal), "face normals differ after cache load"
+
+    p = [[0.2, 0.2, 1.0], [2, -1, 0.5]]
+    assert almost_equal(mesh.find_closest_point(p), cached.find_closest_point(p)), "cached mesh answers differ"
+
+
+# Editing the source invalidates the cache
+@with_mesh_file
+def test_cache_stale(path):
+    load_mesh(path)
+    with open(path, "w") as f:
+        f.write(MESH_TEXT.replace("0 0 1\n", "0 0 2\n", 1))
+
+    mesh, hit = load_mesh(path)
+    assert not hit, "stale cache should be rebuilt"
+    assert almost_equal(mesh.vertices[3], [0, 0, 2]), "rebuilt mesh should reflect the new source"
+    assert load_mesh(path)[1], "rebuilt cache should be used next time"
+
+
+# A damaged array file is detected and rebuilt
+@with_mesh_file
+def test_cache_corrupt(path):
+    load_mesh(path)
+    npy = array_file(path, "vertices")
+    with open(npy, "r+b") as f:
+        f.seek(-4, os.SEEK_END)
+        f.write(b"\xff\xff\xff\xff")
+
+    mesh, hit = load_mesh(path)
+    assert not hit, "corrupted cache should be rebuilt"
+    assert almost_equal(mesh.vertices[3], [0, 0, 1]), "rebuilt mesh incorrect"
+
+
+
+# A damaged array that keeps its size and time is only caught by the full check
+@with_mesh_file
+def test_cache_verify(path):
+    load_mesh(path)
+    npy = array_file(path, "vertices")
+    stat = os.stat(npy)
+    with open(npy, "r+b") as f:
+        f.seek(-4, os.SEEK_END)
+        f.write(b"\xff\xff\xff\xff")
+    os.utime(npy, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+    assert load_mesh(path)[1], "the default check only compares size and time"
+    mesh, hit = load_mesh(path, verify=True)
+    assert not hit, "verify should catch the damaged bytes"
+    assert almost_equal(mesh.vertices[3], [0, 0, 1]), "rebuilt mesh incorrect"
+    assert load_mesh(path, verify=True)[1], "rebuilt cache should pass the full check"
+
+
+# Replacing a cache swaps generations: one left behind, earlier maps stay readable
+@with_mesh_file
+def test_cache_replace(path):
+    load_mesh(path)
+    old, _ = load_mesh(path)
+    with open(path, "w") as f:
+        f.write(MESH_TEXT.replace("0 0 1\n", "0 0 2\n", 1))
+    load_mesh(path)
+
+    cache_dir = cache_path(path)
+    assert sorted(os.listdir(cache_dir)) == sorted(["meta.json", os.path.basename(os.path.dirname(
+        array_file(path, "vertices")))]), "old generation or temporary files left behind"
+    assert almost_equal(old.vertices[3], [0, 0, 1]), "a loaded mesh should survive the replacement"
+    mesh, hit = load_mesh(path)
+    assert hit and almost_equal(mesh.vertices[3], [0, 0, 2]), "new cache should be used"
+
+
+# A cache in the old single-directory layout is rebuilt and its files removed
+@with_mesh_file
+def test_cache_old_layout(path):
+    cache_dir = cache_path(path)
+    os.makedirs(cache_dir)
+    np.save(os.path.join(cache_dir, "vertices.npy"), np.zeros((4, 3)))
+    with open(os.path.join(cache_dir, "meta.json"), "w") as f:
+        json.dump({"version": 1, "key": "", "arrays": {"vertices": {}}, "extra": {}}, f)
+
+    mesh, hit = load_mesh(path)
+    assert not hit and almost_equal(mesh.vertices[3], [0, 0, 1]), "old layout should be rebuilt"
+    assert not os.path.exists(os.path.join(cache_dir, "vertices.npy")), "old array files should be removed"
+    assert load_mesh(path)[1], "rebuilt cache should be used next time"
+
+# Saved BVH / grid / distance field reload zero-copy and only for the same geometry
+@with_mesh_file
+def test_index_roundtrip(path):
+    mesh, _ = load_mesh(path)
+    index_dir = path + ".index"
+    p = [[0.2, 0.2, 1.0], [2, -1, 0.5], [-1, 3, -2]]
+    expected = mesh.find_closest_point(p, use_linear=True)
+
+    for kind in ("bvh", "grid", "field"):
+        save_index(index_dir, mesh, kind)
+        fresh = Mesh(mesh.vertices, mesh.indices)
+        index = load_index(index_dir, fresh, kind)
+        assert index is not None, f"saved {kind} should load"
+        array = {"bvh": "order", "grid": "cell_start", "field": "cand_tris"}[kind]
+        assert isinstance(getattr(index, array), np.memmap), "index should be memory-mapped"
+        assert almost_equal(fresh.find_closest_point(p, mode=kind), expected), f"reloaded {kind} answers differ"
+
+        other = Mesh(np.asarray(mesh.vertices) + 1.0, mesh.indices)
+        assert load_index(index_dir, other, kind) is None, "index must not load for different geometry"
+        assert load_index(index_dir, fresh, "grid" if kind == "bvh" else "bvh") is None, "index kind must match"
+
+
+# Test runner
+def main():
+    tests = [
+        test_cache_roundtrip,
+        test_cache_stale,
+        test_cache_corrupt,
+        test_cache_verify,
+        test_cache_replace,
+        test_cache_old_layout,
+        test_index_roundtrip,
+    ]
+
+    print("\nRunning mesh cache tests...\n")
+    passed = failed = 0
+
+    for t in tests:
+        try:
+            t()
+            print(f"Passed {t.__name__}")
+            passed += 1
+        except AssertionError as e:
+            print(f"Failed {t.__name__}: {e}")
+            failed += 1
+        except Exception as e:
+            print(f"Failed {t.__name__}: unexpected error → {e}")
+            failed += 1
+
+    print(f"\nPassed: {passed}")
+    print(f"Failed: {failed}")
+
+    if failed == 0:
+        print("\nAll mesh cache tests passed!")
+
+if __name__ == "__main__":
+    main()
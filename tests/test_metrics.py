@@ -0,0 +1,108 @@
+"""
+Tests for registration metrics.
+Author: Emily Guan
+"""
+
+import contextlib
+import io
+
+import numpy as np
+from utils.metrics import QueryCounter, RegistrationSummary
+from utils.transform_register import compute_Freg, apply
+from tests.test_bvh import grid_mesh
+
+def almost_equal(a, b, tol=1e-6):
+    return np.allclose(a, b, atol=tol)
+
+def offset_samples(mesh, n=40, seed=3):
+    rng = np.random.default_rng(seed)
+    idx = rng.integers(0, len(mesh), n)
+    pts = mesh.batch.a[idx] + 0.3 * mesh.batch.ab[idx] + 0.3 * mesh.batch.ac[idx]
+    angle = 0.02
+    R = np.array([[np.cos(angle), -np.sin(angle), 0], [np.sin(angle), np.cos(angle), 0], [0, 0, 1]])
+    return apply(pts, R, np.array([0.05, -0.03, 0.02]))
+
+
+# Counter arithmetic
+def test_query_counter():
+    counter = QueryCounter()
+    counter.add_queries(3, 10)
+    counter.add_tested(12)
+    assert counter.snapshot() == (3, 12, 18), "queries / tested / rejected incorrect"
+
+
+# One record per iteration, delivered to callbacks, consistent with the summary
+def test_compute_Freg_summary_and_callbacks():
+    mesh = grid_mesh()
+    d = offset_samples(mesh)
+    seen = []
+
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        R, t, summary = compute_Freg(mesh, d, threshold=1e-6, max_iter=20,
+                                     callbacks=[seen.append], return_summary=True)
+
+    assert out.getvalue() == "", "compute_Freg should not print by default"
+    assert isinstance(summary, RegistrationSummary), "summary object expected"
+    assert [r.iteration for r in seen] == list(range(summary.iterations)), "callback per iteration"
+    assert summary.queries == summary.iterations * d.shape[0], "one query per point per iteration"
+    assert summary.tested + summary.rejected >= summary.queries * len(mesh) - 1e-9, "counts incomplete"
+    assert summary.rejected > 0, "box search should reject triangles"
+    assert almost_equal(seen[-1].R, R) and almost_equal(seen[-1].t, t), "last record holds final pose"
+    assert summary.final_eps == seen[-1].eps, "final eps mismatch"
+    assert mesh.counter is None, "counter should be detached after registration"
+
+
+# Linear search evaluates every triangle
+def test_linear_rejects_nothing():
+    mesh = grid_mesh()
+    d = offset_samples(mesh, n=10)
+    _, _, summary = compute_Freg(mesh, d, max_iter=2, use_linear=True, return_summary=True)
+    assert summary.rejected == 0, "linear search should not reject triangles"
+    assert summary.tested == summary.queries * len(mesh), "linear search should test every triangle"
+
+
+# Verbose prints one line per iteration
+def test_verbose_prints():
+    mesh = grid_mesh()
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        _, _, summary = compute_Freg(mesh, offset_samples(mesh), max_iter=3, verbose=True,
+                                     return_summary=True)
+    lines = out.getvalue().splitlines()
+    assert len(lines) == summary.iterations, "verbose should print one line per iteration"
+    assert "iterations" in str(summary) and summary.as_dict()["iterations"] == summary.iterations
+
+
+# Test runner
+def main():
+    tests = [
+        test_query_counter,
+        test_compute_Freg_summary_and_callbacks,
+        test_linear_rejects_nothing,
+        test_verbose_prints,
+    ]
+
+    print("\nRunning metrics tests...\n")
+    passed = failed = 0
+
+    for t in tests:
+        try:
+            t()
+            print(f"Passed {t.__name__}")
+            passed += 1
+        except AssertionError as e:
+            print(f"Failed {t.__name__}: {e}")
+            failed += 1
+        except Exception as e:
+            print(f"Failed {t.__name__}: unexpected error → {e}")
+            failed += 1
+
+    print(f"\nPassed: {passed}")
+    print(f"Failed: {failed}")
+
+    if failed == 0:
+        print("\nAll metrics tests passed!")
+
+if __name__ == "__main__":
+    main()
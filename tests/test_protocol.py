@@ -0,0 +1,70 @@
+"""
+Tests for the framed binary protocol.
+Author: Emily Guan
+"""
+
+import numpy as np
+from utils.protocol import encode_message, decode_payload, MAX_FRAME
+
+def almost_equal(a, b, tol=1e-6):
+    return np.allclose(a, b, atol=tol)
+
+
+# Header and arrays survive a round trip with dtype and shape intact
+def test_message_roundtrip():
+    arrays = {"points": np.arange(12.0).reshape(4, 3), "idx": np.array([3, 1, 2], np.int32),
+              "empty": np.zeros((0, 3))}
+    frame = encode_message({"op": "closest", "id": 7, "eps": np.float64(0.5), "n": np.int64(3)}, arrays)
+    assert int.from_bytes(frame[:4], "big") == len(frame) - 4, "length prefix wrong"
+
+    header, out = decode_payload(frame[4:])
+    assert header == {"op": "closest", "id": 7, "eps": 0.5, "n": 3}, "header changed"
+    for name, a in arrays.items():
+        assert out[name].dtype == a.dtype and out[name].shape == a.shape, f"{name} dtype / shape changed"
+        assert np.array_equal(out[name], a), f"{name} values changed"
+
+
+# Truncated, padded or garbled payloads raise ValueError
+def test_malformed_messages():
+    payload = encode_message({"op": "x"}, {"a": np.ones((2, 3))})[4:]
+    bad = [payload[:2], payload[:10], payload[:-8], payload + b"\0", b"\0\0\0\2{]", b"\0\0\0\2[]"]
+    for data in bad:
+        try:
+            decode_payload(data)
+        except ValueError:
+            pass
+        else:
+            assert False, f"accepted malformed payload {data[:16]!r}"
+    assert MAX_FRAME >= 1 << 20, "frame limit too small for real point sets"
+
+
+# Test runner
+def main():
+    tests = [
+        test_message_roundtrip,
+        test_malformed_messages,
+    ]
+
+    print("\nRunning protocol tests...\n")
+    passed = failed = 0
+
+    for t in tests:
+        try:
+            t()
+            print(f"Passed {t.__name__}")
+            passed += 1
+        except AssertionError as e:
+            print(f"Failed {t.__name__}: {e}")
+            failed += 1
+        except Exception as e:
+            print(f"Failed {t.__name__}: unexpected error → {e}")
+            failed += 1
+
+    print(f"\nPassed: {passed}")
+    print(f"Failed: {failed}")
+
+    if failed == 0:
+        print("\nAll protocol tests passed!")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Tests for motion-bounded closest-point reuse.
+Author: Emily Guan
+"""
+
+import numpy as np
+from utils.reuse import ClosestPointCache
+from utils.metrics import QueryCounter
+from utils.transform_register import compute_Freg
+from tests.test_bvh import grid_mesh
+from tests.test_metrics import offset_samples
+
+def almost_equal(a, b, tol=1e-6):
+    return np.allclose(a, b, atol=tol)
+
+
+# Cached answers equal full queries while points drift by small and large steps
+def test_cache_matches_full_query():
+    mesh = grid_mesh(10)
+    cache = ClosestPointCache(mesh, budget=0.3)
+    counter = QueryCounter()
+    mesh.attach_counter(counter)
+
+    rng = np.random.default_rng(6)
+    points = rng.uniform([-1, -1, -1], [11, 11, 1], (40, 3))
+    for step in (0.0, 0.05, 0.1, 1.0, 0.02):
+        points = points + rng.normal(0, step, points.shape)
+        c, normals, idx = cache.query(points)
+        c_ref, n_ref, i_ref = mesh.find_closest_point(points, return_normals=True, return_indices=True)
+        assert np.array_equal(c, c_ref) and np.array_equal(idx, i_ref), f"cache wrong after step {step}"
+        assert almost_equal(normals, n_ref, 1e-12), f"cached normals wrong after step {step}"
+    mesh.attach_counter(None)
+
+    assert 0 < counter.reused < 5 * points.shape[0], "small steps should reuse, large ones re-query"
+
+
+# Registration with reuse gives the same pose with far fewer full queries
+def test_compute_Freg_reuse():
+    mesh = grid_mesh(12)
+    d = offset_samples(mesh, n=60)
+    R1, t1 = compute_Freg(mesh, d, threshold=1e-9, max_iter=15)
+    R2, t2, summary = compute_Freg(mesh, d, threshold=1e-9, max_iter=15, reuse=True, return_summary=True)
+
+    assert almost_equal(R1, R2, 1e-12) and almost_equal(t1, t2, 1e-12), "reuse changed the result"
+    assert summary.reused > summary.queries // 2, "most late queries should be reused"
+
+
+# Test runner
+def main():
+    tests = [
+        test_cache_matches_full_query,
+        test_compute_Freg_reuse,
+    ]
+
+    print("\nRunning reuse tests...\n")
+    passed = failed = 0
+
+    for t in tests:
+        try:
+            t()
+            print(f"Passed {t.__name__}")
+            passed += 1
+        except AssertionError as e:
+            print(f"Failed {t.__name__}: {e}")
+            failed += 1
+        except Exception as e:
+            print(f"Failed {t.__name__}: unexpected error → {e}")
+            failed += 1
+
+    print(f"\nPassed: {passed}")
+    print(f"Failed: {failed}")
+
+    if failed == 0:
+        print("\nAll reuse tests passed!")
+
+if __name__ == "__main__":
+    main()
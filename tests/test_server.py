@@ -0,0 +1,154 @@
+"""
+Tests for the registration server (one worker process, Unix socket).
+Author: Emily Guan
+"""
+
+import asyncio
+import os
+import tempfile
+
+import numpy as np
+from src import server as server_module
+from src.server import RegistrationServer, closest_batch
+from utils.protocol import RegistrationClient, read_message, write_message
+from utils.transform_register import compute_Freg, apply
+from tests.test_bvh import grid_mesh
+from tests.test_metrics import offset_samples
+
+def almost_equal(a, b, tol=1e-6):
+    return np.allclose(a, b, atol=tol)
+
+"""
+Starts a server on a temporary socket, runs client(path) in a thread and
+closes the server.
+"""
+def with_server(meshes, client, **options):
+    async def run():
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "server.sock")
+            server = RegistrationServer(meshes, workers=1, **options)
+            try:
+                await server.start(path)
+                return await asyncio.get_running_loop().run_in_executor(None, client, path, server)
+            finally:
+                await server.close()
+    return asyncio.run(run())
+
+
+# Closest points and registration match local calls; errors come back as replies
+def test_server_requests():
+    mesh = grid_mesh(8)
+    mesh.ensure_index("bvh")
+    d = offset_samples(mesh, n=20)
+    R_ref, t_ref = compute_Freg(mesh, d, threshold=1e-6, max_iter=5)
+
+    def client(path, server):
+        with RegistrationClient(path, timeout=60) as c:
+            assert c.meshes() == {"grid": {"vertices": 81, "triangles": 128, "mode": "box",
+                                          "precision": "float64"}}, "mesh list wrong"
+
+            c_pts, normals, idx = c.closest("grid", d)
+            ref = mesh.find_closest_point(d, return_normals=True, return_indices=True)
+            assert np.array_equal(c_pts, ref[0]) and np.array_equal(idx, ref[2]), "closest points differ"
+            assert almost_equal(normals, ref[1], 1e-12), "normals differ"
+
+            R, t, s, cc, summary = c.register("grid", d, threshold=1e-6, max_iter=5)
+            assert almost_equal(R, R_ref, 1e-12) and almost_equal(t, t_ref, 1e-12), "registration differs"
+            assert almost_equal(s, apply(d, R, t), 1e-12) and summary["iterations"] == 5, "register reply wrong"
+
+            for op, kwargs, arrays in (("closest", {"mesh": "nope"}, {"points": d}),
+                                       ("closest", {"mesh": "grid"}, {"points": d[:, :2]}),
+                                       ("register", {"mesh": "grid", "bogus": 1}, {"d": d}),
+                                       ("explode", {}, None)):
+                try:
+                    c.request(op, arrays, **kwargs)
+                except RuntimeError:
+                    pass
+                else:
+                    assert False, f"bad {op} request {kwargs} succeeded"
+            assert c.request("ping")[0]["ok"], "connection should survive request errors"
+
+    with_server({"grid": mesh}, client)
+
+
+# Concurrent small requests share batches and each get their own answer
+def test_server_batches_requests():
+    mesh = grid_mesh(8)
+    rng = np.random.default_rng(2)
+    queries = [rng.uniform([-1, -1, -1], [9, 9, 1], (k + 1, 3)) for k in range(12)]
+
+    def client(path, server):
+        async def burst():
+            streams = [await asyncio.open_unix_connection(path) for _ in queries]
+            for i, ((_, writer), points) in enumerate(zip(streams, queries)):
+                await write_message(writer, {"op": "closest", "mesh": "grid", "id": i}, {"points": points})
+            replies = [await read_message(reader) for reader, _ in streams]
+            for _, writer in streams:
+                writer.close()
+            return replies
+
+        replies = asyncio.run(burst())
+        for i, ((header, out), points) in enumerate(zip(replies, queries)):
+            assert header["ok"] and header["id"] == i, "reply header wrong"
+            assert np.array_equal(out["c"], mesh.find_closest_point(points)), f"request {i} got wrong points"
+        return dict(server.stats)
+
+    stats = with_server({"grid": mesh}, client, batch_window=0.2)
+    assert stats["closest_requests"] == len(queries), "requests miscounted"
+    assert stats["batches"] < len(queries), "concurrent requests should share batches"
+
+
+
+# A batch is one BVH.closest_many call, not a per-point search
+def test_closest_batch_is_vectorized():
+    mesh = grid_mesh(8)
+    points = np.random.default_rng(4).uniform([-1, -1, -1], [9, 9, 1], (50, 3))
+    expected = mesh.find_closest_point(points, mode="linear", return_normals=True, return_indices=True)
+
+    mesh.ensure_index("bvh")
+    closest_many, calls = mesh.bvh.closest_many, []
+    mesh.bvh.closest_many = lambda p, batch: calls.append(p.shape[0]) or closest_many(p, batch)
+    def per_point(*args):
+        raise AssertionError("batch answered one point at a time")
+    mesh._search_bvh = per_point
+
+    server_module._WORKER_MESHES["grid"] = (None, mesh)
+    try:
+        c, normals, idx = closest_batch("grid", points)
+    finally:
+        del server_module._WORKER_MESHES["grid"]
+    assert calls == [50], "the whole batch should go through one closest_many call"
+    assert np.array_equal(c, expected[0]) and np.array_equal(idx, expected[2]), "batched answer differs"
+    assert almost_equal(normals, expected[1], 1e-12), "batched normals differ"
+
+# Test runner
+def main():
+    tests = [
+        test_server_requests,
+        test_server_batches_requests,
+        test_closest_batch_is_vectorized,
+    ]
+
+    print("\nRunning server tests...\n")
+    passed = failed = 0
+
+    for t in tests:
+        try:
+            t()
+            print(f"Passed {t.__name__}")
+            passed += 1
+        except AssertionError as e:
+            print(f"Failed {t.__name__}: {e}")
+            failed += 1
+        except Exception as e:
+            print(f"Failed {t.__name__}: unexpected error → {e}")
+            failed += 1
+
+    print(f"\nPassed: {passed}")
+    print(f"Failed: {failed}")
+
+    if failed == 0:
+        print("\nAll server tests passed!")
+
+if __name__ == "__main__":
+    main()
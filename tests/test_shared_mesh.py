@@ -0,0 +1,111 @@
+"""
+Tests for sharing a Mesh through shared memory.
+Author: Emily Guan
+"""
+
+import numpy as np
+from utils.shared_mesh import share_arrays, attach_arrays, share_mesh, attach_mesh, release
+from tests.test_bvh import grid_mesh
+
+def almost_equal(a, b, tol=1e-6):
+    return np.allclose(a, b, atol=tol)
+
+
+# Arrays round-trip through shared memory as views
+def test_share_arrays_roundtrip():
+    arrays = {"x": np.arange(12.0).reshape(4, 3), "i": np.array([[0, 1, 2]])}
+    handles, spec = share_arrays(arrays)
+    try:
+        views, attached = attach_arrays(spec)
+        try:
+            for name, arr in arrays.items():
+                assert np.array_equal(attached[name], arr), f"{name} differs after attach"
+                assert attached[name].dtype == arr.dtype, f"{name} dtype changed"
+        finally:
+            del attached
+            release(views)
+    finally:
+        release(handles, unlink=True)
+
+
+# Attached mesh (with its BVH and distance field) answers like the original
+def test_share_mesh_roundtrip():
+    mesh = grid_mesh()
+    mesh.mode = "field"
+    mesh.build_bvh()
+    mesh.build_field()
+    handles, spec = share_mesh(mesh)
+    try:
+        views, shared = attach_mesh(spec)
+        try:
+            assert shared.bvh is not None, "index should be shared with the mesh"
+            assert shared.field is not None, "distance field should be shared with the mesh"
+            points = np.random.default_rng(6).uniform([-2, -2, -2], [8, 8, 2], (20, 3))
+            assert almost_equal(shared.find_closest_point(points), mesh.find_closest_point(points)), \
+                "shared mesh answers differ"
+        finally:
+            del shared
+            release(views)
+    finally:
+        release(handles, unlink=True)
+
+
+# A shape update in one attached mesh (a PA5 job in one worker) must not
+# change what another attachment of the same shared mesh sees
+def test_update_vertices_leaves_shared_mesh_alone():
+    mesh = grid_mesh()
+    mesh.build_bvh()
+    handles, spec = share_mesh(mesh)
+    try:
+        views_a, a = attach_mesh(spec)
+        views_b, b = attach_mesh(spec)
+        try:
+            assert not b.vertex_normals.flags.writeable, "shared views should be read-only"
+            normals = b.vertex_normals.copy()
+            vertices = a.vertices.copy()
+            vertices[:, 2] += np.sin(vertices[:, 0])
+            a.update_vertices(vertices)
+
+            assert not np.allclose(a.vertex_normals, normals), "updated mesh should have new normals"
+            assert np.array_equal(b.vertex_normals, normals), "other attachment's normals changed"
+            assert np.array_equal(b.vertices, mesh.vertices), "other attachment's vertices changed"
+            assert np.array_equal(b.bvh.node_lb, mesh.bvh.node_lb), "other attachment's BVH changed"
+        finally:
+            del a, b
+            release(views_a)
+            release(views_b)
+    finally:
+        release(handles, unlink=True)
+
+
+# Test runner
+def main():
+    tests = [
+        test_share_arrays_roundtrip,
+        test_share_mesh_roundtrip,
+        test_update_vertices_leaves_shared_mesh_alone,
+    ]
+
+    print("\nRunning shared mesh tests...\n")
+    passed = failed = 0
+
+    for t in tests:
+        try:
+            t()
+            print(f"Passed {t.__name__}")
+            passed += 1
+        except AssertionError as e:
+            print(f"Failed {t.__name__}: {e}")
+            failed += 1
+        except Exception as e:
+            print(f"Failed {t.__name__}: unexpected error → {e}")
+            failed += 1
+
+    print(f"\nPassed: {passed}")
+    print(f"Failed: {failed}")
+
+    if failed == 0:
+        print("\nAll shared mesh tests passed!")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Tests for online (streaming) registration.
+Author: Emily Guan
+"""
+
+import numpy as np
+from utils.tracking import StreamingRegistration
+from utils.metrics import latency_percentiles
+from utils.transform_register import compute_Freg, apply
+from tests.test_bvh import grid_mesh
+from tests.test_metrics import offset_samples
+
+def almost_equal(a, b, tol=1e-6):
+    return np.allclose(a, b, atol=tol)
+
+
+# Each frame is a warm-started compute_Freg over the window; the cache changes nothing
+def test_streaming_matches_uncached_steps():
+    mesh = grid_mesh(12)
+    d = offset_samples(mesh, n=30)
+    tracker = StreamingRegistration(mesh, window=12, max_iter=3, threshold=1e-6, min_points=6)
+
+    R, t = np.eye(3), np.zeros(3)
+    for k, d_k in enumerate(d):
+        s_k, c_k = tracker.update(d_k)
+        if k + 1 >= 6:
+            R, t = compute_Freg(mesh, d[max(0, k - 11):k + 1], 1e-6, 3, R0=R, t0=t)
+        assert almost_equal(tracker.R, R, 1e-9) and almost_equal(tracker.t, t, 1e-9), f"pose differs at frame {k}"
+        assert almost_equal(s_k, apply(d_k, R, t), 1e-9), "s_k should use the current pose"
+        assert almost_equal(c_k, mesh.find_closest_point(s_k[None])[0], 1e-9), "c_k should be on the mesh"
+    assert tracker.frames == 30, "frame count wrong"
+
+
+# Sliding window drops old samples and their cached anchors together
+def test_streaming_window():
+    mesh = grid_mesh(8)
+    d = offset_samples(mesh, n=30)
+    tracker = StreamingRegistration(mesh, window=10, max_iter=3, min_points=4)
+    for d_k in d:
+        tracker.update(d_k)
+        assert len(tracker.samples) <= 10, "window should not grow past its size"
+        anchors = tracker.cache.anchors
+        if anchors is not None:
+            assert anchors.shape[0] == len(tracker.samples), "cache rows out of step with the window"
+    assert almost_equal(np.array(tracker.samples), d[-10:], 0), "window should keep the newest samples"
+
+
+# Per-frame budget: first refinement locks on unbudgeted, later frames stay within it
+def test_streaming_time_budget():
+    mesh = grid_mesh(8)
+    d = offset_samples(mesh, n=12)
+    tracker = StreamingRegistration(mesh, window=12, max_iter=3, min_points=6, time_budget=1e-9)
+    for d_k in d[:6]:
+        tracker.update(d_k)
+    assert tracker.summary.iterations > 0 and not tracker.summary.timed_out, "lock-on should run unbudgeted"
+
+    cost = tracker.iteration_cost
+    R, t = tracker.R.copy(), tracker.t.copy()
+    tracker.update(d[6])
+    assert tracker.summary.timed_out and tracker.summary.iterations == 0, "no iteration fits the budget"
+    assert almost_equal(tracker.R, R, 0) and almost_equal(tracker.t, t, 0), "pose should be kept"
+    assert almost_equal(tracker.iteration_cost, 0.5 * cost, 0), "a starved frame should halve the estimate"
+
+
+
+# Refinements that record no iteration leave the cost estimate unset instead of failing
+def test_streaming_time_budget_without_iterations():
+    mesh = grid_mesh(8)
+    d = offset_samples(mesh, n=8)
+    tracker = StreamingRegistration(mesh, window=8, max_iter=0, min_points=6, time_budget=1e-3)
+    for d_k in d:
+        s_k, _ = tracker.update(d_k)
+        assert almost_equal(s_k, d_k, 0), "with no iterations the initial pose should be kept"
+    assert tracker.summary.iterations == 0 and tracker.iteration_cost is None, "no iteration was measured"
+
+# Latency report: percentiles in ms and frames over the period
+def test_latency_percentiles():
+    report = latency_percentiles([0.001 * k for k in range(1, 101)], frame_period=0.09)
+    assert report["frames"] == 100, "frame count wrong"
+    assert almost_equal(report["p50"], 50.5) and almost_equal(report["max"], 100.0), "percentiles wrong"
+    assert report["over_period"] == 10, "frames over the period miscounted"
+    assert latency_percentiles([]) == {"frames": 0}, "empty input should report no frames"
+
+
+# Test runner
+def main():
+    tests = [
+        test_streaming_matches_uncached_steps,
+        test_streaming_window,
+        test_streaming_time_budget,
+        test_streaming_time_budget_without_iterations,
+        test_latency_percentiles,
+    ]
+
+    print("\nRunning tracking tests...\n")
+    passed = failed = 0
+
+    for t in tests:
+        try:
+            t()
+            print(f"Passed {t.__name__}")
+            passed += 1
+        except AssertionError as e:
+            print(f"Failed {t.__name__}: {e}")
+            failed += 1
+        except Exception as e:
+            print(f"Failed {t.__name__}: unexpected error → {e}")
+            failed += 1
+
+    print(f"\nPassed: {passed}")
+    print(f"Failed: {failed}")
+
+    if failed == 0:
+        print("\nAll tracking tests passed!")
+
+if __name__ == "__main__":
+    main()
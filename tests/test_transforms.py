@@ -3,15 +3,31 @@ Tests for transform_register.py functions.
 Author: Emily Guan 
 """
 
+import os
+import time
+
 import numpy as np
+from utils.IO import read_body, read_mesh, iter_sample
+from utils.mesh import Mesh
 from utils.transform_register import (
     apply,
     skew,
+    skew_batch,
+    linearized_system,
+    solve_normal_equations,
     aruns_method,
+    aruns_method_batch,
     compute_d,
+    compute_d_stream,
     compute_Freg,
-    compute_ck
+    compute_Freg_multires,
+    compute_ck,
+    subsample,
+    rotation_vector,
+    rotation_from_vector
 )
+from tests.test_bvh import grid_mesh
+from tests.test_metrics import offset_samples
 
 
 # Utility helpers
@@ -21,6 +37,27 @@ def almost_equal(a, b, tol=1e-6):
     return np.allclose(a, b, atol=tol)
 
 
+"""
+Mesh and d_k for a shipped debug dataset, e.g. debug_case(4, "A").
+"""
+def debug_case(problem, name):
+    data = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data")
+    markersA, tipA, NA, _ = read_body(os.path.join(data, f"Problem{problem}-BodyA.txt"))
+    markersB, _, NB, _ = read_body(os.path.join(data, f"Problem{problem}-BodyB.txt"))
+    vertices, _, _, indices, neighbors = read_mesh(os.path.join(data, f"Problem{problem}MeshFile.sur"))
+    frames = iter_sample(os.path.join(data, f"PA{problem}-{name}-Debug-SampleReadingsTest.txt"), NA, NB)
+    d = np.concatenate(list(compute_d_stream(markersA, markersB, tipA, frames)))
+    return Mesh(vertices, indices, mode="bvh", neighbors=neighbors), d
+
+"""
+RMS distance from the registered samples to the mesh.
+"""
+def registered_rms(mesh, d, R, t):
+    s = apply(d, R, t)
+    c = mesh.find_closest_point(s)
+    return np.sqrt(np.mean(np.sum((s - c) ** 2, axis=1)))
+
+
 # Test skew()
 
 
@@ -35,6 +72,41 @@ def test_skew_matrix_properties():
     assert almost_equal(S @ p, np.zeros(3)), "Skew(p) * p must be zero"
 
 
+def test_skew_batch_matches_skew():
+    P = np.array([[1.0, 2.0, 3.0], [-4.0, 0.5, 7.0]])
+    S = skew_batch(P)
+    for k in range(len(P)):
+        assert almost_equal(S[k], skew(P[k])), "skew_batch differs from skew"
+
+
+# Test linearized_system() / solve_normal_equations() against row-by-row lstsq
+def test_linearized_solve_matches_lstsq():
+    rng = np.random.default_rng(4)
+    p = rng.normal(size=(20,3)) * 10
+    c = p + rng.normal(size=(20,3)) * 0.1
+    normals = rng.normal(size=(20,3))
+
+    A_ref = np.zeros((60, 6))
+    b_ref = np.zeros(60)
+    for i in range(20):
+        vi = normals[i] / np.linalg.norm(normals[i])
+        Pi, Vi = skew(p[i]), skew(vi)
+        A_ref[3*i:3*i+3] = np.hstack((2.0 * Vi @ Pi, Vi))
+        b_ref[3*i:3*i+3] = Vi @ (c[i] - p[i])
+    x_ref, *_ = np.linalg.lstsq(A_ref, b_ref, rcond=None)
+
+    A, b = linearized_system(p, c, normals)
+    assert almost_equal(A.reshape(-1, 6), A_ref), "stacked A differs from row-by-row A"
+    assert almost_equal(b.reshape(-1), b_ref), "stacked b differs from row-by-row b"
+    assert almost_equal(solve_normal_equations(A, b), x_ref), "normal-equation solve differs from lstsq"
+
+    # degenerate system (all normals equal) falls back to minimum-norm lstsq
+    normals[:] = [0, 0, 1]
+    A, b = linearized_system(p, c, normals)
+    x_ref, *_ = np.linalg.lstsq(A.reshape(-1, 6), b.reshape(-1), rcond=None)
+    assert almost_equal(solve_normal_equations(A, b), x_ref), "degenerate fallback differs from lstsq"
+
+
 # Test apply()
 
 
@@ -71,14 +143,55 @@ def test_compute_d_simple():
         assert almost_equal(row, A_tip), "compute_d incorrect when transforms are identity"
 
 
+def test_compute_d_stream_matches_compute_d():
+    rng = np.random.default_rng(5)
+    A_markers = rng.normal(size=(4,3)) * 10
+    B_markers = rng.normal(size=(4,3)) * 10
+    A_tip = np.array([1.0, -2.0, 3.0])
+    A_samps = A_markers + rng.normal(size=(7,4,3))
+    B_samps = B_markers + rng.normal(size=(7,4,3))
+
+    d = compute_d(A_markers, B_markers, A_tip, A_samps, B_samps)
+    chunks = [(A_samps[i:i+3], B_samps[i:i+3]) for i in range(0, 7, 3)]
+    d_stream = np.concatenate(list(compute_d_stream(A_markers, B_markers, A_tip, chunks)))
+    assert almost_equal(d, d_stream), "streamed d differs from compute_d"
+
+
+# Test aruns_method_batch() against the per-frame version
+def random_rotation(rng):
+    Q, _ = np.linalg.qr(rng.normal(size=(3,3)))
+    if np.linalg.det(Q) < 0:
+        Q[:, 0] *= -1
+    return Q
+
+def test_aruns_method_batch_matches_single():
+    rng = np.random.default_rng(0)
+    markers = rng.normal(size=(6,3)) * 20
+    frames = []
+    for _ in range(8):
+        R, t = random_rotation(rng), rng.normal(size=3) * 50
+        frames.append(markers @ R.T + t + rng.normal(size=(6,3)) * 0.1)
+    frames = np.array(frames)
+
+    Rb, tb = aruns_method_batch(markers, frames)
+    for k in range(len(frames)):
+        R, t = aruns_method(markers, frames[k])
+        assert almost_equal(Rb[k], R), "batched rotation differs from aruns_method"
+        assert almost_equal(tb[k], t), "batched translation differs from aruns_method"
+        assert almost_equal(np.linalg.det(Rb[k]), 1.0), "batched rotation is not proper"
+
+
 # Mock mesh for testing compute_Freg()
 class MockMesh:
-    def find_closest_point(self, p, use_linear=False, return_normals=False):
+    def find_closest_point(self, p, use_linear=False, return_normals=False,
+                           hints=None, return_indices=False):
         p = np.asarray(p)
+        out = (p.copy(),)
         if return_normals:
-            normals = np.tile(np.array([0,0,1.0]), (p.shape[0],1))
-            return p.copy(), normals
-        return p.copy()
+            out += (np.tile(np.array([0,0,1.0]), (p.shape[0],1)),)
+        if return_indices:
+            out += (np.zeros(p.shape[0], int),)
+        return out if len(out) > 1 else out[0]
 
 # Test compute_Freg()
 def test_compute_Freg_identity():
@@ -114,14 +227,185 @@ def test_compute_ck_identity_reg():
     assert almost_equal(c, d), "c_k should equal d_k when mesh reflects identity projection"
 
 
+# Coarse-to-fine: levels run coarsest first, the last one on all points and the full mesh
+def test_compute_Freg_multires_levels():
+    mesh = grid_mesh(12)
+    d = offset_samples(mesh, n=60)
+    assert subsample(d, 20).shape[0] == 20 and subsample(d, 100) is d, "subsample size incorrect"
+
+    seen = []
+    R, t, summary = compute_Freg_multires(mesh, d, threshold=1e-4, max_iter=5, levels=3, level_iter=3,
+                                          min_points=16, min_triangles=1,
+                                          callbacks=[seen.append], return_summary=True)
+    starts = [i for i, r in enumerate(seen) if r.iteration == 0]
+    assert len(starts) == 3 and summary.iterations == len(seen), "expected one run per level"
+    per_query = [seen[i].queries for i in starts]
+    assert per_query == sorted(per_query) and per_query[-1] == d.shape[0], "levels should add points"
+    assert seen[starts[1]].tested + seen[starts[1]].rejected < d.shape[0] * len(mesh), \
+        "coarse levels should use a decimated mesh"
+
+    R1, t1 = compute_Freg(mesh, d, threshold=1e-4, max_iter=5)
+    R2, t2 = compute_Freg_multires(mesh, d, threshold=1e-4, max_iter=5, levels=1)
+    assert almost_equal(R1, R2) and almost_equal(t1, t2), "one level should be plain compute_Freg"
+
+    try:
+        compute_Freg_multires(mesh, d, levels=3, thresholds=[0.1])
+        assert False, "wrong number of level thresholds should raise"
+    except ValueError:
+        pass
+
+
+# On real data, coarse levels never leave the result worse than one level
+def test_compute_Freg_multires_no_worse_on_debug_data():
+    for problem, name in ((3, "A"), (4, "A")):
+        mesh, d = debug_case(problem, name)
+        R1, t1 = compute_Freg_multires(mesh, d, threshold=1e-3, max_iter=100, levels=1)
+        R4, t4, summary = compute_Freg_multires(mesh, d, threshold=1e-3, max_iter=100, levels=4,
+                                                return_summary=True)
+        single, multi = registered_rms(mesh, d, R1, t1), registered_rms(mesh, d, R4, t4)
+        assert multi <= single + 1e-9, f"PA{problem}-{name}: multires rms {multi:.4g} > single level {single:.4g}"
+        assert summary.converged, f"PA{problem}-{name}: multires should still converge"
+
+
+
+# From a poor start the coarse levels do the early work: fewer full-mesh queries
+def test_compute_Freg_multires_saves_full_queries():
+    mesh, d = debug_case(4, "A")
+    R0 = rotation_from_vector(0.36 * np.array([0.6, -0.48, 0.64]))
+    center = d.mean(axis=0)
+    t0 = center - R0 @ center + np.array([4.0, -4.0, 4.0])
+
+    find_closest_point, queried = mesh.find_closest_point, []
+    def counted(points, *args, **kwargs):
+        queried.append(len(points))
+        return find_closest_point(points, *args, **kwargs)
+    mesh.find_closest_point = counted
+
+    R1, t1 = compute_Freg(mesh, d, threshold=1e-3, max_iter=40, R0=R0, t0=t0)
+    plain, queried[:] = sum(queried), []
+    R4, t4 = compute_Freg_multires(mesh, d, threshold=1e-3, max_iter=40, levels=4, R0=R0, t0=t0)
+    multi = sum(queried)
+    del mesh.find_closest_point
+
+    assert multi < plain, f"multires made {multi} full-mesh queries, plain {plain}"
+    assert registered_rms(mesh, d, R4, t4) < registered_rms(mesh, d, R1, t1), "multires should end closer"
+
+# Rotation vector <-> matrix round trip, including angles near 0 and pi
+def test_rotation_vector_roundtrip():
+    rng = np.random.default_rng(5)
+    for angle in (0.0, 1e-8, 0.3, 2.0, np.pi - 1e-9):
+        axis = rng.normal(size=3)
+        w = angle * axis / np.linalg.norm(axis)
+        R = rotation_from_vector(w)
+        assert almost_equal(R @ R.T, np.eye(3)), "rotation not orthonormal"
+        assert almost_equal(rotation_from_vector(rotation_vector(R)), R), f"round trip failed at {angle}"
+
+
+# Anderson acceleration: every pass is accounted for, plain steps unchanged when off
+def test_compute_Freg_accelerated_accounting():
+    mesh = grid_mesh(12)
+    d = offset_samples(mesh, n=60)
+    R, t, summary = compute_Freg(mesh, d, threshold=1e-9, max_iter=12, accelerate=True, history=3,
+                                 return_summary=True)
+    assert summary.accelerated > 0, "some iterations should extrapolate"
+    assert summary.queries == (summary.iterations + summary.reverted) * d.shape[0], \
+        "each revert should cost exactly one extra closest-point pass"
+    assert almost_equal(R @ R.T, np.eye(3)), "accelerated pose should stay a rotation"
+
+    _, _, plain = compute_Freg(mesh, d, threshold=1e-9, max_iter=12, return_summary=True)
+    assert plain.accelerated == 0 and plain.reverted == 0, "acceleration should be off by default"
+
+
+
+def test_compute_Freg_accelerated_plateau_stop():
+    mesh = grid_mesh(12)
+    d = offset_samples(mesh, n=60)
+    _, _, stopped = compute_Freg(mesh, d, threshold=1e-12, max_iter=40, accelerate=True, history=3,
+                                 return_summary=True)
+    assert len(stopped.records) < 40 and not stopped.converged, "a flat residual should end the run early"
+    floor = min(r.eps for r in stopped.records)
+    assert all(r.eps > 0.999 * floor for r in stopped.records[-2 * (3 + 1):]), \
+        "the last window should not have improved on the best residual"
+
+    _, _, full = compute_Freg(mesh, d, threshold=1e-12, max_iter=40, accelerate=True, plateau_tol=0,
+                              return_summary=True)
+    assert len(full.records) == 40, "plateau_tol=0 should run to max_iter"
+
+    _, _, plain = compute_Freg(mesh, d, threshold=1e-12, max_iter=40, return_summary=True)
+    assert len(plain.records) == 40, "the plateau stop should only apply with accelerate"
+
+# Time budget: no iteration starts that would overrun; the best measured pose comes back
+def test_compute_Freg_time_budget():
+    mesh = grid_mesh(12)
+    d = offset_samples(mesh, n=60)
+
+    def rms(R, t):
+        s = apply(d, R, t)
+        return np.sqrt(np.mean(np.sum((mesh.find_closest_point(s) - s) ** 2, axis=1)))
+
+    # estimated cost over the budget: nothing runs, the start pose is returned
+    R, t, summary = compute_Freg(mesh, d, max_iter=10, time_budget=1.0, iteration_cost=5.0, return_summary=True)
+    assert summary.iterations == 0 and summary.timed_out and not summary.converged, "no iteration should start"
+    assert almost_equal(R, np.eye(3), 0) and almost_equal(t, np.zeros(3), 0), "start pose expected"
+    assert np.isnan(summary.rms), "nothing was measured, and nothing may run after the deadline"
+
+    # ample budget: same answer as an unbudgeted run
+    R1, t1 = compute_Freg(mesh, d, threshold=1e-9, max_iter=8)
+    R2, t2, summary = compute_Freg(mesh, d, threshold=1e-9, max_iter=8, time_budget=60.0, return_summary=True)
+    assert not summary.timed_out and summary.iterations == 8, "budget should not stop the run"
+    assert almost_equal(R1, R2, 0) and almost_equal(t1, t2, 0), "budget changed the result"
+
+    # iterations slowed to ~20 ms: stops in time with the best pose it measured
+    slow = [lambda rec: time.sleep(0.02)]
+    R, t, summary = compute_Freg(mesh, d, threshold=1e-9, max_iter=100, callbacks=slow,
+                                 time_budget=0.1, return_summary=True)
+    assert summary.timed_out and 0 < summary.iterations < 100, "budget should stop the run"
+    assert summary.seconds < 0.15, "run overshot its budget"
+    assert almost_equal(summary.rms, rms(R, t), 1e-9), "rms should be measured at the returned pose"
+    assert summary.rms <= rms(np.eye(3), np.zeros(3)) + 1e-12, "returned pose fits worse than the start"
+
+
+
+# Real data: the probe's margin keeps runs inside the budget, and a budget too
+# small for any iteration returns at once with the probe's rms
+def test_compute_Freg_time_budget_wall_time():
+    mesh, d = debug_case(4, "B")
+    compute_Freg(mesh, d, max_iter=1)
+
+    for budget in (0.01, 0.1, 0.5):
+        start = time.perf_counter()
+        R, t, summary = compute_Freg(mesh, d, max_iter=100, time_budget=budget, return_summary=True)
+        wall = time.perf_counter() - start
+        assert wall <= budget + 0.05, f"{budget}s budget took {wall:.3f}s"
+        assert summary.timed_out and np.isfinite(summary.rms), "a timed-out run should report its rms"
+
+    R, t, summary = compute_Freg(mesh, d, max_iter=100, time_budget=0.01, return_summary=True)
+    assert summary.iterations == 0 and almost_equal(R, np.eye(3), 0), "no iteration fits 10 ms"
+    s = subsample(d, 32)
+    gaps = np.sum((mesh.find_closest_point(s) - s) ** 2, axis=1)
+    slices = [np.sqrt(np.mean(np.concatenate([gaps[j::4] for j in range(k)]))) for k in range(1, 5)]
+    assert np.any(np.isclose(slices, summary.rms, atol=1e-12)), "rms should come from the probe samples"
+
 # Test runner
 def main():
     tests = [
         test_skew_matrix_properties,
+        test_skew_batch_matches_skew,
+        test_linearized_solve_matches_lstsq,
         test_apply_transform,
         test_compute_d_simple,
+        test_compute_d_stream_matches_compute_d,
+        test_aruns_method_batch_matches_single,
         test_compute_Freg_identity,
         test_compute_ck_identity_reg,
+        test_compute_Freg_multires_levels,
+        test_compute_Freg_multires_no_worse_on_debug_data,
+        test_compute_Freg_multires_saves_full_queries,
+        test_rotation_vector_roundtrip,
+        test_compute_Freg_accelerated_accounting,
+        test_compute_Freg_accelerated_plateau_stop,
+        test_compute_Freg_time_budget,
+        test_compute_Freg_time_budget_wall_time,
     ]
 
     print("\nRunning transform_register tests...\n")
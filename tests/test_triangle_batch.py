@@ -0,0 +1,91 @@
+"""
+Tests for TriangleBatch class.
+Author: Emily Guan
+"""
+
+import numpy as np
+from utils.triangles import Triangle
+from utils.triangle_batch import TriangleBatch
+
+def almost_equal(a, b, tol=1e-6):
+    return np.allclose(a, b, atol=tol)
+
+def make_batch(tris):
+    tris = np.asarray(tris, float)
+    return TriangleBatch(tris[:, 0], tris[:, 1], tris[:, 2])
+
+
+# Bounds / normals
+def test_bounds_and_normals():
+    batch = make_batch([[[1,2,3], [4,-1,10], [0,5,7]],
+                        [[0,0,0], [1,0,0], [0,1,0]]])
+    assert almost_equal(batch.lb[0], [0,-1,3]), "lower bounds incorrect"
+    assert almost_equal(batch.ub[0], [4,5,10]), "upper bounds incorrect"
+    assert almost_equal(batch.normal[1], [0,0,1]), "normal direction incorrect"
+
+
+# Closest point matches Triangle for inside, edge and vertex cases
+def test_closest_points_match_triangle():
+    tris = [[[0,0,0], [2,0,0], [0,2,0]],
+            [[1,2,3], [4,-1,10], [0,5,7]],
+            [[0,0,1], [1,0,1], [0,1,2]]]
+    batch = make_batch(tris)
+    points = [[0.2, 0.2, 1.0], [1.0, -1.0, 0.0], [-1.0, -1.0, 0.0], [5, 5, 5], [0.5, 3, -2]]
+
+    for p in points:
+        cps, barys, dists = batch.closest_points(p)
+        for k, t in enumerate(tris):
+            cp, bary = Triangle(*t).closest_point(p)
+            assert almost_equal(cps[k], cp), f"closest point mismatch for {p}, triangle {k}"
+            assert almost_equal(barys[k], bary), f"barycentric mismatch for {p}, triangle {k}"
+            assert almost_equal(dists[k], np.linalg.norm(cp - np.asarray(p))), "distance mismatch"
+
+
+# Candidate subset
+def test_closest_points_subset():
+    batch = make_batch([[[0,0,0], [1,0,0], [0,1,0]],
+                        [[5,5,0], [6,5,0], [5,6,0]]])
+    cps, _, _ = batch.closest_points([5.2, 5.2, 1.0], np.array([1]))
+    assert cps.shape == (1, 3), "subset should return one row per candidate"
+    assert almost_equal(cps[0], [5.2, 5.2, 0.0]), "subset closest point incorrect"
+
+
+# Box test
+def test_in_box():
+    batch = make_batch([[[0,0,0], [1,2,3], [-1,-2,-3]]])
+    assert batch.in_box(np.array([0.5,0.5,0.5]), 0.1)[0], "point should be inside bounding box"
+    assert not batch.in_box(np.array([10,10,10]), 0.1)[0], "point should be outside bounding box"
+
+
+# Test runner
+def main():
+    tests = [
+        test_bounds_and_normals,
+        test_closest_points_match_triangle,
+        test_closest_points_subset,
+        test_in_box,
+    ]
+
+    print("\nRunning TriangleBatch tests...\n")
+    passed = failed = 0
+
+    for t in tests:
+        try:
+            t()
+            print(f"Passed {t.__name__}")
+            passed += 1
+        except AssertionError as e:
+            print(f"Failed {t.__name__}: {e}")
+            failed += 1
+        except Exception as e:
+            print(f"Failed {t.__name__}: unexpected error → {e}")
+            failed += 1
+
+    print(f"\nPassed: {passed}")
+    print(f"Failed: {failed}")
+
+    if failed == 0:
+        print("\nAll TriangleBatch tests passed!")
+
+if __name__ == "__main__":
+    main()
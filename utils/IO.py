@@ -4,6 +4,9 @@ Reads and writes all files according to PAHW3 descriptions.
 Author: Emily Guan
 """
 
+import itertools
+import warnings
+
 import numpy as np
 
 
@@ -34,20 +37,56 @@ Returns:
 def read_body(filepath):
 
     with open(filepath, 'r') as f:
-        lines = [line.strip() for line in f if line.strip()]
-    
-    header = lines[0].split()
-    N_markers = int(header[0])
-    name = header[1]
+        header_line = _first_line(f, filepath)
+        body = f.read()
 
-    marker_lines = lines[1: 1 + N_markers]
-    markers = np.array([[float(x) for x in line.split()] for line in marker_lines])
+    header = header_line.split()
+    N_markers = _header_int(header, 0, filepath, "marker count")
+    if len(header) < 2:
+        raise ValueError(f"{filepath}: expected '<N_markers> <body_name>' on first line, got {header_line!r}")
+    name = header[1]
 
-    tip_line = lines[1 + N_markers]
-    tip = np.array([float(x) for x in tip_line.split()])
+    values = _read_numbers(body, filepath)
+    if values.size < 3 * (N_markers + 1):
+        raise ValueError(f"{filepath}: expected {N_markers} markers and a tip (3 numbers each), "
+                         f"could only read {values.size} numbers")
+    markers = values[:3 * N_markers].reshape(N_markers, 3).copy()
+    tip = values[3 * N_markers: 3 * N_markers + 3].copy()
 
     return markers, tip, N_markers, name
 
+"""
+Returns the first non-blank line of an open file, stripped.
+"""
+def _first_line(f, filepath):
+    for line in f:
+        if line.strip():
+            return line.strip()
+    raise ValueError(f"{filepath}: file is empty")
+
+"""
+Parses header token i as an int, with a readable error if it is missing or malformed.
+"""
+def _header_int(tokens, i, filepath, what):
+    try:
+        return int(tokens[i])
+    except (IndexError, ValueError):
+        raise ValueError(f"{filepath}: expected {what} in header, got {' '.join(tokens)!r}") from None
+
+"""
+Parses all numbers in text (whitespace-separated by default) with one bulk
+NumPy call (no per-token Python work). Any token that is not a number, even
+after all the values a caller needs, is an error: newer NumPy raises, older
+NumPy only warns (DeprecationWarning) and returns what it parsed up to it.
+"""
+def _read_numbers(text, filepath, sep=' '):
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", DeprecationWarning)
+        try:
+            return np.fromstring(text, dtype=float, sep=sep)
+        except (ValueError, DeprecationWarning):
+            raise ValueError(f"{filepath}: found a non-numeric value in the data block") from None
+
 """
 Reads surface mesh file (.sur).
 
@@ -68,28 +107,84 @@ Return:
     triangle_indices: (N_triangles x 3) numpy array of ints
         Indices of each triangle’s 3 vertices.
     neighbors: (N_triangles x 3) numpy array of ints
-        Neighbor indices for each triangle (unused here).
+        Neighbor indices for each triangle (-1 where not given).
 """
 def read_mesh(filepath):
-    
+
     with open(filepath, 'r') as f:
-        lines = [line.strip() for line in f if line.strip()]
+        header_line = _first_line(f, filepath)
+        body = f.read()
+
+    N_vertices = _header_int(header_line.split(), 0, filepath, "vertex count")
 
-    N_vertices = int(lines[0])
+    values = _read_numbers(body, filepath)
 
-    vertex_lines = lines[1: 1 + N_vertices]
-    vertices = np.array([[float(x) for x in line.split()] for line in vertex_lines])
+    n_vert_values = 3 * N_vertices
+    if values.size <= n_vert_values:
+        raise ValueError(f"{filepath}: expected {N_vertices} vertices followed by a triangle count, "
+                         f"could only read {values.size} numbers")
+    vertices = values[:n_vert_values].reshape(N_vertices, 3)
 
-    N_triangles = int(lines[1 + N_vertices])
+    N_triangles = values[n_vert_values]
+    if N_triangles != int(N_triangles) or N_triangles < 0:
+        raise ValueError(f"{filepath}: expected triangle count after vertices, got {N_triangles}")
+    N_triangles = int(N_triangles)
 
-    tri_lines = lines[2 + N_vertices: 2 + N_vertices + N_triangles]
-    data = np.array([[int(x) for x in line.split()] for line in tri_lines])
+    tri_values = values[n_vert_values + 1: n_vert_values + 1 + 6 * N_triangles]
+    if tri_values.size < 6 * N_triangles:
+        raise ValueError(f"{filepath}: expected {N_triangles} triangle rows of 6 integers, "
+                         f"could only read {tri_values.size} numbers")
+    if not np.all(tri_values == np.floor(tri_values)):
+        raise ValueError(f"{filepath}: found a non-integer value in the triangle rows")
+    data = tri_values.astype(int).reshape(N_triangles, 6)
 
     triangle_indices = data[:, :3]
     neighbors = data[:, 3:]
 
     return vertices, N_vertices, N_triangles, triangle_indices, neighbors
 
+"""
+Reads a statistical shape-mode file (Problem5Modes.txt).
+
+Input:
+    filepath: str
+        Path to the modes file.
+
+File:
+    Line 1: <name> Nvertices=<N_vertices> Nmodes=<N_modes>
+    Then for each mode m = 0 .. N_modes:
+        "Mode m : <description>"
+        N_vertices lines: x, y, z   (mode 0 is the mean shape, the rest
+                                     are vertex displacements)
+
+Return:
+    modes: (N_modes + 1) x N_vertices x 3 numpy array
+        modes[0] is the mean shape, modes[1:] the displacement modes.
+    N_vertices: int
+    N_modes: int
+"""
+def read_modes(filepath):
+
+    with open(filepath, 'r') as f:
+        header_line = _first_line(f, filepath)
+        lines = [line for line in f if not line.lstrip().startswith("Mode")]
+
+    fields = dict(token.split("=", 1) for token in header_line.split() if "=" in token)
+    try:
+        N_vertices, N_modes = int(fields["Nvertices"]), int(fields["Nmodes"])
+    except (KeyError, ValueError):
+        raise ValueError(f"{filepath}: expected 'Nvertices=<n> Nmodes=<m>' in header, "
+                         f"got {header_line!r}") from None
+
+    values = _read_numbers("".join(lines).replace(",", " "), filepath)
+    expected = 3 * N_vertices * (N_modes + 1)
+    if values.size < expected:
+        raise ValueError(f"{filepath}: expected {N_modes + 1} modes of {N_vertices} vertices, "
+                         f"could only read {values.size} numbers")
+    modes = values[:expected].reshape(N_modes + 1, N_vertices, 3)
+
+    return modes, N_vertices, N_modes
+
 """
 Reads sample (tracker) data.
 
@@ -120,28 +215,91 @@ Output:
 """
 def read_sample(filepath, N_A, N_B):
     with open(filepath, 'r') as f:
-        lines = [line.strip() for line in f if line.strip()]
-
-    parts = lines[0].split(',')
-    N_s = int(parts[0])
-    N_samps = int(parts[1])
-    N_D = N_s - N_A - N_B
+        N_s, N_samps = _sample_header(f, filepath)
+        blocks = list(_iter_frames(f, filepath, N_s, N_samps, N_A, N_B, chunk_frames=N_samps or 1024))
 
     A_samps = np.zeros((N_samps, N_A, 3))
     B_samps = np.zeros((N_samps, N_B, 3))
+    if len(blocks) == 1:
+        A_samps, B_samps = blocks[0]
+    elif blocks:
+        A_samps = np.concatenate([a for a, _ in blocks])
+        B_samps = np.concatenate([b for _, b in blocks])
+
+    return A_samps, B_samps, N_s, A_samps.shape[0]
+
+"""
+Streams sample (tracker) data in fixed-size chunks of frames.
 
-    idx = 1
-    for s in range(N_samps):
-        for i in range(N_A):
-            A_samps[s, i] = [float(x) for x in lines[idx].split(',')]
-            idx += 1
-        for j in range(N_B):
-            B_samps[s, j] = [float(x) for x in lines[idx].split(',')]
-            idx += 1
-        for _ in range(N_D):
-            idx += 1
+Only one chunk of text and arrays is held at a time, so memory does not
+depend on file length, and frames can be processed before the file (or
+pipe) is fully written.
 
-    return A_samps, B_samps, N_s, N_samps
+Input:
+    source: str or open text file
+        Path to sample readings file, or a file object such as sys.stdin.
+    N_A, N_B: int
+        Number of markers on body A and B.
+    chunk_frames: int
+        Frames per yielded block (the last block may be shorter).
+
+A sample count of 0 in the header means an open-ended feed: frames are
+read until the end of the stream.
+
+Yields:
+    (A_block, B_block): (k x N_A x 3), (k x N_B x 3) arrays
+"""
+def iter_sample(source, N_A, N_B, chunk_frames=1024):
+    if isinstance(source, str):
+        with open(source, 'r') as f:
+            N_s, N_samps = _sample_header(f, source)
+            yield from _iter_frames(f, source, N_s, N_samps, N_A, N_B, chunk_frames)
+    else:
+        name = getattr(source, 'name', '<stream>')
+        N_s, N_samps = _sample_header(source, name)
+        yield from _iter_frames(source, name, N_s, N_samps, N_A, N_B, chunk_frames)
+
+"""
+Reads the '<N_total_markers>, <N_samples>, ...' header of a sample file.
+"""
+def _sample_header(f, filepath):
+    parts = _first_line(f, filepath).split(',')
+    N_s = _header_int(parts, 0, filepath, "total marker count")
+    N_samps = _header_int(parts, 1, filepath, "sample count")
+    return N_s, N_samps
+
+"""
+Parses frames from an open sample file, chunk_frames at a time. Each chunk's
+lines are joined and parsed with one bulk NumPy call; D markers are dropped
+by slicing.
+"""
+def _iter_frames(f, filepath, N_s, N_samps, N_A, N_B, chunk_frames):
+    chunk_frames = max(int(chunk_frames), 1)
+    rows = (line for line in f if line.strip())
+
+    done = 0
+    open_ended = N_samps == 0
+    while open_ended or done < N_samps:
+        k = chunk_frames if open_ended else min(chunk_frames, N_samps - done)
+        lines = list(itertools.islice(rows, k * N_s))
+        if open_ended:
+            if len(lines) % N_s:
+                raise ValueError(f"{filepath}: stream ended in the middle of frame {done + len(lines) // N_s}")
+            if not lines:
+                return
+            k = len(lines) // N_s
+        elif len(lines) < k * N_s:
+            raise ValueError(f"{filepath}: expected {N_samps} frames of {N_s} markers, "
+                             f"file ended after {done + len(lines) // N_s} frames")
+
+        values = _read_numbers(','.join(lines), filepath, sep=',')
+        if values.size != 3 * k * N_s:
+            raise ValueError(f"{filepath}: expected 3 coordinates per marker line "
+                             f"in frames {done}-{done + k - 1}")
+        frames = values.reshape(k, N_s, 3)
+
+        yield frames[:, :N_A].copy(), frames[:, N_A:N_A + N_B].copy()
+        done += k
 
 """
 Writes PAHW4 output file.
@@ -153,19 +311,61 @@ Input:
         s_k values: estimated tip positions in B-frame.
     C: (N_samples x 3) array
         c_k values: corresponding points on the mesh.
+    lambdas: optional (N_modes,) array
+        Mode weights of a deformable (PA5) registration.
 
 Returns:
     Writes a formatted text file containing:
-        Line 1:  <N_samples> <filename>
+        Line 1:  <N_samples> <filename>            (PA5: <N_samples> <filename> <N_modes>)
+        PA5 only, line 2: the N_modes mode weights
         Then for each sample k: dk_x dk_y dk_z  ck_x ck_y ck_z  |dk - ck|
 """
-def write_output(filename, S, C):
+def write_output(filename, S, C, lambdas=None):
     N_samps = len(S)
     with open(filename, "w") as f:
-        f.write(f"{N_samps} {filename}\n")
+        if lambdas is None:
+            f.write(f"{N_samps} {filename}\n")
+        else:
+            f.write(f"{N_samps} {filename} {len(lambdas)}\n")
+            f.write("".join(f"{lam:10.4f}" for lam in lambdas) + "\n")
         for sk, ck in zip(S, C):
-            diff = np.linalg.norm(sk - ck)
+            f.write(format_output_row(sk, ck))
+
+"""
+One output line: s_k, c_k and their distance.
+"""
+def format_output_row(sk, ck):
+    diff = np.linalg.norm(sk - ck)
+    return (f"{sk[0]:9.2f} {sk[1]:9.2f} {sk[2]:9.2f} "
+            f"{ck[0]:9.2f} {ck[1]:9.2f} {ck[2]:9.2f} "
+            f"{diff:9.3f}\n")
 
-            f.write(f"{sk[0]:9.2f} {sk[1]:9.2f} {sk[2]:9.2f} "
-                    f"{ck[0]:9.2f} {ck[1]:9.2f} {ck[2]:9.2f} "
-                    f"{diff:9.3f}\n")
\ No newline at end of file
+"""
+Reads an output file (ours or a *-Debug-Output.txt reference).
+
+File:
+    Line 1: <N_samples> <filename> [<N_modes>]
+    If N_modes > 0, line 2: the mode weights
+    Then N_samples lines: sk (3), ck (3), |sk - ck|
+
+Output:
+    S: (N_samples x 3) array
+    C: (N_samples x 3) array
+    dist: (N_samples,) array
+    lambdas: (N_modes,) array, or None without modes
+"""
+def read_output(filepath):
+    with open(filepath, 'r') as f:
+        tokens = _first_line(f, filepath).split()
+        body = f.read()
+    N_samps = _header_int(tokens, 0, filepath, "<N_samples>")
+    N_modes = _header_int(tokens, 2, filepath, "<N_modes>") if len(tokens) > 2 else 0
+
+    values = _read_numbers(body, filepath)
+    expected = N_modes + 7 * N_samps
+    if values.size < expected:
+        raise ValueError(f"{filepath}: expected {N_samps} rows of 7 values after the header, "
+                         f"could only read {values.size} numbers")
+    lambdas = values[:N_modes] if N_modes else None
+    rows = values[N_modes:expected].reshape(N_samps, 7)
+    return rows[:, 0:3], rows[:, 3:6], rows[:, 6], lambdas
@@ -0,0 +1,66 @@
+"""
+Anderson acceleration for fixed-point iterations x <- G(x).
+
+Each ICP iteration maps a pose x to a new pose g = G(x). In the slow,
+linearly convergent tail, consecutive residuals f = g - x are nearly
+parallel, so a least-squares mix of the last few (x, g) pairs lands much
+closer to the fixed point than g itself:
+
+    gamma = argmin || f_k - dF gamma ||,   x_next = g_k - dG gamma,
+
+dF, dG being the differences of consecutive residuals and images. The
+caller owns the safeguard (reset() when an extrapolated point is worse).
+
+Author: Emily Guan
+"""
+
+from collections import deque
+
+import numpy as np
+
+
+class AndersonAccelerator:
+
+    """
+    Input:
+        history: int
+            Number of past residual differences mixed in (memory depth).
+    """
+    def __init__(self, history=5):
+        self.history = max(int(history), 1)
+        self.reset()
+
+    """
+    Forgets all past iterates. With refill (after a rejected extrapolation),
+    plain steps refill the whole history before the next extrapolation, so
+    a run stuck at its accuracy floor does not pay for a rejection every
+    other iteration.
+    """
+    def reset(self, refill=False):
+        self._g = deque(maxlen=self.history + 1)
+        self._f = deque(maxlen=self.history + 1)
+        self._needed = self.history + 1 if refill else 2
+
+    """
+    Adds the pair (x, g = G(x)) and returns (x_next, accelerated).
+
+    With fewer than two pairs (or, after reset(refill=True), a partial
+    history) or a non-finite mix, x_next is the plain image g and
+    accelerated is False.
+    """
+    def step(self, x, g):
+        x = np.asarray(x, float)
+        g = np.asarray(g, float)
+        self._g.append(g)
+        self._f.append(g - x)
+        if len(self._f) < self._needed:
+            return g, False
+        self._needed = 2
+
+        dF = np.diff(np.array(self._f), axis=0).T
+        dG = np.diff(np.array(self._g), axis=0).T
+        gamma, *_ = np.linalg.lstsq(dF, self._f[-1], rcond=None)
+        x_next = g - dG @ gamma
+        if not np.all(np.isfinite(x_next)):
+            return g, False
+        return x_next, True
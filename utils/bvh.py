@@ -0,0 +1,337 @@
+"""
+Axis-aligned bounding-volume hierarchy over triangle bounds.
+
+Nodes are stored in flat arrays in depth-first order (children always come
+after their parent), so the tree can be refit bottom-up or written to disk
+as plain arrays.
+
+Author: Emily Guan
+"""
+
+import numpy as np
+
+from utils.triangle_batch import coord_dtype
+
+# arrays that fully describe a built tree
+BVH_ARRAYS = ("order", "node_lb", "node_ub", "left", "right", "start", "count")
+
+
+"""
+Squared distance from p to each box [lb, ub] (zero if p is inside).
+"""
+def box_dist2(p, lb, ub):
+    gap = np.maximum(np.maximum(lb - p, p - ub), 0.0)
+    return np.einsum('...i,...i->...', gap, gap)
+
+
+class BVH:
+
+    """
+    Input:
+        lb, ub: (T x 3) arrays
+            Per-triangle bounds (Triangle.build_bounds / TriangleBatch.lb, ub);
+            node boxes keep their dtype (float32 or float64).
+        leaf_size: int
+            Maximum number of triangles stored in a leaf.
+    """
+    def __init__(self, lb, ub, leaf_size=8):
+        self.leaf_size = int(leaf_size)
+        dtype = coord_dtype(lb)
+        self.build(np.asarray(lb, dtype), np.asarray(ub, dtype))
+
+    """
+    Top-down median split on the longest axis of the centroid bounds.
+    """
+    def build(self, lb, ub):
+        T = lb.shape[0]
+        centroids = 0.5 * (lb + ub)
+        order = np.arange(T)
+
+        node_lb, node_ub = [], []
+        left, right, start, count = [], [], [], []
+
+        # (node id, start, end) ranges into order; node ids handed out on push
+        def new_node(s, e):
+            node_lb.append(lb[order[s:e]].min(axis=0))
+            node_ub.append(ub[order[s:e]].max(axis=0))
+            left.append(-1)
+            right.append(-1)
+            start.append(s)
+            count.append(e - s)
+            return len(left) - 1
+
+        stack = [(new_node(0, T), 0, T)] if T > 0 else []
+        while stack:
+            node, s, e = stack.pop()
+            if e - s <= self.leaf_size:
+                continue
+
+            c = centroids[order[s:e]]
+            axis = int(np.argmax(c.max(axis=0) - c.min(axis=0)))
+            mid = (e - s) // 2
+            part = np.argpartition(c[:, axis], mid)
+            order[s:e] = order[s:e][part]
+
+            l = new_node(s, s + mid)
+            r = new_node(s + mid, e)
+            left[node], right[node] = l, r
+            count[node] = 0
+
+            # push right first so the left subtree is numbered first
+            stack.append((r, s + mid, e))
+            stack.append((l, s, s + mid))
+
+        self.order = order
+        self.node_lb = np.array(node_lb, lb.dtype).reshape(-1, 3)
+        self.node_ub = np.array(node_ub, ub.dtype).reshape(-1, 3)
+        self.left = np.array(left, int)
+        self.right = np.array(right, int)
+        self.start = np.array(start, int)
+        self.count = np.array(count, int)
+
+        self._levels = None
+        self.build_area = self.surface_area()
+
+    """
+    Flat arrays describing the tree (for saving to disk).
+    """
+    def to_arrays(self):
+        return {
+            "order": self.order, "node_lb": self.node_lb, "node_ub": self.node_ub,
+            "left": self.left, "right": self.right, "start": self.start, "count": self.count,
+        }
+
+    """
+    Rebuilds a tree around arrays from to_arrays (e.g. memory-mapped) without copying.
+    """
+    @classmethod
+    def from_arrays(cls, arrays, leaf_size=8):
+        bvh = cls.__new__(cls)
+        bvh.leaf_size = int(leaf_size)
+        for name in BVH_ARRAYS:
+            setattr(bvh, name, arrays[name])
+        bvh._levels = None
+        bvh.build_area = None
+        return bvh
+
+    def __len__(self):
+        return self.left.shape[0]
+
+    """
+    Sum of node box surface areas; grows as refit boxes loosen.
+    """
+    def surface_area(self):
+        ext = np.maximum(self.node_ub - self.node_lb, 0.0)
+        return 2.0 * float(np.sum(ext[:, 0] * ext[:, 1] + ext[:, 1] * ext[:, 2] + ext[:, 2] * ext[:, 0]))
+
+    """
+    Internal nodes grouped by depth, root first (computed once per topology).
+    """
+    def inner_levels(self):
+        if self._levels is None:
+            levels = []
+            frontier = np.zeros(1 if len(self) else 0, int)
+            while frontier.size:
+                inner = frontier[self.left[frontier] >= 0]
+                if inner.size:
+                    levels.append(inner)
+                frontier = np.concatenate((self.left[inner], self.right[inner]))
+            self._levels = levels
+        return self._levels
+
+    """
+    Surface area relative to the tree as built; 1.0 right after a build.
+    """
+    def growth(self):
+        if not self.build_area:
+            return 1.0
+        return self.surface_area() / self.build_area
+
+    """
+    Refits the node boxes to new triangle bounds, keeping the topology.
+
+    Leaf boxes are reduced from their triangles' bounds in one pass, then
+    each level of internal nodes (deepest first) takes the union of its
+    children. New box arrays are allocated, so memory-mapped trees work too.
+    Search stays exact; only pruning gets looser as the boxes grow.
+
+    Input:
+        lb, ub: (T x 3) arrays
+            Current per-triangle bounds, same triangle order as at build.
+
+    Output:
+        growth(): surface area relative to the tree as built
+    """
+    def refit(self, lb, ub):
+        if self.build_area is None:
+            self.build_area = self.surface_area()
+        if len(self) == 0:
+            return 1.0
+
+        leaves = np.flatnonzero(self.left < 0)
+        leaves = leaves[np.argsort(self.start[leaves], kind='stable')]
+        node_lb = np.empty(self.node_lb.shape, self.node_lb.dtype)
+        node_ub = np.empty(self.node_ub.shape, self.node_ub.dtype)
+        node_lb[leaves] = np.minimum.reduceat(np.asarray(lb)[self.order], self.start[leaves], axis=0)
+        node_ub[leaves] = np.maximum.reduceat(np.asarray(ub)[self.order], self.start[leaves], axis=0)
+
+        for inner in reversed(self.inner_levels()):
+            l, r = self.left[inner], self.right[inner]
+            node_lb[inner] = np.minimum(node_lb[l], node_lb[r])
+            node_ub[inner] = np.maximum(node_ub[l], node_ub[r])
+
+        self.node_lb, self.node_ub = node_lb, node_ub
+        return self.growth()
+
+    """
+    Triangle indices stored in a set of leaf nodes, concatenated.
+    """
+    def leaf_triangles(self, leaves):
+        counts = self.count[leaves]
+        total = int(counts.sum())
+        offsets = np.repeat(self.start[leaves] - np.cumsum(counts) + counts, counts)
+        return self.order[offsets + np.arange(total)]
+
+    """
+    Descends to the leaf whose box is nearest to p, picking the nearer child
+    at each level. Cheap way to get a first upper bound.
+    """
+    def nearest_leaf(self, p):
+        node = 0
+        while self.left[node] >= 0:
+            kids = np.array((self.left[node], self.right[node]))
+            d2 = box_dist2(p, self.node_lb[kids], self.node_ub[kids])
+            node = int(kids[np.argmin(d2)])
+        return node
+
+    """
+    Leaves whose boxes lie within bound of p, found level by level.
+    """
+    def leaves_within(self, p, bound):
+        bound2 = bound * bound
+        frontier = np.zeros(1, int)
+        leaves = []
+        while frontier.size:
+            d2 = box_dist2(p, self.node_lb[frontier], self.node_ub[frontier])
+            frontier = frontier[d2 <= bound2]
+            is_leaf = self.left[frontier] < 0
+            leaves.append(frontier[is_leaf])
+            inner = frontier[~is_leaf]
+            frontier = np.concatenate((self.left[inner], self.right[inner]))
+        return np.concatenate(leaves)
+
+    """
+    nearest_leaf for many points at once: all points descend together, one
+    level per step.
+    """
+    def nearest_leaves(self, points):
+        node = np.zeros(points.shape[0], int)
+        rows = np.flatnonzero(self.left[node] >= 0)
+        while rows.size:
+            l, r = self.left[node[rows]], self.right[node[rows]]
+            dl = box_dist2(points[rows], self.node_lb[l], self.node_ub[l])
+            dr = box_dist2(points[rows], self.node_lb[r], self.node_ub[r])
+            node[rows] = np.where(dl <= dr, l, r)
+            rows = rows[self.left[node[rows]] >= 0]
+        return node
+
+    """
+    leaves_within for many points, each with its own bound: the frontier is
+    a list of (point, node) pairs refined one level per step.
+
+    Output:
+        owner, leaves: parallel arrays; leaves[j] lies within bound[owner[j]]
+            of points[owner[j]]
+    """
+    def leaf_pairs_within(self, points, bound):
+        bound2 = np.asarray(bound, float) ** 2
+        owner = np.arange(points.shape[0])
+        frontier = np.zeros(points.shape[0], int)
+        owners, leaves = [], []
+        while frontier.size:
+            keep = box_dist2(points[owner], self.node_lb[frontier], self.node_ub[frontier]) <= bound2[owner]
+            owner, frontier = owner[keep], frontier[keep]
+            is_leaf = self.left[frontier] < 0
+            owners.append(owner[is_leaf])
+            leaves.append(frontier[is_leaf])
+            owner = np.repeat(owner[~is_leaf], 2)
+            inner = frontier[~is_leaf]
+            frontier = np.stack((self.left[inner], self.right[inner]), axis=1).ravel()
+        return np.concatenate(owners), np.concatenate(leaves)
+
+    """
+    Expands (owner, leaf) pairs into (owner, triangle) pairs.
+    """
+    def _pair_triangles(self, owner, leaves):
+        return np.repeat(owner, self.count[leaves]), self.leaf_triangles(leaves)
+
+    """
+    closest() for many points with a fixed number of NumPy calls, each over
+    the whole set: a bound from each point's nearest leaf, then every
+    (point, triangle) pair within it through one pairwise kernel call. The
+    calls are large enough for NumPy to release the GIL, so chunks of
+    points can be answered on parallel threads. Ties keep the lowest
+    triangle index.
+
+    Input:
+        points: (M x 3) query points.
+        batch: TriangleBatch the tree was built over.
+
+    Output:
+        idx (M,), closest (M x 3), bary (M x 3), dist (M,)
+    """
+    def closest_many(self, points, batch):
+        points = np.asarray(points, float)
+        M = points.shape[0]
+        if M == 0 or len(self) == 0:
+            return np.full(M, -1, int), np.zeros((M, 3)), np.zeros((M, 3)), np.full(M, np.inf)
+
+        # upper bound per point from the triangles of its nearest leaf
+        owner, tris = self._pair_triangles(np.arange(M), self.nearest_leaves(points))
+        _, _, d = batch.closest_points(points[owner], tris)
+        bound = np.full(M, np.inf)
+        np.minimum.at(bound, owner, d)
+
+        # a little slack so a box exactly at the bound is not lost to rounding
+        owner, tris = self._pair_triangles(*self.leaf_pairs_within(points, bound * (1 + batch.slack) + 1e-12))
+        order = np.lexsort((tris, owner))
+        return batch.closest_of_pairs(points, owner[order], tris[order])
+
+    """
+    Branch-and-bound nearest-triangle search.
+
+    The nearest leaf gives an upper bound; every leaf whose box is within
+    that bound is then gathered and evaluated in one batched pass.
+
+    Input:
+        p: Query point (3,).
+        batch: TriangleBatch holding the triangles the tree was built over.
+        bound: optional initial upper bound on the distance (e.g. from a hint).
+
+    Output:
+        idx: int, index of closest triangle (-1 if nothing beats bound)
+        closest: (3,) closest point
+        bary: (3,) barycentric coordinates
+        dist: float
+    """
+    def closest(self, p, batch, bound=np.inf):
+        p = np.asarray(p, float)
+        if len(self) == 0:
+            return -1, None, None, float(bound)
+
+        bound = float(bound)
+        seeded = not np.isfinite(bound)
+        if seeded:
+            seed = self.leaf_triangles(np.array([self.nearest_leaf(p)]))
+            _, _, d = batch.closest_points(p, seed)
+            bound = float(d.min())
+
+        # a little slack so a box exactly at the bound is not lost to rounding
+        idx = self.leaf_triangles(self.leaves_within(p, bound * (1 + batch.slack) + 1e-12))
+        if idx.size == 0:
+            return -1, None, None, bound
+        cps, barys, dists = batch.closest_points(p, idx)
+        k = int(np.argmin(dists))
+        if not seeded and dists[k] > bound:
+            return -1, None, None, bound
+        return int(idx[k]), cps[k], barys[k], float(dists[k])
@@ -0,0 +1,139 @@
+"""
+Deformable (shape-mode) registration for PA5.
+
+The surface is the mean shape plus a weighted sum of displacement modes,
+
+    vertices = modes[0] + sum_i lambda_i * modes[i],
+
+and registration alternates the rigid compute_Freg step with a linear
+least-squares solve for the mode weights lambda. Each closest point c_k
+lies on some triangle with barycentric coordinates (u, v, w), so it is
+the same combination of that triangle's corners in every mode:
+
+    c_k = q_0k + sum_i lambda_i q_ik,   q_ik = u m_i[v1] + v m_i[v2] + w m_i[v3].
+
+Fitting s_k to c_k along the surface normal is then linear in lambda. The
+mesh is updated in place with Mesh.update_vertices.
+
+Author: Emily Guan
+"""
+
+import time
+
+import numpy as np
+
+from utils.metrics import RegistrationSummary
+from utils.transform_register import compute_Freg, apply, skew
+
+
+"""
+Vertices for mode weights lam: modes[0] + sum_i lam_i * modes[i].
+"""
+def deformed_vertices(modes, lam):
+    return modes[0] + np.einsum('m,mvk->vk', np.asarray(lam, float), modes[1:])
+
+"""
+Per-point mode coordinates q (N_modes + 1, N, 3): each mode's vertex
+values at the points' triangles, blended by their barycentric coordinates.
+"""
+def mode_basis(modes, indices, tri_idx, bary):
+    corners = modes[:, indices[tri_idx]]          # (M+1, N, 3 corners, 3)
+    return np.einsum('mnjk,nj->mnk', corners, bary)
+
+"""
+One combined point-to-plane step for a small pose correction and the mode
+weights, with closest-point triangles and barycentric coordinates held
+fixed. For each point s_k with unit normal n_k,
+
+    n_k . (s_k + a x s_k + dt - q_0k - sum_i lam_i q_ik) = 0,
+
+which is linear in (a, dt, lam). Solving the pose correction together
+with lam keeps the shape solve from absorbing pose error (and the next
+rigid step from undoing it), so rounds do not zig-zag.
+
+Returns (dR, dt, lam): rotation and translation to apply on the left of
+the current pose, and the new mode weights.
+"""
+def solve_mode_weights(s, q, normals):
+    s = np.asarray(s, float)
+    n = normals / np.linalg.norm(normals, axis=1, keepdims=True)
+
+    A = np.concatenate((np.cross(s, n), n, -np.einsum('mnk,nk->nm', q[1:], n)), axis=1)
+    b = np.einsum('nk,nk->n', n, q[0] - s)
+    x, *_ = np.linalg.lstsq(A, b, rcond=None)
+
+    # Cayley form of the small rotation a: exactly orthonormal, ~ I + skew(a)
+    U = skew(0.5 * x[0:3])
+    I = np.eye(3)
+    dR = np.linalg.solve(I - U, I + U)
+    return dR, x[3:6], x[6:]
+
+"""
+Alternating rigid / mode registration.
+
+Input:
+    mesh: Mesh whose vertices follow modes (it is deformed in place).
+    d: (N,3) sample points in frame B.
+    modes: (N_modes + 1, N_vertices, 3) array from utils.IO.read_modes.
+    threshold: passed to compute_Freg.
+    max_outer: maximum number of rigid + mode rounds.
+    rigid_iter: compute_Freg iterations per round; each round starts from
+        the previous round's pose and the mode step also corrects the pose,
+        so short rigid steps are enough.
+    tol: stop once no mode weight changes by more than tol.
+    lam: optional initial weights (default zeros, i.e. the mean shape).
+    callbacks, verbose: passed to compute_Freg.
+    use_linear: linear closest-point search instead of the mesh's mode.
+
+Output:
+    R, t: final rigid registration
+    lam: (N_modes,) mode weights
+    summary: RegistrationSummary over every rigid iteration; converged
+        means the mode weights settled within tol.
+"""
+def compute_deformable(mesh, d, modes, threshold=1e-3, max_outer=100, tol=1e-4, rigid_iter=1,
+                       lam=None, callbacks=None, verbose=False, use_linear=False):
+
+    start = time.perf_counter()
+    records = []
+    callbacks = [records.append] + list(callbacks or [])
+
+    n_modes = modes.shape[0] - 1
+    lam = np.zeros(n_modes) if lam is None else np.asarray(lam, float)
+    mesh.update_vertices(deformed_vertices(modes, lam))
+
+    R, t = None, None
+    converged = False
+    for rounds in range(1, max_outer + 1):
+        R, t = compute_Freg(mesh, d, threshold, rigid_iter, use_linear, callbacks=callbacks, verbose=verbose,
+                            R0=R, t0=t)
+        s = apply(d, R, t)
+
+        c, normals, tri_idx = mesh.find_closest_point(s, use_linear=use_linear, return_normals=True,
+                                                      return_indices=True)
+        _, bary, _ = mesh.batch.closest_points(c, tri_idx)
+        dR, dt, new = solve_mode_weights(s, mode_basis(modes, mesh.indices, tri_idx, bary), normals)
+
+        R, t = dR @ R, dR @ t + dt
+        mesh.update_vertices(deformed_vertices(modes, new))
+        change = np.max(np.abs(new - lam)) if n_modes else 0.0
+        lam = new
+        if verbose:
+            print(f"round {rounds}: mode weights {np.round(lam, 4)}, max change {change:.3g}")
+        if change < tol:
+            converged = True
+            break
+
+    return R, t, lam, RegistrationSummary(records, converged, time.perf_counter() - start)
+
+"""
+Deformable counterpart of compute_ck: returns (c, s, lam) with c on the
+deformed mesh, or (c, s, lam, summary) with return_summary.
+"""
+def compute_ck_deformable(mesh, d, modes, threshold=1e-3, return_summary=False, **kwargs):
+    R, t, lam, summary = compute_deformable(mesh, d, modes, threshold, **kwargs)
+    s = apply(d, R, t)
+    c = mesh.find_closest_point(s, use_linear=kwargs.get("use_linear", False))
+    if return_summary:
+        return c, s, lam, summary
+    return c, s, lam
@@ -0,0 +1,194 @@
+"""
+Sampled distance field over a mesh's bounding volume (plus a margin).
+
+Every voxel stores, for its center v, the nearest triangle and distance
+dist(v), and a candidate list: all triangles within dist(v) + 2r of v, r
+being the voxel's half-diagonal. For any p in the voxel (|p - v| <= r) the
+true nearest triangle T* satisfies
+
+    d(v, T*) <= d(p, T*) + r <= d(p, nearest(v)) + r <= dist(v) + 2r,
+
+so it is always in the list and checking the list exactly gives the exact
+answer. Per-query cost is one voxel lookup plus one small kernel call.
+Candidates are stored CSR-style (cand_start / cand_tris), in increasing
+triangle order so ties resolve as in a linear scan.
+
+Author: Emily Guan
+"""
+
+import numpy as np
+
+from utils.bvh import BVH, box_dist2
+
+# arrays that fully describe a built field
+FIELD_ARRAYS = ("origin", "dims", "nearest", "dist", "cand_start", "cand_tris")
+
+
+class DistanceField:
+
+    """
+    Input:
+        batch: TriangleBatch of the mesh.
+        cell_size: float
+            Voxel edge length.
+        margin: float, optional
+            Padding around the mesh bounds (default: one voxel).
+        bvh: BVH, optional
+            Tree over the same triangles, used to prune the build.
+    """
+    def __init__(self, batch, cell_size, margin=None, bvh=None):
+        self.cell_size = float(cell_size)
+        margin = self.cell_size if margin is None else float(margin)
+
+        self.origin = batch.lb.min(axis=0) - margin
+        extent = batch.ub.max(axis=0) + margin - self.origin
+        self.dims = np.maximum(np.ceil(extent / self.cell_size).astype(int), 1)
+
+        self.build(batch, bvh)
+
+    """
+    Flat arrays describing the field (for saving to disk).
+    """
+    def to_arrays(self):
+        return {name: getattr(self, name) for name in FIELD_ARRAYS}
+
+    """
+    Rebuilds a field around arrays from to_arrays (e.g. memory-mapped) without copying.
+    """
+    @classmethod
+    def from_arrays(cls, arrays, cell_size):
+        field = cls.__new__(cls)
+        field.cell_size = float(cell_size)
+        for name in FIELD_ARRAYS:
+            setattr(field, name, arrays[name])
+        return field
+
+    def __len__(self):
+        return int(np.prod(self.dims))
+
+    """
+    Half the voxel diagonal: the farthest a point in a voxel is from its center.
+    """
+    @property
+    def radius(self):
+        return 0.5 * np.sqrt(3.0) * self.cell_size
+
+    """
+    Voxel centers in flat (C) order.
+    """
+    def centers(self):
+        axes = [np.arange(n) for n in self.dims]
+        ijk = np.stack(np.meshgrid(*axes, indexing='ij'), axis=-1).reshape(-1, 3)
+        return self.origin + (ijk + 0.5) * self.cell_size
+
+    """
+    Samples nearest triangle / distance at every voxel center and gathers
+    each voxel's candidates, a block of voxels at a time. The BVH over the
+    triangle boxes prunes both steps: the nearest triangle comes from
+    BVH.closest_many, and only triangles in leaves within a voxel's
+    candidate bound are screened by box distance and checked exactly in one
+    pairwise kernel call. A tree is built if none is given.
+    """
+    def build(self, batch, bvh=None, block=4096):
+        if bvh is None:
+            bvh = BVH(batch.lb, batch.ub)
+        centers = self.centers()
+        V = centers.shape[0]
+        r2 = 2.0 * self.radius
+
+        self.nearest = np.empty(V, int)
+        self.dist = np.empty(V, batch.dtype)
+        slack = batch.slack
+        voxels, tris = [], []
+
+        for s in range(0, V, block):
+            c = centers[s:s + block]
+            nearest, _, _, dist = bvh.closest_many(c, batch)
+            self.nearest[s:s + c.shape[0]] = nearest
+            self.dist[s:s + c.shape[0]] = dist
+
+            # candidates: every triangle within dist + 2r, slack so rounding
+            # never drops the nearest triangle itself
+            bound = (dist + r2) * (1 + slack) + 1e-12
+            owner, leaves = bvh.leaf_pairs_within(c, bound)
+            vi, ti = np.repeat(owner, bvh.count[leaves]), bvh.leaf_triangles(leaves)
+            # a triangle whose whole box is within the bound is in; one whose
+            # box is beyond it is out; only the rest need the exact distance
+            p, lb, ub, b2 = c[vi], batch.lb[ti], batch.ub[ti], bound[vi] ** 2
+            far = np.maximum(np.abs(p - lb), np.abs(p - ub))
+            inside = np.einsum('ij,ij->i', far, far) <= b2
+            check = np.flatnonzero(~inside & (box_dist2(p, lb, ub) <= b2))
+            _, _, d = batch.closest_points(p[check], ti[check])
+            inside[check[d <= bound[vi[check]]]] = True
+            voxels.append(vi[inside] + s)
+            tris.append(ti[inside])
+
+        # sort each voxel's triangles so ties resolve as in a linear scan
+        voxels, tris = np.concatenate(voxels), np.concatenate(tris)
+        order = np.lexsort((tris, voxels))
+        self.cand_tris = tris[order]
+        self.cand_start = np.zeros(V + 1, int)
+        np.cumsum(np.bincount(voxels, minlength=V), out=self.cand_start[1:])
+
+    """
+    Flat voxel id containing p, or -1 if p is outside the field.
+    """
+    def voxel_of(self, p):
+        k = np.floor((p - self.origin) / self.cell_size).astype(int)
+        if np.any(k < 0) or np.any(k >= self.dims):
+            return -1
+        return int((k[0] * self.dims[1] + k[1]) * self.dims[2] + k[2])
+
+    """
+    Exact nearest-triangle search from the voxel's candidate list.
+
+    Input:
+        p: Query point (3,).
+        batch: TriangleBatch holding the triangles the field was built over.
+
+    Output:
+        idx, closest, bary, dist (idx is -1 if p is outside the field)
+    """
+    def closest(self, p, batch):
+        p = np.asarray(p, float)
+        v = self.voxel_of(p)
+        if v < 0:
+            return -1, None, None, np.inf
+
+        idx = self.cand_tris[self.cand_start[v]:self.cand_start[v + 1]]
+        cps, barys, dists = batch.closest_points(p, idx)
+        k = int(np.argmin(dists))
+        return int(idx[k]), cps[k], barys[k], float(dists[k])
+
+    """
+    closest() for many points: one voxel lookup for all of them, then every
+    (point, candidate) pair through one pairwise kernel call.
+
+    Input:
+        points: (M x 3) query points.
+        batch: TriangleBatch holding the triangles the field was built over.
+
+    Output:
+        idx (M,), closest (M x 3), bary (M x 3), dist (M,)
+        (idx is -1 and dist inf for points outside the field)
+    """
+    def closest_many(self, points, batch):
+        points = np.asarray(points, float)
+        M = points.shape[0]
+        idx, closest, bary, dist = np.full(M, -1, int), np.zeros((M, 3)), np.zeros((M, 3)), np.full(M, np.inf)
+
+        k = np.floor((points - self.origin) / self.cell_size).astype(int)
+        rows = np.flatnonzero(np.all((k >= 0) & (k < self.dims), axis=1))
+        if rows.size == 0:
+            return idx, closest, bary, dist
+        k = k[rows]
+        v = (k[:, 0] * self.dims[1] + k[:, 1]) * self.dims[2] + k[:, 2]
+
+        # each point's candidate list, in list order
+        start, counts = self.cand_start[v], self.cand_start[v + 1] - self.cand_start[v]
+        owner = np.repeat(np.arange(rows.size), counts)
+        offset = np.arange(owner.size) - np.repeat(np.cumsum(counts) - counts, counts)
+        tris = self.cand_tris[start[owner] + offset]
+
+        idx[rows], closest[rows], bary[rows], dist[rows] = batch.closest_of_pairs(points[rows], owner, tris)
+        return idx, closest, bary, dist
@@ -0,0 +1,195 @@
+"""
+Uniform voxel grid over triangle bounds.
+
+Each triangle is binned into every cell its bounding box overlaps; cell
+contents are stored CSR-style (cell_start / cell_tris) so the grid is a
+handful of flat arrays.
+
+Author: Emily Guan
+"""
+
+import numpy as np
+
+# arrays that fully describe a built grid
+GRID_ARRAYS = ("origin", "dims", "cell_start", "cell_tris")
+
+
+class UniformGrid:
+
+    """
+    Input:
+        lb, ub: (T x 3) arrays
+            Per-triangle bounds.
+        cell_size: float, optional
+            Edge length of a cell. Overrides resolution.
+        resolution: int, optional
+            Number of cells along the longest axis.
+        avg_edge: float, optional
+            Mean triangle edge length, used by the automatic default.
+
+    With neither cell_size nor resolution given, cells are sized so there is
+    roughly one triangle per cell, but never smaller than avg_edge.
+    """
+    def __init__(self, lb, ub, cell_size=None, resolution=None, avg_edge=None):
+        lb = np.asarray(lb, float)
+        ub = np.asarray(ub, float)
+
+        self.origin = lb.min(axis=0)
+        extent = np.maximum(ub.max(axis=0) - self.origin, 1e-12)
+
+        if cell_size is None:
+            cell_size = self.default_cell_size(extent, lb.shape[0], resolution, avg_edge)
+        self.cell_size = float(cell_size)
+        self.dims = np.maximum(np.ceil(extent / self.cell_size).astype(int), 1)
+
+        self.bin(lb, ub)
+
+    """
+    Flat arrays describing the grid (for saving to disk).
+    """
+    def to_arrays(self):
+        return {"origin": self.origin, "dims": self.dims,
+                "cell_start": self.cell_start, "cell_tris": self.cell_tris}
+
+    """
+    Rebuilds a grid around arrays from to_arrays (e.g. memory-mapped) without copying.
+    """
+    @classmethod
+    def from_arrays(cls, arrays, cell_size):
+        grid = cls.__new__(cls)
+        grid.cell_size = float(cell_size)
+        for name in GRID_ARRAYS:
+            setattr(grid, name, arrays[name])
+        return grid
+
+    """
+    Automatic cell size from triangle count, extent and average edge length.
+    """
+    @staticmethod
+    def default_cell_size(extent, n_triangles, resolution=None, avg_edge=None):
+        if resolution is not None:
+            return float(extent.max()) / max(int(resolution), 1)
+
+        cell = (np.prod(extent) / max(n_triangles, 1)) ** (1.0 / 3.0)
+        if avg_edge is not None:
+            cell = max(cell, float(avg_edge))
+        return float(cell)
+
+    """
+    Integer cell coordinates of points (unclamped).
+    """
+    def cell_of(self, p):
+        return np.floor((np.asarray(p, float) - self.origin) / self.cell_size).astype(int)
+
+    """
+    Flattened cell id from (i, j, k) coordinates.
+    """
+    def flat(self, ijk):
+        return (ijk[..., 0] * self.dims[1] + ijk[..., 1]) * self.dims[2] + ijk[..., 2]
+
+    """
+    Bins every triangle into each cell its bounding box overlaps.
+    """
+    def bin(self, lb, ub):
+        lo = np.clip(self.cell_of(lb), 0, self.dims - 1)
+        hi = np.clip(self.cell_of(ub), 0, self.dims - 1)
+        span = hi - lo + 1
+        per_tri = np.prod(span, axis=1)
+
+        # expand each triangle into its cells
+        tri = np.repeat(np.arange(lb.shape[0]), per_tri)
+        local = np.arange(per_tri.sum()) - np.repeat(np.cumsum(per_tri) - per_tri, per_tri)
+        sy, sz = span[tri, 1], span[tri, 2]
+        offs = np.stack((local // (sy * sz), (local // sz) % sy, local % sz), axis=1)
+        cells = self.flat(lo[tri] + offs)
+
+        order = np.argsort(cells, kind='stable')
+        self.cell_tris = tri[order]
+        n_cells = int(np.prod(self.dims))
+        self.cell_start = np.zeros(n_cells + 1, int)
+        np.cumsum(np.bincount(cells, minlength=n_cells), out=self.cell_start[1:])
+
+    """
+    Re-bins moved triangles into the same cells layout.
+
+    Only valid while every box stays inside the grid (clamping an outside
+    triangle into a border cell would break the ring stopping test for
+    queries outside the grid), so nothing is changed otherwise.
+
+    Output:
+        True if the grid was refit, False if it must be rebuilt.
+    """
+    def refit(self, lb, ub):
+        lb = np.asarray(lb, float)
+        ub = np.asarray(ub, float)
+        if lb.size and (np.any(lb < self.origin) or np.any(ub > self.origin + self.dims * self.cell_size)):
+            return False
+        self.bin(lb, ub)
+        return True
+
+    """
+    Cells at Chebyshev distance exactly r from cell k, clipped to the grid.
+    """
+    def shell(self, k, r):
+        lo = np.maximum(k - r, 0)
+        hi = np.minimum(k + r, self.dims - 1)
+        if np.any(lo > hi):
+            return np.zeros(0, int)
+
+        axes = [np.arange(lo[i], hi[i] + 1) for i in range(3)]
+        ijk = np.stack(np.meshgrid(*axes, indexing='ij'), axis=-1).reshape(-1, 3)
+        ijk = ijk[np.abs(ijk - k).max(axis=1) == r]
+        return self.flat(ijk)
+
+    """
+    Triangles binned into the given cells (may contain repeats).
+    """
+    def cell_triangles(self, cells):
+        s = self.cell_start[cells]
+        counts = self.cell_start[cells + 1] - s
+        total = int(counts.sum())
+        offsets = np.repeat(s - np.cumsum(counts) + counts, counts)
+        return self.cell_tris[offsets + np.arange(total)]
+
+    """
+    Shell-by-shell nearest-triangle search.
+
+    Cells are visited in rings of growing Chebyshev radius around p's cell.
+    After ring r, any unvisited triangle is at least r * cell_size + (gap from
+    p to its own cell's faces) away, so the search stops once the best
+    distance is below that.
+
+    Input:
+        p: Query point (3,).
+        batch: TriangleBatch holding the triangles the grid was built over.
+
+    Output:
+        idx, closest, bary, dist (idx is -1 for an empty grid)
+    """
+    def closest(self, p, batch):
+        p = np.asarray(p, float)
+        best = (-1, None, None, np.inf)
+
+        k = self.cell_of(p)
+        q = (p - self.origin) / self.cell_size - k
+        margin = float(np.minimum(q, 1.0 - q).min()) * self.cell_size
+
+        # farthest ring that still touches the grid
+        r_max = int(np.maximum(np.abs(k), np.abs(self.dims - 1 - k)).max())
+
+        # triangles checked so far; grows with the rings visited, not the mesh
+        seen = np.zeros(0, int)
+        for r in range(r_max + 1):
+            idx = self.cell_triangles(self.shell(k, r))
+            idx = np.setdiff1d(np.unique(idx), seen, assume_unique=True)
+            if idx.size:
+                seen = np.concatenate((seen, idx))
+                cps, barys, dists = batch.closest_points(p, idx)
+                j = int(np.argmin(dists))
+                if dists[j] < best[3]:
+                    best = (int(idx[j]), cps[j], barys[j], float(dists[j]))
+
+            if best[3] <= r * self.cell_size + margin:
+                break
+
+        return best
@@ -4,52 +4,256 @@ Mesh Object File.
 Author: Emily Guan
 """
 
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
 from typing import List
 import numpy as np
 from utils.triangles import Triangle
+from utils.triangle_batch import TriangleBatch, coord_dtype
+from utils.bvh import BVH
+from utils.grid import UniformGrid
+from utils.distance_field import DistanceField
+
+# search modes accepted by Mesh.find_closest_point
+SEARCH_MODES = ("linear", "box", "bvh", "grid", "walk", "field")
+
+# storage / kernel precisions accepted by Mesh (see Mesh.astype)
+PRECISIONS = {"float64": np.float64, "float32": np.float32}
 
 class Mesh:
-    def __init__(self, vertices, indices):
-        self.vertices = np.asarray(vertices, float)
+
+    """
+    Input:
+        vertices: (N_vertices x 3) array
+        indices: (N_triangles x 3) vertex indices of each triangle
+        mode: default search mode for find_closest_point
+        neighbors: optional (N_triangles x 3) neighbor table from the .sur
+            file; -1 entries are filled in from shared edges.
+        dtype: float (float64) or np.float32. A float32 mesh stores vertices
+            and per-face data and runs the closest-point kernels in float32;
+            query results are still returned as float64.
+    """
+    def __init__(self, vertices, indices, mode="box", neighbors=None, dtype=float):
+        self._set_mode(mode)
+
+        self.vertices = np.asarray(vertices, coord_dtype(np.empty(0, dtype)))
         self.indices = np.asarray(indices, int)
 
-        self.triangles: List[Triangle] = []
-        self.tri_indices: List[tuple] = []
+        # per-face data lives in contiguous arrays; no per-triangle objects
         self.build_mesh()
 
         self.vertex_normals = np.zeros_like(self.vertices)
         self._compute_vertex_normals()
 
-    def build_mesh(self):
-        for (i1, i2, i3) in self.indices:
-            tri = Triangle(self.vertices[i1], self.vertices[i2], self.vertices[i3])
-            self.triangles.append(tri)
-            self.tri_indices.append((i1, i2, i3))
+        self.neighbors = self._build_neighbors(neighbors)
+
+        self._init_state()
+
+    """
+    Builds a Mesh from precomputed arrays (e.g. a memory-mapped cache)
+    without recomputing normals, bounds or adjacency. Arrays are used as
+    given, so read-only memory maps stay zero-copy.
+    """
+    @classmethod
+    def from_arrays(cls, vertices, indices, neighbors, face_normals, vertex_normals, lb, ub, mode="box"):
+        mesh = cls.__new__(cls)
+        mesh._set_mode(mode)
+
+        mesh.vertices = vertices
+        mesh.indices = indices
+        mesh.build_mesh(face_normals, lb, ub)
+        mesh.vertex_normals = vertex_normals
+        mesh.neighbors = neighbors
+
+        mesh._init_state()
+        return mesh
+
+    """
+    Copy of the mesh stored in dtype (float64 or np.float32), reusing the
+    normals, bounds and adjacency instead of recomputing them. Spatial
+    indexes are not copied; they are built on first use.
+    """
+    def astype(self, dtype):
+        dtype = coord_dtype(np.empty(0, dtype))
+        if dtype == self.dtype:
+            return self
+        b = self.batch
+        return Mesh.from_arrays(self.vertices.astype(dtype), self.indices, self.neighbors,
+                                b.normal.astype(dtype), self.vertex_normals.astype(dtype),
+                                b.lb.astype(dtype), b.ub.astype(dtype), mode=self.mode)
+
+    @property
+    def dtype(self):
+        return self.vertices.dtype
+
+    """
+    Query-side state: spatial indexes (built on first use) and the optional
+    thread pool used by find_closest_point.
+    """
+    def _init_state(self):
+        self.bvh = None
+        self.grid = None
+        self.field = None
+
+        self.workers = 1
+        self.chunk_size = 64
+        self._pool = None
+        self.counter = None
+
+        # decimated copies by cell size (see decimated)
+        self._decimated = {}
+
+    """
+    Routes query and kernel-evaluation counts to a utils.metrics.QueryCounter
+    (None to stop counting).
+    """
+    def attach_counter(self, counter):
+        self.counter = counter
+        self.batch.counter = counter
+
+    def _set_mode(self, mode):
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"unknown search mode {mode!r}, expected one of {SEARCH_MODES}")
+        self.mode = mode
+
+    """
+    Gathers triangle corners into a TriangleBatch (edges, normals, bounds
+    and dot products for all faces). Normals and bounds may be passed in
+    when already known.
+    """
+    def build_mesh(self, face_normals=None, lb=None, ub=None):
+        self.batch = TriangleBatch(self.vertices[self.indices[:, 0]],
+                                   self.vertices[self.indices[:, 1]],
+                                   self.vertices[self.indices[:, 2]],
+                                   normal=face_normals, lb=lb, ub=ub)
 
     """
     Smooth normals = average of adjacent face normals.
     """
     def _compute_vertex_normals(self):
-        
+
         self.vertex_normals[:] = 0.0
-        for (i1, i2, i3), tri in zip(self.tri_indices, self.triangles):
-            n = tri.normal
-            self.vertex_normals[i1] += n
-            self.vertex_normals[i2] += n
-            self.vertex_normals[i3] += n
+        face_normals = np.repeat(self.batch.normal, 3, axis=0)
+        np.add.at(self.vertex_normals, self.indices.ravel(), face_normals)
 
         # normalize
-        for i in range(len(self.vertex_normals)):
-            n = self.vertex_normals[i]
-            norm = np.linalg.norm(n)
-            if norm > 1e-12:
-                self.vertex_normals[i] = n / norm
+        norm = np.linalg.norm(self.vertex_normals, axis=1)
+        ok = norm > 1e-12
+        self.vertex_normals[ok] /= norm[ok, None]
+
+    """
+    Triangle adjacency. neighbors[t, k] is the triangle across the edge
+    opposite vertex k of triangle t (-1 on a boundary). Entries given in the
+    file are kept; missing ones are derived by matching shared edges.
+    """
+    def _build_neighbors(self, neighbors=None):
+        T = self.indices.shape[0]
+        if neighbors is None:
+            table = np.full((T, 3), -1, int)
+        else:
+            table = np.array(neighbors, int).reshape(T, 3)
+
+        # edge k of triangle t joins the two vertices other than vertex k
+        edges = np.stack([self.indices[:, [(k + 1) % 3, (k + 2) % 3]] for k in range(3)], axis=1)
+        edges = np.sort(edges.reshape(-1, 2), axis=1)
+        key = edges[:, 0] * (len(self.vertices) + 1) + edges[:, 1]
+
+        order = np.argsort(key, kind='stable')
+        same = key[order[1:]] == key[order[:-1]]
+        f1, f2 = order[:-1][same], order[1:][same]
+
+        derived = np.full(3 * T, -1, int)
+        derived[f1] = f2 // 3
+        derived[f2] = f1 // 3
+        derived = derived.reshape(T, 3)
+
+        missing = table < 0
+        table[missing] = derived[missing]
+        return table
+
+    """
+    SHA-256 over the vertex and index arrays. Saved spatial indexes are
+    checked against it before reuse.
+    """
+    def content_hash(self):
+        h = hashlib.sha256()
+        for arr in (self.vertices, self.indices):
+            arr = np.ascontiguousarray(arr)
+            h.update(f"{arr.dtype.str}{arr.shape}".encode())
+            h.update(arr.data)
+        return h.hexdigest()
+
+    """
+    Moves the vertices (same count and connectivity) in place of building a
+    new Mesh. Face normals, bounds and vertex normals are recomputed with
+    array operations into the existing TriangleBatch, and built indexes are
+    refit (see refit_indexes), so a shape update costs O(T) array work.
+    """
+    def update_vertices(self, vertices, rebuild=False, max_growth=2.0):
+        vertices = np.asarray(vertices, self.dtype)
+        if vertices.shape != self.vertices.shape:
+            raise ValueError(f"expected vertices of shape {self.vertices.shape}, got {vertices.shape}")
+
+        self.vertices = vertices
+        self.batch.set_corners(vertices[self.indices[:, 0]],
+                               vertices[self.indices[:, 1]],
+                               vertices[self.indices[:, 2]])
+
+        # always a new array: the old one may be a cache memory map or shared
+        # memory that other meshes (other worker processes) still read
+        self.vertex_normals = np.zeros_like(vertices)
+        self._compute_vertex_normals()
+
+        self.refit_indexes(rebuild, max_growth)
+        self._decimated = {}
+
+    """
+    Brings built spatial indexes up to date after the triangles moved.
+
+    The BVH is refit bottom-up and rebuilt only once its box surface area
+    exceeds max_growth times the built tree's (or when rebuild is set). The
+    grid is re-binned while the mesh stays inside it and rebuilt with the
+    same cell size otherwise. The distance field cannot be refit; it is
+    dropped and rebuilt on next use.
+    """
+    def refit_indexes(self, rebuild=False, max_growth=2.0):
+        lb, ub = self.batch.lb, self.batch.ub
+
+        if self.bvh is not None:
+            if rebuild or self.bvh.refit(lb, ub) > max_growth:
+                self.build_bvh(self.bvh.leaf_size)
+
+        if self.grid is not None:
+            if rebuild or not self.grid.refit(lb, ub):
+                self.build_grid(cell_size=self.grid.cell_size)
+
+        self.field = None
 
     def __len__(self):
-        return len(self.triangles)
+        return self.indices.shape[0]
 
+    """
+    Triangle view of face idx. Its arrays are views into the mesh's
+    per-face arrays, so no geometry is recomputed or copied.
+    """
     def __getitem__(self, idx):
-        return self.triangles[idx]
+        b = self.batch
+        return Triangle.from_arrays(b.a[idx], b.b[idx], b.c[idx], b.lb[idx], b.ub[idx], b.normal[idx])
+
+    """
+    All faces as Triangle views (backward compatibility; builds one object
+    per face, so prefer indexing or the batch arrays).
+    """
+    @property
+    def triangles(self) -> List[Triangle]:
+        return [self[i] for i in range(len(self))]
+
+    """
+    Vertex index triples of each face (backward compatibility; same data as indices).
+    """
+    @property
+    def tri_indices(self) -> List[tuple]:
+        return [tuple(row) for row in self.indices]
 
     """
     Barycentric Interpolation. 
@@ -59,7 +263,7 @@ class Mesh:
     def _interpolated_normal(self, tri_idx, bary):
         
         u, v, w = bary
-        i1, i2, i3 = self.tri_indices[tri_idx]
+        i1, i2, i3 = self.indices[tri_idx]
 
         n = (
             u * self.vertex_normals[i1] +
@@ -69,85 +273,365 @@ class Mesh:
         norm = np.linalg.norm(n)
         return n / norm
 
+    """
+    Vectorized _interpolated_normal for (M,) triangle indices and (M,3)
+    barycentric coordinates (same arithmetic, so results match exactly).
+    """
+    def interpolated_normals(self, tri_idx, bary):
+        corners = self.indices[tri_idx]
+        n = (
+            bary[:, 0, None] * self.vertex_normals[corners[:, 0]] +
+            bary[:, 1, None] * self.vertex_normals[corners[:, 1]] +
+            bary[:, 2, None] * self.vertex_normals[corners[:, 2]]
+        )
+        return n / np.linalg.norm(n, axis=1, keepdims=True)
+
+    """
+    Evaluates p against the triangles in idx (all if None) in one batched pass
+    and keeps the first minimum, as the sequential strict-< search did.
+        Returns (triangle_index, closest_point, barycentric)
+    """
+    def _closest_of(self, p, idx=None):
+        cps, barys, dists = self.batch.closest_points(p, idx)
+        k = int(np.argmin(dists))
+        best_idx = k if idx is None else int(idx[k])
+        return best_idx, cps[k], barys[k]
+
+    """
+    Turns a (triangle_index, closest_point, barycentric) search result into
+    (closest_point, interpolated_normal).
+    """
+    def _with_normal(self, found):
+        idx, cp, bary = found
+        return cp, self._interpolated_normal(idx, bary)
+
+    def _search_linear(self, p, hint=-1):
+        return self._closest_of(p)
+
+    def _search_box(self, p, hint=-1):
+        # seed bound from the first few triangles
+        seed = np.arange(min(6, len(self)))
+        _, _, d = self.batch.closest_points(p, seed)
+        bound = d.min()
+
+        # only triangles whose box (grown by bound) contains p can beat it
+        mask = self.batch.in_box(p, bound)
+        mask[seed] = True
+        return self._closest_of(p, np.flatnonzero(mask))
+
+    def _search_bvh(self, p, hint=-1):
+        if self.bvh is None:
+            self.build_bvh()
+        idx, cp, bary, _ = self.bvh.closest(p, self.batch)
+        return idx, cp, bary
+
+    def _search_grid(self, p, hint=-1):
+        if self.grid is None:
+            self.build_grid()
+        idx, cp, bary, _ = self.grid.closest(p, self.batch)
+        return idx, cp, bary
+
+    """
+    Distance-field search: exact check of the query voxel's candidate list.
+    Points outside the field fall back to the BVH.
+    """
+    def _search_field(self, p, hint=-1):
+        if self.field is None:
+            self.build_field()
+        idx, cp, bary, _ = self.field.closest(p, self.batch)
+        if idx < 0:
+            return self._search_bvh(p)
+        return idx, cp, bary
+
+    """
+    Warm-started search: walk from the hint triangle to whichever neighbor
+    is closer until no neighbor improves, then confirm against the BVH
+    restricted to the walk's distance. Only triangles whose boxes lie within
+    that distance are examined, so a good hint makes the check cheap.
+    Without a hint this is a plain BVH search.
+    """
+    def _search_walk(self, p, hint=-1):
+        if hint is None or hint < 0:
+            return self._search_bvh(p)
+
+        cur = int(hint)
+        cps, barys, dists = self.batch.closest_points(p, np.array([cur]))
+        best = (cur, cps[0], barys[0], float(dists[0]))
+
+        while True:
+            nbrs = self.neighbors[cur]
+            nbrs = nbrs[nbrs >= 0]
+            if nbrs.size == 0:
+                break
+            cps, barys, dists = self.batch.closest_points(p, nbrs)
+            k = int(np.argmin(dists))
+            if dists[k] >= best[3]:
+                break
+            cur = int(nbrs[k])
+            best = (cur, cps[k], barys[k], float(dists[k]))
+
+        # fall back to the global index, bounded by the walk's distance
+        if self.bvh is None:
+            self.build_bvh()
+        idx, cp, bary, d = self.bvh.closest(p, self.batch, bound=best[3])
+        if idx >= 0 and d < best[3]:
+            return idx, cp, bary
+        return best[:3]
+
+    """
+    Batched searches used by find_closest_point: (M x 3) points and optional
+    (M,) hints to (M,) triangle indices, closest points and barycentric
+    coordinates. box, bvh and field check the same candidates as their
+    per-point searches above in a few NumPy calls over the whole set; ties
+    keep the lowest triangle index. linear (already one kernel call over
+    the whole mesh per point), grid and walk stay per-point.
+    """
+    def _closest_linear(self, points, hints=None):
+        return self._closest_each(self._search_linear, points, hints)
+
+    def _closest_box(self, points, hints=None):
+        b, M = self.batch, points.shape[0]
+        # seed bound per point from the first few triangles
+        seed = np.arange(min(6, len(self)))
+        bound = b.closest_of_pairs(points, np.repeat(np.arange(M), seed.size), np.tile(seed, M))[3]
+
+        # only triangles whose box (grown by the bound) contains the point can beat it
+        margin = bound[:, None, None]
+        mask = (np.all(points[:, None] >= b.lb - margin, axis=2) &
+                np.all(points[:, None] <= b.ub + margin, axis=2))
+        mask[:, seed] = True
+        return b.closest_of_pairs(points, *np.nonzero(mask))[:3]
+
+    def _closest_bvh(self, points, hints=None):
+        return self.bvh.closest_many(points, self.batch)[:3]
+
+    def _closest_field(self, points, hints=None):
+        idx, cps, barys, _ = self.field.closest_many(points, self.batch)
+        outside = np.flatnonzero(idx < 0)
+        if outside.size:
+            idx[outside], cps[outside], barys[outside], _ = self.bvh.closest_many(points[outside], self.batch)
+        return idx, cps, barys
+
+    def _closest_grid(self, points, hints=None):
+        return self._closest_each(self._search_grid, points, hints)
+
+    def _closest_walk(self, points, hints=None):
+        return self._closest_each(self._search_walk, points, hints)
+
+    def _closest_each(self, search, points, hints):
+        found = [search(p, -1 if hints is None else hints[i]) for i, p in enumerate(points)]
+        idx, cps, barys = zip(*found)
+        return np.array(idx, int), np.array(cps), np.array(barys)
+
     """
     Given a point, returns the closest point on mesh using linear search.
         Returns (closest_point, interpolated_normal)
     """
     def find_closest_point_linear(self, p):
-        
-        p = np.asarray(p, float)
-        min_dist = float('inf')
-        best_cp = None
-        best_bary = None
-        best_idx = -1
-
-        for idx, tri in enumerate(self.triangles):
-            cp, bary = tri.closest_point(p)
-            dist = np.linalg.norm(cp - p)
-            if dist < min_dist:
-                min_dist = dist
-                best_cp = cp
-                best_bary = bary
-                best_idx = idx
-
-        n = self._interpolated_normal(best_idx, best_bary)
-        return best_cp, n
+        return self._with_normal(self._search_linear(np.asarray(p, float)))
 
     """
     Given a point, returns the closest point on mesh using bounding box search.
         Returns (closest_point, interpolated_normal)
     """
     def find_closest_point_box(self, p):
-        p = np.asarray(p, float)
-        bound = float('inf')
-        best_cp = None
-        best_bary = None
-        best_idx = -1
-
-        for idx, tri in enumerate(self.triangles[:6]):
-            cp, bary = tri.closest_point(p)
-            d = np.linalg.norm(cp - p)
-            if d < bound:
-                bound = d
-                best_cp = cp
-                best_bary = bary
-                best_idx = idx
-
-        for idx, tri in enumerate(self.triangles):
-            if not tri.in_box(p, bound):
-                continue
-            cp, bary = tri.closest_point(p)
-            d = np.linalg.norm(cp - p)
-            if d < bound:
-                bound = d
-                best_cp = cp
-                best_bary = bary
-                best_idx = idx
-
-        n = self._interpolated_normal(best_idx, best_bary)
-        return best_cp, n
-
-    """
-    Given a point, returns the closest point on mesh using linear search or bounding box, up to user.
-    """
-    def find_closest_point(self, points, use_linear=False, return_normals=False):
+        return self._with_normal(self._search_box(np.asarray(p, float)))
+
+    """
+    Builds (or rebuilds) the bounding-volume hierarchy over triangle bounds.
+    """
+    def build_bvh(self, leaf_size=8):
+        self.bvh = BVH(self.batch.lb, self.batch.ub, leaf_size=leaf_size)
+        return self.bvh
+
+    """
+    Given a point, returns the closest point on mesh using BVH branch-and-bound.
+        Returns (closest_point, interpolated_normal)
+    """
+    def find_closest_point_bvh(self, p):
+        return self._with_normal(self._search_bvh(np.asarray(p, float)))
+
+    """
+    Mean triangle edge length.
+    """
+    def average_edge_length(self):
+        b = self.batch
+        return float(np.mean(np.sqrt(np.concatenate((b.d00, b.bc_len2, b.d11)))))
+
+    """
+    Coarser copy of the mesh by vertex clustering: vertices in the same
+    cell_size voxel merge into their mean, and triangles that collapse
+    (repeated corners, zero area) or duplicate another are dropped.
+    Surface detail below about cell_size is lost.
+    """
+    def decimate(self, cell_size):
+        key = np.floor((self.vertices - self.vertices.min(axis=0)) / float(cell_size)).astype(np.int64)
+        _, cluster, counts = np.unique(key, axis=0, return_inverse=True, return_counts=True)
+        cluster = cluster.ravel()
+
+        vertices = np.zeros((counts.size, 3))
+        np.add.at(vertices, cluster, self.vertices.astype(float))
+        vertices /= counts[:, None]
+
+        tris = cluster[self.indices]
+        tris = tris[(tris[:, 0] != tris[:, 1]) & (tris[:, 1] != tris[:, 2]) & (tris[:, 2] != tris[:, 0])]
+        _, first = np.unique(np.sort(tris, axis=1), axis=0, return_index=True)
+        tris = tris[np.sort(first)]
+
+        area2 = np.linalg.norm(np.cross(vertices[tris[:, 1]] - vertices[tris[:, 0]],
+                                        vertices[tris[:, 2]] - vertices[tris[:, 0]]), axis=1)
+        tris = tris[area2 > 1e-12 * float(cell_size) ** 2]
+        return Mesh(vertices, tris, mode=self.mode, dtype=self.dtype)
+
+    """
+    Cached decimate(cell_size); the cache is cleared when vertices move.
+    """
+    def decimated(self, cell_size):
+        key = float(cell_size)
+        if key not in self._decimated:
+            self._decimated[key] = self.decimate(key)
+        return self._decimated[key]
+
+    """
+    Builds (or rebuilds) the uniform grid index. With no cell_size or
+    resolution, the cell size follows triangle count and average edge length.
+    """
+    def build_grid(self, cell_size=None, resolution=None):
+        self.grid = UniformGrid(self.batch.lb, self.batch.ub, cell_size=cell_size,
+                                resolution=resolution, avg_edge=self.average_edge_length())
+        return self.grid
+
+    """
+    Given a point, returns the closest point on mesh using the uniform grid.
+        Returns (closest_point, interpolated_normal)
+    """
+    def find_closest_point_grid(self, p):
+        return self._with_normal(self._search_grid(np.asarray(p, float)))
+
+    """
+    Builds (or rebuilds) the precomputed distance field over the mesh bounds
+    padded by margin (default one voxel). cell_size defaults to the average
+    edge length; smaller voxels mean shorter candidate lists but a larger,
+    slower-to-build field. The build is pruned with the BVH (built here if
+    needed), which also answers queries outside the field.
+    """
+    def build_field(self, cell_size=None, margin=None):
+        if cell_size is None:
+            cell_size = self.average_edge_length()
+        if self.bvh is None:
+            self.build_bvh()
+        self.field = DistanceField(self.batch, cell_size, margin, bvh=self.bvh)
+        return self.field
+
+    """
+    Given a point, returns the closest point on mesh using the distance field.
+        Returns (closest_point, interpolated_normal)
+    """
+    def find_closest_point_field(self, p):
+        return self._with_normal(self._search_field(np.asarray(p, float)))
+
+    """
+    Given a point and a hint triangle index, returns the closest point on mesh
+    using a neighbor walk from the hint.
+        Returns (closest_point, interpolated_normal)
+    """
+    def find_closest_point_walk(self, p, hint=-1):
+        return self._with_normal(self._search_walk(np.asarray(p, float), hint))
+
+    """
+    Sets how many threads find_closest_point splits queries across.
+
+    The pool is created once and reused by every later call (e.g. every ICP
+    iteration). Each chunk of chunk_size points goes through the same
+    batched search as a serial call, so threaded and serial runs give the
+    same answers. Large NumPy calls release the GIL: the box, bvh and field
+    searches make a few over the whole chunk and linear one over the whole
+    mesh per point, while the many small calls of grid and walk searches
+    gain little from threads. workers <= 1 turns threading off.
+    """
+    def set_workers(self, workers, chunk_size=64):
+        self.close()
+        self.workers = max(int(workers), 1)
+        self.chunk_size = max(int(chunk_size), 1)
+        if self.workers > 1:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers)
+
+    """
+    Shuts down the query thread pool, if any.
+    """
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    """
+    Builds the index a search mode needs, if it is not built yet. Called
+    before queries are split across threads, so workers never race to build it.
+    """
+    def ensure_index(self, mode):
+        if mode in ("bvh", "walk", "field") and self.bvh is None:
+            self.build_bvh()
+        if mode == "grid" and self.grid is None:
+            self.build_grid()
+        elif mode == "field" and self.field is None:
+            self.build_field()
+
+    """
+    Answers points[lo:hi] with one batched search, writing into the shared
+    output arrays.
+    """
+    def _query_chunk(self, search, points, hints, lo, hi, out_points, out_indices, out_normals):
+        idx, cp, bary = search(points[lo:hi], None if hints is None else hints[lo:hi])
+        out_points[lo:hi] = cp
+        out_indices[lo:hi] = idx
+        if out_normals is not None:
+            out_normals[lo:hi] = self.interpolated_normals(idx, bary)
+
+    """
+    Given a point, returns the closest point on mesh using the chosen search mode.
+
+    mode: one of SEARCH_MODES; defaults to self.mode. use_linear forces "linear".
+    hints: optional (N,) triangle indices to start "walk" searches from
+        (-1 for none); other modes ignore them.
+    return_indices: also return the (N,) index of each closest triangle,
+        suitable as hints for the next call.
+
+    Points are answered in chunks of chunk_size, on the mesh's thread pool
+    with set_workers(n > 1) and one after another otherwise (see set_workers).
+    """
+    def find_closest_point(self, points, use_linear=False, return_normals=False, mode=None,
+                           hints=None, return_indices=False):
         points = np.asarray(points, float)
         N = points.shape[0]
         out_points = np.zeros_like(points)
+        out_indices = np.full(N, -1, int)
+        out_normals = np.zeros_like(points) if return_normals else None
 
-        if return_normals:
-            out_normals = np.zeros_like(points)
-
-        for i, p in enumerate(points):
-            if use_linear:
-                cp, n = self.find_closest_point_linear(p)
-            else:
-                cp, n = self.find_closest_point_box(p)
+        if use_linear:
+            mode = "linear"
+        elif mode is None:
+            mode = self.mode
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"unknown search mode {mode!r}, expected one of {SEARCH_MODES}")
+        if self.counter is not None:
+            self.counter.add_queries(N, len(self))
 
-            out_points[i] = cp
-            if return_normals:
-                out_normals[i] = n
+        search = getattr(self, f"_closest_{mode}")
+        self.ensure_index(mode)
+        outputs = (out_points, out_indices, out_normals)
+        chunks = [(lo, min(lo + self.chunk_size, N)) for lo in range(0, N, self.chunk_size)]
+        if self._pool is not None and len(chunks) > 1:
+            futures = [self._pool.submit(self._query_chunk, search, points, hints, lo, hi, *outputs)
+                       for lo, hi in chunks]
+            for future in futures:
+                future.result()
+        else:
+            for lo, hi in chunks:
+                self._query_chunk(search, points, hints, lo, hi, *outputs)
 
+        out = (out_points,)
         if return_normals:
-            return out_points, out_normals
-        return out_points
+            out += (out_normals,)
+        if return_indices:
+            out += (out_indices,)
+        return out if len(out) > 1 else out_points
@@ -0,0 +1,269 @@
+"""
+Binary on-disk cache for parsed meshes and their spatial indexes.
+
+A cache is a sidecar directory next to the source file (<file>.cache/)
+holding a generation directory with one .npy file per array and a
+meta.json that names it and records the SHA-256 of the source text, plus
+the shape, dtype, CRC32, size and modification time of each array.
+Arrays are loaded with memory mapping and checked by size and time only,
+so a valid cache costs almost nothing to open; the full CRC check is
+optional (verify). A cache whose hash, layout or checks do not match is
+treated as stale and rebuilt.
+
+Author: Emily Guan
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import time
+import zlib
+import hashlib
+
+import numpy as np
+
+from utils.IO import read_mesh
+from utils.mesh import Mesh
+from utils.bvh import BVH, BVH_ARRAYS
+from utils.grid import UniformGrid, GRID_ARRAYS
+from utils.distance_field import DistanceField, FIELD_ARRAYS
+
+CACHE_VERSION = 2
+
+# arrays stored for a mesh, in Mesh.from_arrays order
+MESH_ARRAYS = ("vertices", "indices", "neighbors", "face_normals", "vertex_normals", "lb", "ub")
+
+
+"""
+SHA-256 of a file's bytes, read in blocks.
+"""
+def file_hash(filepath, block_size=1 << 20):
+    h = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            h.update(block)
+    return h.hexdigest()
+
+"""
+Default sidecar location for a source file.
+"""
+def cache_path(filepath):
+    return filepath + ".cache"
+
+"""
+Writes named arrays and their metadata into cache_dir, replacing any old
+cache. The arrays go into a new, uniquely named generation directory
+inside cache_dir, then meta.json, which names the generation, is swapped
+in with os.replace. Nothing is deleted until the new meta.json is in
+place, so concurrent readers and writers only ever see a complete cache;
+the replaced generation is removed afterwards (arrays a reader already
+memory-mapped stay readable).
+
+Input:
+    cache_dir: str
+    key: str
+        Hash the cache is valid for (e.g. source file hash).
+    arrays: dict of name -> numpy array
+    extra: optional dict stored alongside in meta.json
+"""
+def save_arrays(cache_dir, key, arrays, extra=None):
+    os.makedirs(cache_dir, exist_ok=True)
+    gen = tempfile.mkdtemp(prefix="gen-", dir=cache_dir)
+    meta_tmp = None
+    try:
+        meta = {"version": CACHE_VERSION, "key": key, "dir": os.path.basename(gen),
+                "arrays": {}, "extra": extra or {}}
+        for name, arr in arrays.items():
+            arr = np.ascontiguousarray(arr)
+            path = os.path.join(gen, name + ".npy")
+            np.save(path, arr)
+            stat = os.stat(path)
+            meta["arrays"][name] = {
+                "shape": list(arr.shape),
+                "dtype": arr.dtype.str,
+                "crc32": zlib.crc32(arr.tobytes()),
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+            }
+        fd, meta_tmp = tempfile.mkstemp(prefix=".meta-", suffix=".json", dir=cache_dir)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(meta, f)
+
+        old = _read_meta(cache_dir)
+        os.replace(meta_tmp, os.path.join(cache_dir, "meta.json"))
+    except BaseException:
+        shutil.rmtree(gen, ignore_errors=True)
+        if meta_tmp is not None and os.path.exists(meta_tmp):
+            os.remove(meta_tmp)
+        raise
+    if old is not None:
+        _remove_generation(cache_dir, old)
+    _sweep_generations(cache_dir, meta["dir"])
+
+"""
+Parsed meta.json of cache_dir, or None if it is missing or unreadable.
+"""
+def _read_meta(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, "meta.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+"""
+Best-effort removal of the arrays a replaced meta.json pointed to (a
+generation directory, or loose .npy files from the version 1 layout).
+"""
+def _remove_generation(cache_dir, meta):
+    if meta.get("dir"):
+        shutil.rmtree(os.path.join(cache_dir, meta["dir"]), ignore_errors=True)
+        return
+    for name in meta.get("arrays", {}):
+        try:
+            os.remove(os.path.join(cache_dir, name + ".npy"))
+        except OSError:
+            pass
+
+"""
+Removes generation directories left by writers that raced each other (each
+replaced the same old generation, so one of theirs is never referenced).
+Only ones older than grace seconds go, so a save still in progress is safe.
+"""
+def _sweep_generations(cache_dir, keep, grace=60.0):
+    now = time.time()
+    for entry in os.scandir(cache_dir):
+        try:
+            if (entry.name.startswith("gen-") and entry.name != keep and entry.is_dir()
+                    and now - entry.stat().st_mtime > grace):
+                shutil.rmtree(entry.path, ignore_errors=True)
+        except OSError:
+            pass
+
+"""
+Memory-maps the arrays in cache_dir.
+
+Each array file is checked against the size and modification time
+recorded when it was written, which costs one stat per file, and against
+its shape and dtype. With verify, the CRC32 of every byte is checked as
+well, which reads the whole cache (and so gives up most of the benefit of
+memory mapping). Any change made after the save, by another program or by
+copying the cache without keeping file times, fails the stamp check.
+
+Returns (arrays, extra) if the cache exists, matches key and every array
+passes its checks; otherwise None.
+"""
+def load_arrays(cache_dir, key, names, verify=False):
+    try:
+        meta = _read_meta(cache_dir)
+        if meta is None or meta.get("version") != CACHE_VERSION or meta.get("key") != key:
+            return None
+
+        arrays = {}
+        for name in names:
+            info = meta["arrays"][name]
+            path = os.path.join(cache_dir, meta["dir"], name + ".npy")
+            stat = os.stat(path)
+            if stat.st_size != info["size"] or stat.st_mtime_ns != info["mtime_ns"]:
+                return None
+            arr = np.load(path, mmap_mode='r')
+            if list(arr.shape) != info["shape"] or arr.dtype.str != info["dtype"]:
+                return None
+            if verify and zlib.crc32(arr) != info["crc32"]:
+                return None
+            arrays[name] = arr
+        return arrays, meta.get("extra", {})
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+"""
+Loads a .sur mesh, going through the binary cache.
+
+Input:
+    filepath: str
+        Path to the .sur file.
+    mode: str
+        Default search mode for the Mesh.
+    cache_dir: str, optional
+        Sidecar directory (default <filepath>.cache).
+    verify: bool
+        Also CRC-check every cached byte (see load_arrays).
+
+Returns:
+    mesh: Mesh
+    from_cache: bool
+        True if the cache was valid and used, False if it was (re)built.
+"""
+def load_mesh(filepath, mode="box", cache_dir=None, verify=False):
+    cache_dir = cache_dir or cache_path(filepath)
+    key = file_hash(filepath)
+
+    cached = load_arrays(cache_dir, key, MESH_ARRAYS, verify)
+    if cached is not None:
+        arrays, _ = cached
+        return Mesh.from_arrays(*(arrays[name] for name in MESH_ARRAYS), mode=mode), True
+
+    vertices, N_vertices, N_triangles, triangle_indices, neighbors = read_mesh(filepath)
+    mesh = Mesh(vertices, triangle_indices, mode=mode, neighbors=neighbors)
+    save_arrays(cache_dir, key, mesh_arrays(mesh))
+    return mesh, False
+
+"""
+The arrays that fully describe a Mesh, keyed by MESH_ARRAYS names.
+"""
+def mesh_arrays(mesh):
+    return {
+        "vertices": mesh.vertices,
+        "indices": mesh.indices,
+        "neighbors": mesh.neighbors,
+        "face_normals": mesh.batch.normal,
+        "vertex_normals": mesh.vertex_normals,
+        "lb": mesh.batch.lb,
+        "ub": mesh.batch.ub,
+    }
+
+"""
+Saves the mesh's BVH, grid or distance field (kind = "bvh", "grid" or
+"field") to index_dir, building it first if needed. The saved index is
+keyed by the mesh's content hash, so it is only reused with the same geometry.
+"""
+def save_index(index_dir, mesh, kind="bvh"):
+    if kind == "bvh":
+        index = mesh.bvh if mesh.bvh is not None else mesh.build_bvh()
+        extra = {"kind": kind, "leaf_size": index.leaf_size}
+    elif kind == "grid":
+        index = mesh.grid if mesh.grid is not None else mesh.build_grid()
+        extra = {"kind": kind, "cell_size": index.cell_size}
+    elif kind == "field":
+        index = mesh.field if mesh.field is not None else mesh.build_field()
+        extra = {"kind": kind, "cell_size": index.cell_size}
+    else:
+        raise ValueError(f"unknown index kind {kind!r}, expected 'bvh', 'grid' or 'field'")
+
+    save_arrays(index_dir, mesh.content_hash(), index.to_arrays(), extra)
+    return index
+
+"""
+Memory-maps a saved BVH, grid or distance field and attaches it to mesh.
+
+Returns the index, or None if index_dir is missing, corrupted, of another
+kind, or was built for different geometry (the mesh is left unchanged).
+verify as in load_arrays.
+"""
+def load_index(index_dir, mesh, kind="bvh", verify=False):
+    names = {"bvh": BVH_ARRAYS, "grid": GRID_ARRAYS, "field": FIELD_ARRAYS}[kind]
+    cached = load_arrays(index_dir, mesh.content_hash(), names, verify)
+    if cached is None:
+        return None
+    arrays, extra = cached
+    if extra.get("kind") != kind:
+        return None
+
+    if kind == "bvh":
+        mesh.bvh = BVH.from_arrays(arrays, extra["leaf_size"])
+        return mesh.bvh
+    if kind == "grid":
+        mesh.grid = UniformGrid.from_arrays(arrays, extra["cell_size"])
+        return mesh.grid
+    mesh.field = DistanceField.from_arrays(arrays, extra["cell_size"])
+    return mesh.field
@@ -0,0 +1,257 @@
+"""
+Instrumentation for the registration loop.
+
+QueryCounter tallies closest-point queries and how many triangles the
+closest-point kernel actually evaluated; the rest were rejected by the
+search's pruning (bounding-box test, BVH or grid). RegistrationMetrics
+turns those counts, wall time, residual and pose change into one
+IterationRecord per compute_Freg iteration, hands each record to
+registered callbacks, and builds a RegistrationSummary at the end.
+
+Author: Emily Guan
+"""
+
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+
+# one compute_Freg iteration
+IterationRecord = namedtuple("IterationRecord", [
+    "iteration",          # 0-based iteration number
+    "seconds",            # wall time of the iteration
+    "queries",            # closest-point queries made
+    "tested",             # triangles evaluated by the closest-point kernel
+    "rejected",           # triangles skipped by the search's pruning
+    "eps",                # RMS residual of the linearized system
+    "rotation_delta",     # angle of this iteration's rotation update (radians)
+    "translation_delta",  # norm of this iteration's translation update
+    "R", "t",             # pose after the iteration
+    "accelerated",        # pose is an Anderson extrapolation (compute_Freg accelerate)
+    "reverted",           # the previous extrapolation fit worse and was replaced
+    "reused",             # queries answered from cached candidate lists (utils.reuse)
+], defaults=(False, False, 0))
+
+
+class QueryCounter:
+
+    """
+    Thread-safe tallies; a mesh and its TriangleBatch add to the same counter.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.queries = 0
+        self.candidates = 0
+        self.tested = 0
+        self.reused = 0
+
+    """
+    n queries, each against a mesh of n_triangles faces.
+    """
+    def add_queries(self, n, n_triangles):
+        with self._lock:
+            self.queries += int(n)
+            self.candidates += int(n) * int(n_triangles)
+
+    """
+    n triangles evaluated by the closest-point kernel.
+    """
+    def add_tested(self, n):
+        with self._lock:
+            self.tested += int(n)
+
+    """
+    n of the queries answered from a ClosestPointCache list (utils.reuse).
+    """
+    def add_reused(self, n):
+        with self._lock:
+            self.reused += int(n)
+
+    """
+    (queries, tested, rejected) so far.
+    """
+    def snapshot(self):
+        with self._lock:
+            return self.queries, self.tested, max(self.candidates - self.tested, 0)
+
+
+class RegistrationSummary:
+
+    """
+    Input:
+        records: IterationRecords of the run.
+        converged: eps fell below the threshold.
+        seconds: wall time of the run.
+        timed_out: the run stopped at its time budget (compute_Freg time_budget).
+        rms: RMS closest-point distance at the returned pose, when it was
+            measured (a timed-out run returns a measured pose); NaN otherwise.
+    """
+    def __init__(self, records, converged, seconds, timed_out=False, rms=float("nan")):
+        self.records = list(records)
+        self.converged = bool(converged)
+        self.seconds = float(seconds)
+        self.timed_out = bool(timed_out)
+        self.rms = float(rms)
+
+    @property
+    def iterations(self):
+        return len(self.records)
+
+    @property
+    def final_eps(self):
+        return self.records[-1].eps if self.records else float("nan")
+
+    @property
+    def queries(self):
+        return sum(r.queries for r in self.records)
+
+    @property
+    def tested(self):
+        return sum(r.tested for r in self.records)
+
+    @property
+    def rejected(self):
+        return sum(r.rejected for r in self.records)
+
+    @property
+    def accelerated(self):
+        return sum(bool(r.accelerated) for r in self.records)
+
+    @property
+    def reverted(self):
+        return sum(bool(r.reverted) for r in self.records)
+
+    @property
+    def reused(self):
+        return sum(r.reused for r in self.records)
+
+    """
+    Fraction of candidate triangles the search never evaluated.
+    """
+    @property
+    def rejection_rate(self):
+        total = self.tested + self.rejected
+        return self.rejected / total if total else 0.0
+
+    """
+    Plain dict (no poses) suitable for json.dump.
+    """
+    def as_dict(self):
+        return {
+            "iterations": self.iterations,
+            "converged": self.converged,
+            "timed_out": self.timed_out,
+            "rms": self.rms,
+            "seconds": self.seconds,
+            "final_eps": self.final_eps,
+            "queries": self.queries,
+            "tested": self.tested,
+            "rejected": self.rejected,
+            "rejection_rate": self.rejection_rate,
+            "accelerated": self.accelerated,
+            "reverted": self.reverted,
+            "reused": self.reused,
+            "records": [{k: v for k, v in r._asdict().items() if k not in ("R", "t")}
+                        for r in self.records],
+        }
+
+    def __str__(self):
+        state = "converged" if self.converged else "not converged"
+        text = (f"{self.iterations} iterations ({state}), eps {self.final_eps:.3g}, "
+                f"{self.seconds:.3f}s, {self.queries} queries, "
+                f"{100 * self.rejection_rate:.1f}% triangles rejected")
+        if self.accelerated or self.reverted:
+            text += f", {self.accelerated} accelerated / {self.reverted} reverted steps"
+        if self.reused:
+            text += f", {self.reused} queries reused"
+        if self.timed_out:
+            text += f", stopped at the time budget (RMS distance {self.rms:.3g})"
+        return text
+
+
+class RegistrationMetrics:
+
+    """
+    Input:
+        callbacks: optional list of callables, each called with every IterationRecord.
+        verbose: bool
+            Print one line per iteration.
+    """
+    def __init__(self, callbacks=None, verbose=False):
+        self.callbacks = list(callbacks or [])
+        self.verbose = verbose
+        self.counter = QueryCounter()
+        self.records = []
+        self._mesh = None
+
+    def add_callback(self, fn):
+        self.callbacks.append(fn)
+
+    """
+    Starts timing and, if the mesh supports it, counting its queries.
+    """
+    def begin(self, mesh):
+        self.records = []
+        self._mesh = mesh
+        if hasattr(mesh, "attach_counter"):
+            mesh.attach_counter(self.counter)
+        self._start = self._mark = time.perf_counter()
+        self._counts = self.counter.snapshot()
+        self._reused = self.counter.reused
+
+    """
+    Closes out one iteration given its residual and pose update.
+    """
+    def record(self, it, eps, DeltaR, delta_t, R, t, accelerated=False, reverted=False):
+        now = time.perf_counter()
+        counts = self.counter.snapshot()
+        queries, tested, rejected = (c - p for c, p in zip(counts, self._counts))
+        reused = self.counter.reused - self._reused
+        cos_angle = np.clip((np.trace(DeltaR) - 1.0) / 2.0, -1.0, 1.0)
+
+        rec = IterationRecord(it, now - self._mark, queries, tested, rejected, float(eps),
+                              float(np.arccos(cos_angle)), float(np.linalg.norm(delta_t)),
+                              R.copy(), t.copy(), bool(accelerated), bool(reverted), reused)
+        self.records.append(rec)
+        self._mark, self._counts, self._reused = now, counts, self.counter.reused
+
+        if self.verbose:
+            print(f"iteration {it}: eps {rec.eps:.6g}, {rec.seconds:.4f}s, "
+                  f"{rec.tested} tested / {rec.rejected} rejected")
+        for fn in self.callbacks:
+            fn(rec)
+        return rec
+
+    """
+    Stops counting and returns the RegistrationSummary.
+    """
+    def end(self, converged, timed_out=False, rms=float("nan")):
+        if self._mesh is not None and hasattr(self._mesh, "attach_counter"):
+            self._mesh.attach_counter(None)
+        self._mesh = None
+        return RegistrationSummary(self.records, converged, time.perf_counter() - self._start, timed_out, rms)
+
+
+"""
+Latency summary for a list of per-frame times (seconds).
+
+Input:
+    seconds: per-frame latencies.
+    frame_period: optional deadline per frame (seconds); frames over it are counted.
+
+Output:
+    Dict with frames, mean, p50, p90, p99 and max (milliseconds), plus
+    over_period when frame_period is given.
+"""
+def latency_percentiles(seconds, frame_period=None):
+    ms = 1000.0 * np.asarray(seconds, float)
+    if ms.size == 0:
+        return {"frames": 0}
+    report = {"frames": int(ms.size), "mean": float(ms.mean())}
+    for q in (50, 90, 99):
+        report[f"p{q}"] = float(np.percentile(ms, q))
+    report["max"] = float(ms.max())
+    if frame_period is not None:
+        report["over_period"] = int(np.sum(ms > 1000.0 * frame_period))
+    return report
@@ -0,0 +1,209 @@
+"""
+Framed binary protocol for the registration server (src/server.py).
+
+Every message is one frame:
+
+    uint32 frame length | uint32 header length | JSON header | array bytes
+
+all integers big-endian. The header is a JSON object; its "arrays" entry
+lists (name, dtype, shape) for the raw C-order arrays packed after it, so
+point sets travel as bytes rather than text. Requests carry an "op" (and
+an "id" echoed back in the reply); replies carry "ok" and either results
+or an "error" string.
+
+RegistrationClient is a small blocking client for scripts and tests.
+
+Author: Emily Guan
+"""
+
+import asyncio
+import json
+import socket
+import struct
+
+import numpy as np
+
+# refuse frames larger than this (bytes) instead of allocating for them
+MAX_FRAME = 1 << 30
+
+_LENGTH = struct.Struct(">I")
+
+
+"""
+JSON fallback for NumPy scalars and arrays in headers.
+"""
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"cannot encode {type(value).__name__} in a message header")
+
+"""
+Encodes one message.
+
+Input:
+    header: dict (JSON-serializable).
+    arrays: optional dict name -> array, sent as raw bytes.
+
+Output:
+    bytes of the whole frame, length prefix included.
+"""
+def encode_message(header, arrays=None):
+    arrays = {name: np.ascontiguousarray(a) for name, a in (arrays or {}).items()}
+    header = dict(header, arrays=[(name, a.dtype.str, a.shape) for name, a in arrays.items()])
+    head = json.dumps(header, default=_json_default).encode()
+
+    body = [_LENGTH.pack(len(head)), head] + [a.tobytes() for a in arrays.values()]
+    size = sum(len(b) for b in body)
+    if size > MAX_FRAME:
+        raise ValueError(f"message of {size} bytes exceeds the {MAX_FRAME} byte frame limit")
+    return _LENGTH.pack(size) + b"".join(body)
+
+"""
+Decodes a frame payload (everything after the length prefix).
+
+Output:
+    (header dict, dict name -> array)
+"""
+def decode_payload(payload):
+    if len(payload) < _LENGTH.size:
+        raise ValueError("truncated message: no header length")
+    (n,) = _LENGTH.unpack_from(payload)
+    end = _LENGTH.size + n
+    if end > len(payload):
+        raise ValueError("truncated message: header runs past the frame")
+    try:
+        header = json.loads(payload[_LENGTH.size:end].decode())
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise ValueError(f"malformed message header: {e}") from None
+    if not isinstance(header, dict):
+        raise ValueError("message header must be a JSON object")
+
+    arrays = {}
+    for name, dtype, shape in header.pop("arrays", []):
+        dtype = np.dtype(dtype)
+        count = int(np.prod(shape, dtype=np.int64))
+        size = count * dtype.itemsize
+        if end + size > len(payload):
+            raise ValueError(f"truncated message: array {name!r} runs past the frame")
+        arrays[name] = np.frombuffer(payload, dtype, count, end).reshape(shape)
+        end += size
+    if end != len(payload):
+        raise ValueError(f"{len(payload) - end} unexpected bytes after the last array")
+    return header, arrays
+
+"""
+Checks a frame length prefix.
+"""
+def _frame_size(prefix):
+    (size,) = _LENGTH.unpack(prefix)
+    if size > MAX_FRAME:
+        raise ValueError(f"frame of {size} bytes exceeds the {MAX_FRAME} byte limit")
+    return size
+
+"""
+Reads one message from an asyncio StreamReader.
+
+Output:
+    (header, arrays), or None if the peer closed the connection between messages.
+"""
+async def read_message(reader):
+    try:
+        prefix = await reader.readexactly(_LENGTH.size)
+    except asyncio.IncompleteReadError as e:
+        if not e.partial:
+            return None
+        raise ValueError("connection closed inside a frame length") from None
+    payload = await reader.readexactly(_frame_size(prefix))
+    return decode_payload(payload)
+
+"""
+Writes one message to an asyncio StreamWriter and drains it.
+"""
+async def write_message(writer, header, arrays=None):
+    writer.write(encode_message(header, arrays))
+    await writer.drain()
+
+"""
+Reads exactly n bytes from a blocking socket.
+"""
+def _recv_exactly(sock, n):
+    chunks = []
+    while n:
+        chunk = sock.recv(min(n, 1 << 20))
+        if not chunk:
+            raise ConnectionError("connection closed mid-message")
+        chunks.append(chunk)
+        n -= len(chunk)
+    return b"".join(chunks)
+
+"""
+Blocking counterparts of write_message / read_message.
+"""
+def send_message(sock, header, arrays=None):
+    sock.sendall(encode_message(header, arrays))
+
+def recv_message(sock):
+    return decode_payload(_recv_exactly(sock, _frame_size(_recv_exactly(sock, _LENGTH.size))))
+
+
+class RegistrationClient:
+
+    """
+    Input:
+        address: Unix socket path (str) or (host, port) tuple.
+        timeout: optional socket timeout in seconds.
+    """
+    def __init__(self, address, timeout=None):
+        family = socket.AF_UNIX if isinstance(address, str) else socket.AF_INET
+        self.sock = socket.socket(family, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        self.sock.connect(address)
+        self._next_id = 0
+
+    def close(self):
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    """
+    Sends one request and waits for its reply; a server-side error is
+    raised as RuntimeError.
+    """
+    def request(self, op, arrays=None, **params):
+        self._next_id += 1
+        send_message(self.sock, dict(params, op=op, id=self._next_id), arrays)
+        header, out = recv_message(self.sock)
+        if not header.get("ok"):
+            raise RuntimeError(header.get("error", "request failed"))
+        return header, out
+
+    """
+    Names and sizes of the meshes the server holds.
+    """
+    def meshes(self):
+        return self.request("meshes")[0]["meshes"]
+
+    """
+    Closest points on a server mesh: returns (c, normals, triangle indices).
+    """
+    def closest(self, mesh, points, mode=None):
+        _, out = self.request("closest", {"points": np.asarray(points, float)}, mesh=mesh, mode=mode)
+        return out["c"], out["normals"], out["idx"]
+
+    """
+    Full registration of samples d against a server mesh. Keyword options
+    (threshold, max_iter, levels, accelerate, reuse, time_budget) go to
+    compute_Freg_multires in a worker.
+
+    Output:
+        R, t, s, c, summary dict (RegistrationSummary.as_dict)
+    """
+    def register(self, mesh, d, **options):
+        header, out = self.request("register", {"d": np.asarray(d, float)}, mesh=mesh, **options)
+        return out["R"], out["t"], out["s"], out["c"], header["summary"]
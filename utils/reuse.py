@@ -0,0 +1,133 @@
+"""
+Motion-bounded reuse of closest-point work between ICP iterations.
+
+Each point keeps an anchor a (where it last had a full query), its
+distance d_a to the mesh there, and a candidate list: every triangle whose
+box lies within d_a + 2 * budget of a. While the point stays within budget
+of its anchor (m = |p - a| <= budget), its true nearest triangle T* is in
+the list:
+
+    d(a, T*) <= d(p, T*) + m <= d(p, T_a) + m <= d_a + 2m <= d_a + 2 * budget,
+
+so checking the list gives the exact answer. All such points are answered
+in one pairwise kernel call; only points that moved farther than budget go
+through Mesh.find_closest_point and are re-anchored. Near convergence,
+when the pose barely changes, almost every point is reused.
+
+Author: Emily Guan
+"""
+
+import numpy as np
+
+
+class ClosestPointCache:
+
+    """
+    Input:
+        mesh: Mesh to query (its BVH is used to gather candidates).
+        budget: float, optional
+            How far a point may move from its anchor and still be answered
+            from its list (default: half the mean edge length). Larger
+            budgets reuse more often but make every list longer.
+    """
+    def __init__(self, mesh, budget=None):
+        self.mesh = mesh
+        self.budget = 0.5 * mesh.average_edge_length() if budget is None else float(budget)
+        self.anchors = None
+
+    """
+    Drops every anchor (e.g. when the mesh itself moved).
+    """
+    def reset(self):
+        self.anchors = None
+
+    """
+    Forgets the first n points, e.g. when a sliding window of samples
+    advances; later points keep their anchors (shifted down by n).
+    """
+    def drop_first(self, n):
+        if self.anchors is not None:
+            self.anchors = self.anchors[n:]
+            self.lists = self.lists[n:]
+
+    """
+    Full queries for points[rows] and new anchors / candidate lists for them.
+    """
+    def _anchor(self, points, rows, hints, mode, out):
+        mesh = self.mesh
+        c, normals, idx = mesh.find_closest_point(points[rows], return_normals=True, mode=mode,
+                                                  hints=None if hints is None else hints[rows],
+                                                  return_indices=True)
+        out[0][rows], out[1][rows], out[2][rows] = c, normals, idx
+
+        mesh.ensure_index("bvh")
+        bvh, batch = mesh.bvh, mesh.batch
+        radius = np.linalg.norm(c - points[rows], axis=1) + 2.0 * self.budget
+        lists = []
+        for p, r in zip(points[rows], radius):
+            # slack so a box exactly at the radius is not lost to rounding
+            r = r * (1 + batch.slack) + 1e-12
+            tris = np.sort(bvh.leaf_triangles(bvh.leaves_within(p, r)))
+            gap = np.maximum(np.maximum(batch.lb[tris] - p, p - batch.ub[tris]), 0.0)
+            lists.append(tris[np.einsum('ij,ij->i', gap, gap) <= r * r])
+
+        self.anchors[rows] = points[rows]
+        for row, tris in zip(rows, lists):
+            self.lists[row] = tris
+
+    """
+    Exact answers for points[rows] from their candidate lists, in one
+    pairwise kernel call; ties keep the lowest triangle index.
+    """
+    def _reuse(self, points, rows, out):
+        mesh = self.mesh
+        lists = self.lists[rows]
+        counts = np.array([len(l) for l in lists])
+        tris = np.concatenate(lists)
+        owner = np.repeat(np.arange(rows.size), counts)
+
+        cps, barys, dists = mesh.batch.closest_points(points[rows][owner], tris)
+        best = np.minimum.reduceat(dists, np.cumsum(counts) - counts)
+        # first hit per point is the lowest index (lists are sorted)
+        hits = np.flatnonzero(dists == best[owner])
+        _, first = np.unique(owner[hits], return_index=True)
+        pick = hits[first]
+
+        out[0][rows] = cps[pick]
+        out[2][rows] = tris[pick]
+        out[1][rows] = mesh.interpolated_normals(tris[pick], barys[pick])
+
+    """
+    Same results as mesh.find_closest_point(points, return_normals=True,
+    mode=mode, hints=hints, return_indices=True).
+
+    Rows keep their anchors between calls; rows beyond the previous call's
+    count (points appended to a window) start unanchored.
+
+    Output:
+        closest points (N,3), normals (N,3), triangle indices (N,)
+    """
+    def query(self, points, hints=None, mode=None):
+        points = np.asarray(points, float)
+        N = points.shape[0]
+        out = (np.zeros_like(points), np.zeros_like(points), np.full(N, -1, int))
+
+        if self.anchors is None or self.anchors.shape[0] > N:
+            self.anchors = np.zeros((0, 3))
+            self.lists = np.empty(0, dtype=object)
+        if self.anchors.shape[0] < N:
+            extra = N - self.anchors.shape[0]
+            self.anchors = np.concatenate((self.anchors, np.full((extra, 3), np.nan)))
+            self.lists = np.concatenate((self.lists, np.empty(extra, dtype=object)))
+        # unanchored rows are NaN and never within budget
+        moved = ~(np.linalg.norm(points - self.anchors, axis=1) <= self.budget)
+
+        near = np.flatnonzero(~moved)
+        if near.size:
+            if self.mesh.counter is not None:
+                self.mesh.counter.add_queries(near.size, len(self.mesh))
+                self.mesh.counter.add_reused(near.size)
+            self._reuse(points, near, out)
+        if np.any(moved):
+            self._anchor(points, np.flatnonzero(moved), hints, mode, out)
+        return out
@@ -0,0 +1,100 @@
+"""
+Places a Mesh (and any spatial indexes it has built) in shared memory so worker
+processes can rebuild it as zero-copy views instead of reparsing or
+receiving a pickled copy.
+
+A "spec" is a small picklable dict naming the shared-memory blocks and their
+shapes / dtypes; it is what gets sent to workers.
+
+Author: Emily Guan
+"""
+
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from utils.mesh import Mesh
+from utils.mesh_cache import MESH_ARRAYS, mesh_arrays
+from utils.bvh import BVH
+from utils.grid import UniformGrid
+from utils.distance_field import DistanceField
+
+
+"""
+Copies each array into its own shared-memory block.
+
+Returns:
+    handles: list of SharedMemory objects (keep alive; release when done)
+    spec: dict of name -> (block name, shape, dtype string)
+"""
+def share_arrays(arrays):
+    handles, spec = [], {}
+    for name, arr in arrays.items():
+        arr = np.ascontiguousarray(arr)
+        shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+        np.ndarray(arr.shape, arr.dtype, buffer=shm.buf)[...] = arr
+        handles.append(shm)
+        spec[name] = (shm.name, arr.shape, arr.dtype.str)
+    return handles, spec
+
+"""
+Attaches to blocks described by a spec from share_arrays.
+
+Returns:
+    handles: list of SharedMemory objects (keep alive while arrays are used)
+    arrays: dict of name -> read-only numpy view into shared memory (other
+        processes read the same blocks, so nothing may write through them)
+"""
+def attach_arrays(spec):
+    handles, arrays = [], {}
+    for name, (block, shape, dtype) in spec.items():
+        shm = shared_memory.SharedMemory(name=block)
+        handles.append(shm)
+        arrays[name] = np.ndarray(shape, np.dtype(dtype), buffer=shm.buf)
+        arrays[name].flags.writeable = False
+    return handles, arrays
+
+"""
+Closes handles, and unlinks the blocks if this process created them.
+"""
+def release(handles, unlink=False):
+    for shm in handles:
+        shm.close()
+        if unlink:
+            shm.unlink()
+
+"""
+Shares a mesh's arrays and every spatial index it has built.
+
+Returns (handles, spec).
+"""
+def share_mesh(mesh):
+    handles, spec = share_arrays(mesh_arrays(mesh))
+    out = {"mesh": spec, "mode": mesh.mode, "indexes": []}
+
+    for kind, index in (("bvh", mesh.bvh), ("grid", mesh.grid), ("field", mesh.field)):
+        if index is None:
+            continue
+        h, s = share_arrays(index.to_arrays())
+        handles += h
+        param = index.leaf_size if kind == "bvh" else index.cell_size
+        out["indexes"].append((kind, s, param))
+    return handles, out
+
+"""
+Rebuilds a Mesh from a share_mesh spec. Vertex, face and index arrays are
+views into shared memory; only the per-face edge arrays used by the
+closest-point kernel are recomputed locally.
+
+Returns (handles, mesh).
+"""
+def attach_mesh(spec):
+    handles, arrays = attach_arrays(spec["mesh"])
+    mesh = Mesh.from_arrays(*(arrays[name] for name in MESH_ARRAYS), mode=spec["mode"])
+
+    index_types = {"bvh": BVH, "grid": UniformGrid, "field": DistanceField}
+    for kind, index_spec, param in spec["indexes"]:
+        h, index_arrays = attach_arrays(index_spec)
+        handles += h
+        setattr(mesh, kind, index_types[kind].from_arrays(index_arrays, param))
+    return handles, mesh
@@ -0,0 +1,88 @@
+"""
+Online registration for a stream of tracked tip positions.
+
+Each new d_k joins a sliding window of recent samples; the pose is
+refined with a few compute_Freg iterations over the window, warm-started
+from the previous frame's R, t. A ClosestPointCache lives across frames,
+so only the new sample (and any that the pose change moved far) costs a
+full closest-point search; the rest of the window is answered from
+candidate lists in one batched call. Per-frame work therefore stays
+bounded by max_iter and the window size, not by stream length.
+
+Author: Emily Guan
+"""
+
+from collections import deque
+
+import numpy as np
+
+from utils.reuse import ClosestPointCache
+from utils.transform_register import compute_Freg, apply
+
+
+class StreamingRegistration:
+
+    """
+    Input:
+        mesh: Mesh to register against.
+        window: int
+            Number of most recent samples the pose is fit to.
+        max_iter: int
+            compute_Freg iterations per frame (bounds per-frame latency).
+        threshold: float
+            compute_Freg eps threshold; a frame stops early below it.
+        min_points: int
+            Samples needed before the pose is refined (identity until then).
+        budget: float, optional
+            ClosestPointCache motion budget.
+        R0, t0: optional initial pose.
+        time_budget: float, optional
+            Seconds per frame for refining the pose (compute_Freg
+            time_budget). Refinements run without it until one has
+            measured an iteration (none does with max_iter=0); after that
+            the latest iteration time seeds each frame's cost estimate, and
+            a frame that could not afford any iteration halves the estimate
+            so a stale one cannot stall tracking for good.
+    """
+    def __init__(self, mesh, window=64, max_iter=5, threshold=1e-3, min_points=6, budget=None,
+                 R0=None, t0=None, time_budget=None):
+        self.mesh = mesh
+        self.window = max(int(window), 1)
+        self.max_iter = int(max_iter)
+        self.threshold = float(threshold)
+        self.min_points = int(min_points)
+        self.time_budget = time_budget
+        self.cache = ClosestPointCache(mesh, budget)
+
+        self.R = np.eye(3) if R0 is None else np.array(R0, float)
+        self.t = np.zeros(3) if t0 is None else np.array(t0, float)
+        self.samples = deque()
+        self.frames = 0
+        self.summary = None
+        self.iteration_cost = None  # latest iteration time, seeds the next frame's estimate
+
+    """
+    Adds one sample d_k, refines the pose and returns (s_k, c_k).
+    """
+    def update(self, d_k):
+        self.samples.append(np.asarray(d_k, float))
+        if len(self.samples) > self.window:
+            self.samples.popleft()
+            self.cache.drop_first(1)
+        self.frames += 1
+
+        if len(self.samples) >= self.min_points:
+            budget = self.time_budget if self.iteration_cost is not None else None
+            self.R, self.t, self.summary = compute_Freg(self.mesh, np.array(self.samples), self.threshold,
+                                                        self.max_iter, return_summary=True,
+                                                        R0=self.R, t0=self.t, cache=self.cache,
+                                                        time_budget=budget,
+                                                        iteration_cost=self.iteration_cost)
+            if self.summary.records:
+                self.iteration_cost = self.summary.records[-1].seconds
+            elif self.iteration_cost is not None:
+                self.iteration_cost *= 0.5
+
+        s_k = apply(self.samples[-1], self.R, self.t)
+        c_k = self.mesh.find_closest_point(s_k[None])[0]
+        return s_k, c_k
@@ -3,8 +3,15 @@ Transformation and registration utilities.
 Author: Emily Guan (corrected & completed)
 """
 
+import time
+from collections import deque
+
 import numpy as np
 
+from utils.anderson import AndersonAccelerator
+from utils.metrics import RegistrationMetrics, RegistrationSummary
+from utils.reuse import ClosestPointCache
+
 """
 Compute the rigid transformation (R, p) that aligns point set A to B
 such that:  b_i ≈ R * a_i + p
@@ -31,25 +38,69 @@ def aruns_method(A, B):
     t = centroid_B - R @ centroid_A
     return R, t
 
+"""
+Batched Arun's method over K frames at once.
+
+A: (N,3) or (K,N,3) source marker sets; B: (K,N,3) measured marker sets.
+Returns R (K,3,3) and t (K,3) with B[k] ≈ A[k] @ R[k].T + t[k].
+"""
+def aruns_method_batch(A, B):
+    A = np.asarray(A, float)
+    B = np.asarray(B, float)
+    if A.ndim == 2:
+        A = np.broadcast_to(A, B.shape)
+
+    centroid_A = A.mean(axis=1)
+    centroid_B = B.mean(axis=1)
+
+    A_centered = A - centroid_A[:, None, :]
+    B_centered = B - centroid_B[:, None, :]
+
+    H = np.einsum('kni,knj->kij', A_centered, B_centered)
+    U, S, Vt = np.linalg.svd(H)
+
+    V = np.swapaxes(Vt, 1, 2)
+    Ut = np.swapaxes(U, 1, 2)
+    R = V @ Ut
+
+    # Fix improper rotations
+    bad = np.linalg.det(R) < 0
+    if np.any(bad):
+        V[bad, :, -1] *= -1
+        R[bad] = V[bad] @ Ut[bad]
+
+    t = centroid_B - np.einsum('kij,kj->ki', R, centroid_A)
+    return R, t
+
 def compute_d(A_body_markers,
               B_body_markers,
               A_tip,
               A_samps,
               B_samps):
 
-    N_samps = A_samps.shape[0]
-    d = np.empty((N_samps, 3), float)
-
-    for k in range(N_samps):
-        Ra, ta = aruns_method(A_body_markers, A_samps[k])
-        Rb, tb = aruns_method(B_body_markers, B_samps[k])
+    Ra, ta = aruns_method_batch(A_body_markers, A_samps)
+    Rb, tb = aruns_method_batch(B_body_markers, B_samps)
 
-        tip_tracker = Ra @ A_tip + ta
-        d[k] = Rb.T @ (tip_tracker - tb)
+    # d_k = Rb^T (Ra tip + ta - tb)
+    tip_tracker = np.einsum('kij,j->ki', Ra, np.asarray(A_tip, float)) + ta
+    d = np.einsum('kji,kj->ki', Rb, tip_tracker - tb)
 
     return d
 
 
+"""
+Streaming compute_d: consumes (A_block, B_block) chunks, e.g. from
+utils.IO.iter_sample, and yields the matching (k,3) blocks of d.
+"""
+def compute_d_stream(A_body_markers,
+                     B_body_markers,
+                     A_tip,
+                     frames):
+
+    for A_block, B_block in frames:
+        yield compute_d(A_body_markers, B_body_markers, A_tip, A_block, B_block)
+
+
 """
 Given a vector, R, t, applies a rigid transform.
 """
@@ -66,6 +117,80 @@ def skew(p):
         [-p[1],  p[0],  0]
     ])
 
+"""
+Stacked skew-symmetric matrices for an (N,3) array of vectors → (N,3,3).
+"""
+def skew_batch(P):
+    P = np.asarray(P, float)
+    S = np.zeros(P.shape[:-1] + (3, 3))
+    S[..., 0, 1] = -P[..., 2]
+    S[..., 0, 2] = P[..., 1]
+    S[..., 1, 0] = P[..., 2]
+    S[..., 1, 2] = -P[..., 0]
+    S[..., 2, 0] = -P[..., 1]
+    S[..., 2, 1] = P[..., 0]
+    return S
+
+"""
+Rotation vector (axis * angle) of a rotation matrix.
+"""
+def rotation_vector(R):
+    w = np.array([R[2, 1] - R[1, 2], R[0, 2] - R[2, 0], R[1, 0] - R[0, 1]])
+    angle = np.arccos(np.clip((np.trace(R) - 1.0) / 2.0, -1.0, 1.0))
+    if angle < 1e-6:
+        return 0.5 * w
+    if np.pi - angle < 1e-6:
+        # sin(angle) ~ 0: the axis is the dominant column of R + I
+        B = R + np.eye(3)
+        axis = B[:, np.argmax(np.linalg.norm(B, axis=0))]
+        return angle * axis / np.linalg.norm(axis)
+    return angle / (2.0 * np.sin(angle)) * w
+
+"""
+Rotation matrix from a rotation vector (Rodrigues' formula).
+"""
+def rotation_from_vector(w):
+    angle = np.linalg.norm(w)
+    if angle < 1e-12:
+        return np.eye(3) + skew(w)
+    K = skew(np.asarray(w, float) / angle)
+    return np.eye(3) + np.sin(angle) * K + (1.0 - np.cos(angle)) * K @ K
+
+"""
+Builds the linearized system for all points at once.
+
+Per point: A_i = [2 V_i P_i, V_i], b_i = V_i (c_i - p_i), with P_i, V_i the
+skew matrices of p_i and the unit normal v_i.
+
+Returns A (N,3,6), b (N,3).
+"""
+def linearized_system(p, c, normals):
+    nrm = np.linalg.norm(normals, axis=1, keepdims=True)
+    v = np.divide(normals, nrm, out=np.array(normals, float), where=nrm > 0)
+
+    P = skew_batch(p)
+    V = skew_batch(v)
+
+    A = np.concatenate((2.0 * V @ P, V), axis=2)
+    b = np.einsum('nij,nj->ni', V, c - p)
+    return A, b
+
+"""
+Least-squares solve of the stacked system through its 6x6 normal equations.
+Falls back to a full lstsq on the (3N,6) system when the normal matrix is
+rank-deficient or badly conditioned, which also gives the minimum-norm
+solution in degenerate cases.
+"""
+def solve_normal_equations(A, b, max_cond=1e10):
+    M = np.einsum('nki,nkj->ij', A, A)
+    g = np.einsum('nki,nk->i', A, b)
+
+    if np.linalg.cond(M) < max_cond:
+        return np.linalg.solve(M, g)
+
+    x, *_ = np.linalg.lstsq(A.reshape(-1, 6), b.reshape(-1), rcond=None)
+    return x
+
 """
 Constrained linearized least-squares registration (Gueziec et al. 1998).
 
@@ -73,8 +198,12 @@ Estimate F_reg such that c_k ≈ F_reg * d_k, where d_k are sample
 points expressed in frame B (shape N x 3).
 
 mesh must implement:
-    mesh.find_closest_point(points, use_linear=False, return_normals=True)
-        → (closest_points (N x 3), normals (N x 3))
+    mesh.find_closest_point(points, use_linear=False, return_normals=True,
+                            hints=None, return_indices=True)
+        → (closest_points (N x 3), normals (N x 3), triangle_indices (N,))
+
+The triangle found for each point is passed back as its hint on the next
+iteration, so a "walk" search only has to look near last iteration's answer.
 
 Parameters
 ----------
@@ -89,56 +218,175 @@ rho : float
     Upper bound on ||u_tilde|| (small rotation update, in radians).
 use_linear : bool
     If True, use linear closest-point search instead of box search.
+callbacks : list of callables, optional
+    Each is called with a utils.metrics.IterationRecord after every
+    iteration (wall time, queries, triangles tested / rejected, eps,
+    rotation / translation update, pose).
+verbose : bool
+    Print one line per iteration (off by default).
+return_summary : bool
+    Also return a utils.metrics.RegistrationSummary.
+R0, t0 : optional initial pose (default identity), e.g. the previous
+    solution when the data has changed only a little.
+step_tol : float
+    Also stop once no sample point moves more than step_tol in an
+    iteration (default 0: off). Used to end a level of
+    compute_Freg_multires at its accuracy floor; does not count as
+    converged.
+accelerate : bool
+    Anderson-accelerate the pose updates (utils.anderson): each plain
+    step is mixed with the last `history` steps, extrapolating along the
+    slow convergence tail. Safeguard: if the RMS closest-point distance at
+    an extrapolated pose is worse than at the pose it came from, that
+    iteration falls back to the plain step (one extra closest-point pass)
+    and the history is refilled by plain steps before extrapolating again.
+    Acceleration reaches the residual floor set by the data much sooner;
+    where that floor is above threshold (most PA4 sets), plateau_tol ends
+    the run there instead of at max_iter.
+history : int
+    Anderson memory depth.
+plateau_tol : float
+    With accelerate, also stop once the lowest eps so far has not improved
+    by this fraction for 2 * (history + 1) iterations (the residual floor:
+    further iterations only trade reverted extrapolations). Does not count
+    as converged. 0 turns it off.
+reuse : bool
+    Answer points that moved less than reuse_budget since their last full
+    query from a cached candidate list (utils.reuse.ClosestPointCache);
+    exact, and near convergence almost every query is reused.
+reuse_budget : float, optional
+    Motion allowed before a full query (default: half the mean edge length).
+cache : ClosestPointCache, optional
+    Cache to use (and keep warm) across calls, e.g. for a stream of
+    registrations over a sliding window; implies reuse.
+time_budget : float, optional
+    Wall-clock budget in seconds from the call. An iteration is only
+    started if it is expected to finish in time: its cost is estimated as
+    the slowest of the last three iterations. Before the first one, it is
+    iteration_cost if given, else a timed closest-point query on up to
+    32 samples scaled up to all N, with a 1.5x margin (a full iteration also
+    interpolates normals and solves, and per-point cost varies). When the
+    budget stops the loop, the pose returned is the best one whose fit was
+    measured (lowest RMS closest-point distance), not the last, unchecked
+    update; the summary has timed_out set and that distance as rms. No
+    work is done after the deadline: if no iteration fit, the start pose
+    is returned with rms taken over the probe's samples (NaN when
+    iteration_cost skipped the probe).
+iteration_cost : float, optional
+    Expected seconds per iteration before any has run (e.g. from the
+    previous call); skips the probe query.
+keep_best : bool
+    Return the best pose whose fit was measured, as on a timeout, also
+    when the loop ends normally: the final pose is measured (one extra
+    closest-point pass) and replaced if an earlier one fit better. Used by
+    compute_Freg_multires, whose coarse levels can drift away from a good
+    start; rms is then reported too.
 
 Returns
 -------
 R : (3,3) array
 t : (3,)   array
+summary : RegistrationSummary, only if return_summary; its iterations,
+    queries and accelerated / reverted counts show what acceleration saved,
+    and converged / timed_out / final_eps / rms how a budgeted run ended.
 """
-def compute_Freg(mesh, d, threshold=1e-3, max_iter=100, use_linear=False):
+def compute_Freg(mesh, d, threshold=1e-3, max_iter=100, use_linear=False, callbacks=None,
+                 verbose=False, return_summary=False, R0=None, t0=None, step_tol=0.0,
+                 accelerate=False, history=5, reuse=False, reuse_budget=None, cache=None,
+                 time_budget=None, iteration_cost=None, keep_best=False, plateau_tol=1e-3):
 
+    deadline = None if time_budget is None else time.perf_counter() + time_budget
 
     # Initial guess
-    R = np.eye(3)
-    t = np.zeros(3)
+    R = np.eye(3) if R0 is None else np.array(R0, float)
+    t = np.zeros(3) if t0 is None else np.array(t0, float)
 
     N = d.shape[0]
+    hints = None
+
+    if cache is None and reuse:
+        cache = ClosestPointCache(mesh, reuse_budget)
+
+    # first-iteration cost: a timed query on evenly spaced samples (through
+    # a throwaway cache, so building candidate lists is included), after an
+    # untimed one-point query that builds any lazy index
+    probe_rms = float("nan")
+    if deadline is not None and not iteration_cost:
+        def probe_query(points):
+            if cache is not None:
+                return ClosestPointCache(mesh, cache.budget).query(points, mode="linear" if use_linear else None)[0]
+            return mesh.find_closest_point(points, use_linear=use_linear)
+
+        # in four interleaved slices, so a budget that clearly cannot fit
+        # an iteration is known after the first one
+        probe = apply(subsample(d, 32), R, t)
+        probe_query(probe[:1])
+        start, done, energy = time.perf_counter(), 0, 0.0
+        for k in range(4):
+            part = probe[k::4]
+            c = probe_query(part)
+            done += part.shape[0]
+            energy += np.sum(np.einsum('ij,ij->i', c - part, c - part))
+            now = time.perf_counter()
+            iteration_cost = 1.5 * (now - start) * N / done
+            if now + iteration_cost > deadline:
+                break
+        probe_rms = np.sqrt(energy / done)
+
+    metrics = RegistrationMetrics(callbacks, verbose)
+    metrics.begin(mesh)
+    converged = False
+
+    # deadline bookkeeping: recent iteration times (iteration_cost until one
+    # has run) and the best measured pose
+    costs = deque(maxlen=3)
+    best = None  # (energy, R, t)
+    timed_out = False
+
+    accel = AndersonAccelerator(history) if accelerate else None
+    best_eps, since_best = np.inf, 0  # plateau bookkeeping for accelerated runs
+    fallback = None  # (R, t, energy): plain step and energy behind an extrapolated pose
+
+    def closest(p, hints):
+        if cache is not None:
+            return cache.query(p, hints, mode="linear" if use_linear else None)
+        return mesh.find_closest_point(p,
+                                       use_linear=use_linear,
+                                       return_normals=True,
+                                       hints=hints,
+                                       return_indices=True)
 
     for it in range(max_iter):
-        print("iteration ", it)
+        if deadline is not None:
+            now = time.perf_counter()
+            expected = max(costs) if costs else iteration_cost
+            if now >= deadline or (expected and now + expected > deadline):
+                timed_out = True
+                break
+
         # p_i~ = R d_i + t
         p = apply(d, R, t)  # (N,3)
-
-        c, normals = mesh.find_closest_point(p,
-                                             return_normals=True)
+        c, normals, hints = closest(p, hints)
+        energy = np.mean(np.einsum('ij,ij->i', c - p, c - p))
+
+        # safeguard: an extrapolated pose that fits worse is replaced by the plain step
+        reverted = False
+        if accel is not None and fallback is not None and energy > fallback[2]:
+            R, t = fallback[0], fallback[1]
+            accel.reset(refill=True)
+            reverted = True
+            p = apply(d, R, t)
+            c, normals, hints = closest(p, hints)
+            energy = np.mean(np.einsum('ij,ij->i', c - p, c - p))
+        if best is None or energy < best[0]:
+            best = (energy, R, t)
 
         # Build linearized least squares A x ≈ b
         # x = [u_tilde (3,); delta_t (3,)]
-        A = np.zeros((3 * N, 6))
-        b = np.zeros(3 * N)
-
-        row = 0
-        for i in range(N):
-            pi = p[i]
-            ci = c[i]
-            vi = normals[i]
-
-            nrm = np.linalg.norm(vi)
-            if nrm > 0:
-                vi = vi / nrm
-
-            Pi = skew(pi)
-            Vi = skew(vi)
-
-            Ai = np.hstack((2.0 * Vi @ Pi, Vi))
-            bi = Vi @ (ci - pi)
-
-            A[row:row+3, :] = Ai
-            b[row:row+3] = bi
-            row += 3
+        A, b = linearized_system(p, c, normals)
 
         # Solve least squares
-        x, *_ = np.linalg.lstsq(A, b, rcond=None)
+        x = solve_normal_equations(A, b)
         u_tilde = x[0:3]
         delta_t = x[3:6]
 
@@ -148,25 +396,226 @@ def compute_Freg(mesh, d, threshold=1e-3, max_iter=100, use_linear=False):
         DeltaR = (I - U) @ np.linalg.inv(I + U)
 
         # Update
-        R = DeltaR @ R
-        t = DeltaR @ t + delta_t
+        R_step = DeltaR @ R
+        t_step = DeltaR @ t + delta_t
 
         # epsilon = average residual in LS system
-        x_full = np.concatenate([u_tilde, delta_t])
-        residual = A @ x_full - b
+        residual = np.einsum('nij,j->ni', A, x) - b
         eps = np.linalg.norm(residual) / np.sqrt(N)
-        print(eps)
-
-        if eps < threshold:
+        converged = eps < threshold
+        stalled = step_tol > 0 and np.max(np.linalg.norm(apply(p, DeltaR, delta_t) - p, axis=1)) < step_tol
+        if eps < (1.0 - plateau_tol) * best_eps:
+            best_eps, since_best = eps, 0
+        else:
+            since_best += 1
+        if accel is not None and plateau_tol > 0 and since_best > 2 * (history + 1):
+            stalled = True
+
+        accelerated = False
+        if accel is not None and not (converged or stalled):
+            pose, accelerated = accel.step(np.concatenate((rotation_vector(R), t)),
+                                           np.concatenate((rotation_vector(R_step), t_step)))
+        if accelerated:
+            fallback = (R_step, t_step, energy)
+            R, t = rotation_from_vector(pose[0:3]), pose[3:6]
+        else:
+            fallback = None
+            R, t = R_step, t_step
+
+        rec = metrics.record(it, eps, DeltaR, delta_t, R, t, accelerated, reverted)
+        costs.append(rec.seconds)
+        if converged or stalled:
             break
 
+    rms = float("nan")
+    if timed_out and best is None:
+        # nothing fit in time: the start pose, as far as the probe measured it
+        rms = probe_rms
+    elif timed_out:
+        R, t = best[1], best[2]
+        rms = np.sqrt(best[0])
+    elif keep_best:
+        p = apply(d, R, t)
+        c = closest(p, hints)[0]
+        energy = np.mean(np.einsum('ij,ij->i', c - p, c - p))
+        if best is not None and best[0] < energy:
+            energy, R, t = best
+        rms = np.sqrt(energy)
+    summary = metrics.end(converged, timed_out, rms)
+    if return_summary:
+        return R, t, summary
+    return R, t
+
+
+"""
+Evenly spaced subset of n rows (all of them if n >= N).
+"""
+def subsample(d, n):
+    N = d.shape[0]
+    if n >= N:
+        return d
+    return d[np.unique(np.linspace(0, N - 1, max(int(n), 1)).round().astype(int))]
+
+"""
+Coarse-to-fine compute_Freg.
+
+Level 0 registers a subsample of d against a heavily decimated mesh
+(Mesh.decimated, vertex clustering); each following level divides the
+cell size by factor and uses proportionally more samples, starting from
+the previous level's R, t. The last level is always a normal compute_Freg
+on every point and the full mesh, so the answer has full-resolution
+accuracy. The coarse surfaces smooth away local minima, so a poor initial
+pose is pulled into the right basin cheaply, and the warm-started final
+level is given fewer iterations (final_iter). From PA4-A starts rotated
+0.36 rad and shifted 7 mm, levels=4 ends closer than plain compute_Freg
+on 4 of 5 starts with about a quarter fewer full-mesh queries; neither
+converges within 100 iterations, as ICP's tail there is slow.
+
+A coarse surface can also pull a good pose away from the answer (its
+error is about its cell size), so each level returns the best pose it
+measured, and that pose is only carried forward if its RMS distance to
+the full mesh over all of d beats the pose the level started from (one
+full-resolution query per level). Levels whose decimated mesh has fewer
+than min_triangles triangles are skipped. With a start that is already
+close, every level is rejected and the result is plain compute_Freg,
+with the whole max_iter.
+
+Parameters
+----------
+mesh, d, threshold, max_iter, use_linear, callbacks, verbose, R0, t0,
+accelerate, history, reuse, time_budget :
+    As compute_Freg (threshold and max_iter apply to the final level;
+    time_budget covers all levels, and a level that runs out of time
+    ends the run with its pose).
+levels : int
+    Number of levels, including the final full-resolution one (1 is
+    plain compute_Freg).
+thresholds : sequence of float, optional
+    eps tolerance per coarse level (levels - 1 values, coarsest first).
+    Default: threshold times the level's cell scale.
+factor : float
+    Cell size ratio between consecutive levels; level k (of L) clusters
+    vertices on a grid of factor ** (L - 1 - k) mean edge lengths.
+min_points : int
+    Fewest sample points used by any level.
+min_triangles : int, optional
+    Coarse levels whose decimated mesh is smaller than this are skipped
+    (default: 1% of the mesh's triangles, at least 16).
+level_iter : int
+    Iteration cap for each coarse level.
+stall : float
+    A coarse level also ends once an iteration moves no sample by more
+    than stall times its cell size: eps stops falling at the decimated
+    mesh's surface error, well above the final threshold.
+final_iter : int, optional
+    Iteration cap for the final level once a coarse level was accepted
+    (default: three quarters of max_iter).
+
+Returns
+-------
+R, t, and with return_summary a RegistrationSummary over the iterations
+of every level (converged refers to the final level, timed_out / rms to
+the level that ran out of time).
+"""
+def compute_Freg_multires(mesh, d, threshold=1e-3, max_iter=100, levels=4, thresholds=None, factor=2.0,
+                          min_points=64, min_triangles=None, level_iter=40, use_linear=False, callbacks=None,
+                          verbose=False, return_summary=False, R0=None, t0=None, stall=0.001,
+                          accelerate=False, history=5, reuse=False, time_budget=None, final_iter=None):
+
+    levels = max(int(levels), 1)
+    if thresholds is None:
+        thresholds = []
+    thresholds = list(thresholds)
+    if len(thresholds) not in (0, levels - 1):
+        raise ValueError(f"expected {levels - 1} coarse-level thresholds, got {len(thresholds)}")
+
+    d = np.asarray(d, float)
+    edge = mesh.average_edge_length() if levels > 1 else 0.0
+    if min_triangles is None and levels > 1:
+        min_triangles = max(16, len(mesh) // 100)
+    R, t = R0, t0
+    summaries = []
+    deadline = None if time_budget is None else time.perf_counter() + time_budget
+
+    def remaining():
+        return None if deadline is None else deadline - time.perf_counter()
+
+    # RMS distance of the registered samples to the full mesh
+    def full_rms(R, t):
+        s = d if R is None else apply(d, R, t)
+        c = mesh.find_closest_point(s, use_linear=use_linear)
+        return np.sqrt(np.mean(np.einsum('ij,ij->i', c - s, c - s)))
+
+    current = None
+    warm = False
+    for k in range(levels - 1):
+        scale = factor ** (levels - 1 - k)
+        cell = scale * edge
+        coarse = mesh.decimated(cell)
+        if len(coarse) < min_triangles:
+            if verbose:
+                print(f"level {k}: skipped ({len(coarse)} triangles < {min_triangles})")
+            continue
+        tol = thresholds[k] if thresholds else threshold * scale
+        points = subsample(d, max(min_points, int(np.ceil(d.shape[0] / scale))))
+        if verbose:
+            print(f"level {k}: {len(coarse)} triangles, {points.shape[0]} points, threshold {tol:.3g}")
+
+        if current is None:
+            current = full_rms(R, t)
+        R_k, t_k, summary = compute_Freg(coarse, points, tol, level_iter, use_linear, callbacks,
+                                         verbose, True, R, t, step_tol=stall * cell,
+                                         accelerate=accelerate, history=history, reuse=reuse,
+                                         time_budget=remaining(), keep_best=True)
+        summaries.append(summary)
+
+        # carry the level's pose forward only if it fits the full mesh better
+        err = full_rms(R_k, t_k)
+        if err < current:
+            R, t, current, warm = R_k, t_k, err, True
+        elif verbose:
+            print(f"level {k}: kept the starting pose (full-resolution rms {current:.4g}, level pose {err:.4g})")
+        if summary.timed_out:
+            break
+    else:
+        if not warm:
+            final_iter = max_iter
+        elif final_iter is None:
+            final_iter = (3 * max_iter) // 4
+        if verbose and levels > 1:
+            print(f"level {levels - 1}: {len(mesh)} triangles, {d.shape[0]} points, threshold {threshold:.3g}, "
+                  f"at most {final_iter} iterations")
+        R, t, summary = compute_Freg(mesh, d, threshold, final_iter, use_linear, callbacks, verbose, True, R, t,
+                                     accelerate=accelerate, history=history, reuse=reuse,
+                                     time_budget=remaining())
+        summaries.append(summary)
+
+    if return_summary:
+        records = [r for s in summaries for r in s.records]
+        return R, t, RegistrationSummary(records, summary.converged, sum(s.seconds for s in summaries),
+                                         summary.timed_out, summary.rms)
     return R, t
 
 
-def compute_ck(mesh, d, threshold, max_iter, linear=False):
+"""
+Registers d to the mesh and returns (c, s): closest mesh points and the
+registered samples. With return_summary, returns (c, s, summary). levels
+and thresholds enable coarse-to-fine registration (compute_Freg_multires);
+accelerate and reuse turn on Anderson acceleration and motion-bounded
+query reuse, and time_budget bounds the wall time (compute_Freg).
+"""
+def compute_ck(mesh, d, threshold, max_iter, linear=False, callbacks=None, verbose=False,
+               return_summary=False, levels=1, thresholds=None, accelerate=False, reuse=False,
+               time_budget=None):
 
-    R, t = compute_Freg(mesh, d, threshold=threshold, max_iter=max_iter, use_linear=linear)
+    R, t, summary = compute_Freg_multires(mesh, d, threshold=threshold, max_iter=max_iter, levels=levels,
+                                          thresholds=thresholds, use_linear=linear, callbacks=callbacks,
+                                          verbose=verbose, return_summary=True, accelerate=accelerate,
+                                          reuse=reuse, time_budget=time_budget)
 
     s = apply(d, R, t)
 
-    return mesh.find_closest_point(s), s
+    c = mesh.find_closest_point(s, use_linear=linear)
+    if return_summary:
+        return c, s, summary
+    return c, s
@@ -0,0 +1,206 @@
+"""
+Struct-of-arrays storage for many triangles and batched closest-point kernel.
+
+Mirrors Triangle.closest_point exactly, but evaluates a query point against
+all triangles (or a candidate subset) in one NumPy pass.
+
+Author: Emily Guan
+"""
+
+import numpy as np
+
+
+"""
+Row-wise dot product of two (M x 3) arrays.
+"""
+def _dot(x, y):
+    return np.einsum('ij,ij->i', x, y)
+
+"""
+Storage / compute dtype for coordinates: float32 input stays float32
+(half the memory and bandwidth), anything else is float64.
+"""
+def coord_dtype(x):
+    return np.float32 if np.asarray(x).dtype == np.float32 else np.float64
+
+
+class TriangleBatch:
+
+    """
+    Input:
+        a, b, c: (T x 3) arrays
+            Vertex coordinates of each triangle. float32 corners keep every
+            per-face array and the kernel arithmetic in float32 (see
+            coord_dtype); otherwise everything is float64.
+        normal, lb, ub: optional (T x 3) arrays
+            Precomputed unit normals and bounds; computed when not given.
+    """
+    def __init__(self, a, b, c, normal=None, lb=None, ub=None):
+        self.set_corners(a, b, c, normal, lb, ub)
+
+        # optional utils.metrics.QueryCounter; counts kernel evaluations
+        self.counter = None
+
+    """
+    (Re)computes every per-face array from new corner positions, so a moving
+    mesh can keep one batch object. Takes the same arguments as the constructor.
+    """
+    def set_corners(self, a, b, c, normal=None, lb=None, ub=None):
+        dtype = coord_dtype(a)
+        self.a = np.ascontiguousarray(a, dtype=dtype)
+        self.b = np.ascontiguousarray(b, dtype=dtype)
+        self.c = np.ascontiguousarray(c, dtype=dtype)
+
+        # edge vectors
+        self.ab = self.b - self.a
+        self.bc = self.c - self.b
+        self.ca = self.a - self.c
+        self.ac = self.c - self.a
+
+        # unit normals
+        if normal is None:
+            normal = np.cross(self.ab, self.ac)
+            normal = normal / np.linalg.norm(normal, axis=1)[:, None]
+        self.normal = normal
+
+        # precomputed dot products (d00 = |ab|^2, d11 = |ac|^2)
+        self.d00 = _dot(self.ab, self.ab)
+        self.d01 = _dot(self.ab, self.ac)
+        self.d11 = _dot(self.ac, self.ac)
+        self.denom = self.d00 * self.d11 - self.d01 * self.d01
+        self.bc_len2 = _dot(self.bc, self.bc)
+
+        # bounding boxes
+        self.lb = np.minimum(np.minimum(self.a, self.b), self.c) if lb is None else lb
+        self.ub = np.maximum(np.maximum(self.a, self.b), self.c) if ub is None else ub
+
+    def __len__(self):
+        return self.a.shape[0]
+
+    @property
+    def dtype(self):
+        return self.a.dtype
+
+    """
+    Relative slack for comparing a kernel distance against a bound (box
+    pruning, candidate lists): 1e-9 in float64, a few float32 ulps in float32.
+    """
+    @property
+    def slack(self):
+        return max(1e-9, 16 * float(np.finfo(self.dtype).eps))
+
+    """
+    Checks which triangles' bounding boxes (expanded by margin) contain p.
+
+    Output:
+        mask: (T,) bool array
+    """
+    def in_box(self, p, margin):
+        return np.all(p >= self.lb - margin, axis=1) & np.all(p <= self.ub + margin, axis=1)
+
+    """
+    Closest point on segment a + t * ab for each row, with the same
+    clamping as Triangle.closest_point_on_edge.
+
+    Output:
+        c: (M x 3) closest points
+        t: (M,) segment parameter recomputed from c
+        d: (M,) distances to p
+    """
+    @staticmethod
+    def _edge(p, a, ab, len2):
+        t = _dot(p - a, ab) / len2
+        t = np.clip(t, 0, 1)
+        c = a + t[:, None] * ab
+        d = np.linalg.norm(p - c, axis=1)
+        t = _dot(c - a, ab) / len2
+        return c, t, d
+
+    """
+    Finds the closest point on every triangle (or on the subset idx) to p.
+
+    Input:
+        p: Query point (3,), or (M x 3) to pair row i of p with triangle idx[i].
+        idx: optional int array of triangle indices to evaluate.
+
+    Output:
+        closest: (M x 3) closest points
+        bary: (M x 3) barycentric coordinates (u, v, w) of each closest point
+        dist: (M,) distances from p
+    """
+    def closest_points(self, p, idx=None):
+        p = np.asarray(p, self.dtype)
+        if self.counter is not None:
+            self.counter.add_tested(len(self) if idx is None else len(idx))
+
+        if idx is None:
+            a, b, c = self.a, self.b, self.c
+            ab, bc, ca, ac = self.ab, self.bc, self.ca, self.ac
+            normal = self.normal
+            d00, d01, d11, denom = self.d00, self.d01, self.d11, self.denom
+            bc_len2 = self.bc_len2
+        else:
+            a, b, c = self.a[idx], self.b[idx], self.c[idx]
+            ab, bc, ca, ac = self.ab[idx], self.bc[idx], self.ca[idx], self.ac[idx]
+            normal = self.normal[idx]
+            d00, d01, d11, denom = self.d00[idx], self.d01[idx], self.d11[idx], self.denom[idx]
+            bc_len2 = self.bc_len2[idx]
+
+        # project to plane
+        pa = p - a
+        dist = _dot(pa, normal)
+        p_proj = p - dist[:, None] * normal
+
+        # barycentric coordinates of the projection
+        v2 = p_proj - a
+        d20 = _dot(v2, ab)
+        d21 = _dot(v2, ac)
+        v = (d11 * d20 - d01 * d21) / denom
+        w = (d00 * d21 - d01 * d20) / denom
+        u = 1.0 - v - w
+
+        closest = p_proj
+        bary = np.stack((u, v, w), axis=1)
+        inside = (u >= 0) & (v >= 0) & (w >= 0)
+
+        if not inside.all():
+            # AB, BC, CA (evaluated for every row; inside rows are discarded)
+            c1, t1, e1 = self._edge(p, a, ab, d00)
+            c2, t2, e2 = self._edge(p, b, bc, bc_len2)
+            c3, t3, e3 = self._edge(p, c, ca, d11)
+
+            # choose closest, same tie-breaking as Triangle.closest_point
+            pick1 = ~inside & (e1 <= e2) & (e1 <= e3)
+            pick2 = ~inside & ~pick1 & (e2 <= e1) & (e2 <= e3)
+            pick3 = ~inside & ~pick1 & ~pick2
+
+            closest = np.where(pick1[:, None], c1, closest)
+            closest = np.where(pick2[:, None], c2, closest)
+            closest = np.where(pick3[:, None], c3, closest)
+
+            bary[pick1] = np.stack((1 - t1[pick1], t1[pick1], np.zeros(pick1.sum())), axis=1)
+            bary[pick2] = np.stack((np.zeros(pick2.sum()), 1 - t2[pick2], t2[pick2]), axis=1)
+            bary[pick3] = np.stack((t3[pick3], np.zeros(pick3.sum()), 1 - t3[pick3]), axis=1)
+
+        d = np.linalg.norm(closest - p, axis=1)
+        return closest, bary, d
+
+    """
+    Closest triangle for each of M points over (owner, triangle) pairs, in
+    one pairwise kernel call. Pairs must be grouped by owner with triangles
+    in increasing order, and every point must own at least one pair; ties
+    keep the lowest triangle index.
+
+    Output:
+        idx (M,), closest (M x 3), bary (M x 3), dist (M,)
+    """
+    def closest_of_pairs(self, points, owner, tris):
+        cps, barys, dists = self.closest_points(points[owner], tris)
+
+        # first hit of each group's minimum is its lowest triangle index
+        starts = np.flatnonzero(np.r_[True, owner[1:] != owner[:-1]])
+        best = np.minimum.reduceat(dists, starts)
+        hits = np.flatnonzero(dists == np.repeat(best, np.diff(np.r_[starts, owner.size])))
+        _, first = np.unique(owner[hits], return_index=True)
+        pick = hits[first]
+        return tris[pick], cps[pick], barys[pick], dists[pick]
@@ -18,6 +18,18 @@ class Triangle:
         self.lb, self.ub = self.build_bounds() 
         self.normal = self.compute_normal()
 
+    """
+    Builds a Triangle around existing arrays (e.g. rows of a Mesh's
+    per-face arrays) without copying or recomputing bounds and normal.
+    """
+    @classmethod
+    def from_arrays(cls, a, b, c, lb, ub, normal):
+        tri = cls.__new__(cls)
+        tri.a, tri.b, tri.c = a, b, c
+        tri.lb, tri.ub = lb, ub
+        tri.normal = normal
+        return tri
+
     """
     Computes unit vector of triangle. 
 